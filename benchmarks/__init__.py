@@ -0,0 +1 @@
+# Бенчмарки загрузки и отчётов пяти заданий на синтетических данных (запуск: python benchmarks/run_benchmarks.py)
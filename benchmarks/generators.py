@@ -0,0 +1,192 @@
+# Генераторы синтетических входных файлов для всех пяти заданий (форматы совпадают с исходными выгрузками).
+# Данные детерминированы: одинаковые seed и число строк дают одинаковые файлы.
+# Текстовые, CSV и JSON файлы пишутся потоково; .pkl - это список словарей, поэтому он собирается в памяти целиком.
+import csv
+import os
+import pickle
+import random
+
+from common.export import write_json_items
+from common.records import FIELD_SEPARATOR, RECORD_SEPARATOR
+
+DEFAULT_SEED = 42
+
+BUILDING_TYPES = ['Вилла', 'Шале', 'Усадьба', 'Крольчатник', 'Лосятник', 'Коттедж', 'Особняк', 'Дача']
+STREETS = ['Летняя улица', 'Краковская улица', 'Садовая улица', 'Лесная улица', 'Речная улица', 'Мира улица']
+CITIES = ['Лас-Росас', 'Кордова', 'Бланес', 'Астана', 'Бишкек', 'Белград', 'Ереван', 'Бильбао', 'Афины', 'Будапешт']
+COMMENTS = ['Это здание имеет стандартную конструкцию.', 'Это здание построено из стандартных строительных материалов.',
+            'Это здание недавно отремонтировано.', 'Это здание требует ремонта.']
+
+ARTISTS = ['Calvin Harris', 'Jason Derulo', 'Miley Cyrus', 'Clean Bandit', 'David Guetta', 'Pendulum', 'Rihanna', 'Drake']
+SONG_GENRES = ['pop', 'hip hop, pop', 'Dance/Electronic', 'pop, Dance/Electronic', 'hip hop, pop, Dance/Electronic',
+               'rock', 'rock, pop', 'R&B']
+
+PRODUCT_ADJECTIVES = ['delightful', 'beautiful', 'amazing', 'gorgeous', 'superb', 'fantastic', 'fresh', 'shiny']
+PRODUCT_NOUNS = {'fruit': ['melon', 'papaya', 'apple', 'banana'], 'tools': ['screws', 'paint', 'hammer', 'drill'],
+                 'cosmetics': ['cream', 'lipstick', 'shampoo', 'perfume']}
+CHANGE_METHODS = ['available', 'price_percent', 'price_abs', 'quantity_add', 'quantity_sub', 'remove']
+
+MOVIE_TYPES = ['Movie', 'TV Show']
+MOVIE_GENRES = ['Thriller', 'Comedy', 'Horror', 'Drama', 'Romance', 'Documentary', 'Action', 'Sci-Fi']
+MOVIE_RATINGS = ['TV-14', 'R', 'TV-MA', 'TV-PG', 'PG', 'PG-13', 'G']
+MOVIE_COUNTRIES = ['United Kingdom', 'Canada', 'Australia', 'Germany', 'India', 'South Korea', 'United States', 'Japan']
+MOVIE_FIELDS = ['Title', 'Type', 'Genre', 'Release Year', 'Rating', 'Duration', 'Country']
+
+
+def building_name(rng):
+    return f"{rng.choice(BUILDING_TYPES)} {rng.randint(1, 99)}"
+
+
+def write_records(records, filename):
+    with open(filename, 'w', encoding='utf-8') as file:
+        for record in records:
+            for key, value in record.items():
+                file.write(f"{key}{FIELD_SEPARATOR}{value}\n")
+            file.write(f"{RECORD_SEPARATOR}\n")
+
+
+# 1-2/item.csv
+def generate_items_csv(filename, rows, seed=DEFAULT_SEED):
+    rng = random.Random(seed)
+    with open(filename, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file, delimiter=';')
+        writer.writerow(['id', 'name', 'street', 'city', 'zipcode', 'floors', 'year', 'parking', 'prob_price', 'views'])
+        for item_id in range(1, rows + 1):
+            writer.writerow([item_id, building_name(rng), f"{rng.choice(STREETS)} {rng.randint(1, 99)}",
+                             rng.choice(CITIES), rng.randint(100000, 999999), rng.randint(1, 12),
+                             rng.randint(1400, 2023), rng.random() < 0.5, rng.randint(1000000, 500000000),
+                             rng.randint(0, 100000)])
+
+
+# second_task/subitem.pkl
+def generate_subitems_pkl(filename, rows, seed=DEFAULT_SEED):
+    rng = random.Random(seed)
+    subitems = [{'name': building_name(rng), 'rating': round(rng.uniform(0, 5), 1), 'convenience': rng.randint(1, 5),
+                 'security': rng.randint(1, 5), 'functionality': rng.randint(1, 5), 'comment': rng.choice(COMMENTS)}
+                for _ in range(rows)]
+    with open(filename, 'wb') as file:
+        pickle.dump(subitems, file)
+
+
+def song(rng, number):
+    return {'artist': ARTISTS[number % len(ARTISTS)], 'song': f"Song {number}",
+            'duration_ms': str(rng.randint(120000, 420000)), 'year': str(rng.randint(1998, 2020)), 'tempo': str(round(rng.uniform(60, 200), 3)),
+            'genre': rng.choice(SONG_GENRES)}
+
+
+# third_task/_part_1.text и _part_2.pkl: половина песен из .pkl повторяется в текстовом файле
+def generate_songs(text_filename, pkl_filename, rows, seed=DEFAULT_SEED):
+    rng = random.Random(seed)
+    text_rows = rows // 2
+    pkl_rows = rows - text_rows
+
+    def text_songs():
+        for number in range(text_rows):
+            record = song(rng, number + pkl_rows // 2)
+            record.update({'instrumentalness': round(rng.random(), 3), 'explicit': rng.random() < 0.3,
+                           'loudness': round(rng.uniform(-12, 0), 3)})
+            yield record
+
+    write_records(text_songs(), text_filename)
+
+    songs = []
+    for number in range(pkl_rows):
+        record = song(rng, number)
+        record.update({'acousticness': str(round(rng.random(), 4)), 'energy': str(round(rng.random(), 3)),
+                       'popularity': str(rng.randint(0, 100))})
+        songs.append(record)
+    with open(pkl_filename, 'wb') as file:
+        pickle.dump(songs, file)
+
+
+# Название и категория товара однозначно определяются номером, поэтому изменения ссылаются на товары без списка имён
+def product_name(number):
+    categories = list(PRODUCT_NOUNS)
+    category = categories[number % len(categories)]
+    adjective = PRODUCT_ADJECTIVES[number // len(categories) % len(PRODUCT_ADJECTIVES)]
+    return category, f"{adjective} {PRODUCT_NOUNS[category][number % len(PRODUCT_NOUNS[category])]} {number}"
+
+
+def change_param(rng, method):
+    if method == 'available':
+        return rng.random() < 0.5
+    if method == 'price_percent':
+        return round(rng.uniform(-0.2, 0.2), 2)
+    if method == 'price_abs':
+        return round(rng.uniform(-50, 50), 2)
+    if method in ('quantity_add', 'quantity_sub'):
+        return rng.randint(1, 100)
+    return None
+
+
+# fourth_task/_product_data.text и _update_data.pkl (изменений столько же, сколько товаров);
+# у части товаров нет категории, как в исходной выгрузке
+def generate_products(text_filename, pkl_filename, rows, seed=DEFAULT_SEED):
+    rng = random.Random(seed)
+
+    def products():
+        for number in range(rows):
+            category, name = product_name(number)
+            record = {'name': name, 'price': round(rng.uniform(1, 1000), 2), 'quantity': rng.randint(0, 1000)}
+            if rng.random() < 0.8:
+                record['category'] = category
+            record.update({'fromCity': rng.choice(CITIES), 'isAvailable': rng.random() < 0.5,
+                           'views': rng.randint(0, 100000)})
+            yield record
+
+    write_records(products(), text_filename)
+
+    changes = []
+    for _ in range(rows):
+        method = rng.choice(CHANGE_METHODS)
+        changes.append({'name': product_name(rng.randrange(rows))[1], 'method': method,
+                        'param': change_param(rng, method)})
+    with open(pkl_filename, 'wb') as file:
+        pickle.dump(changes, file)
+
+
+def movie(rng, number):
+    duration = f"{rng.randint(1, 5)} Seasons" if rng.random() < 0.5 else f"{rng.randint(60, 180)} min"
+    return {'Title': f"Title {number}", 'Type': rng.choice(MOVIE_TYPES), 'Genre': rng.choice(MOVIE_GENRES),
+            'Release Year': str(rng.randint(1950, 2023)), 'Rating': rng.choice(MOVIE_RATINGS), 'Duration': duration,
+            'Country': rng.choice(MOVIE_COUNTRIES)}
+
+
+# fifth_task/cleaned_first_part.csv (каждая строка целиком в кавычках) и cleaned_second_part.json (пополам)
+def generate_movies(csv_filename, json_filename, rows, seed=DEFAULT_SEED):
+    rng = random.Random(seed)
+    csv_rows = rows // 2
+    with open(csv_filename, 'w', encoding='utf-8', newline='') as file:
+        writer = csv.writer(file, quoting=csv.QUOTE_ALL)
+        writer.writerow([','.join(MOVIE_FIELDS)])
+        for number in range(1, csv_rows + 1):
+            writer.writerow([','.join(movie(rng, number).values())])
+    write_json_items((movie(rng, number) for number in range(csv_rows + 1, rows + 1)), json_filename)
+
+
+# Входные файлы задания в каталоге directory: {имя файла: путь}
+TASK_FILES = {
+    'first_task': ['item.csv'],
+    'second_task': ['subitem.pkl'],
+    'third_task': ['_part_1.text', '_part_2.pkl'],
+    'fourth_task': ['_product_data.text', '_update_data.pkl'],
+    'fifth_task': ['cleaned_first_part.csv', 'cleaned_second_part.json'],
+}
+
+
+def generate_task_data(task, directory, rows, seed=DEFAULT_SEED):
+    os.makedirs(directory, exist_ok=True)
+    paths = [os.path.join(directory, filename) for filename in TASK_FILES[task]]
+    if task == 'first_task':
+        generate_items_csv(*paths, rows, seed)
+    elif task == 'second_task':
+        generate_subitems_pkl(*paths, rows, seed)
+    elif task == 'third_task':
+        generate_songs(*paths, rows, seed)
+    elif task == 'fourth_task':
+        generate_products(*paths, rows, seed)
+    elif task == 'fifth_task':
+        generate_movies(*paths, rows, seed)
+    else:
+        raise ValueError(f"Неизвестное задание: {task}")
+    return dict(zip(TASK_FILES[task], paths))
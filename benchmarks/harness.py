@@ -0,0 +1,43 @@
+# Замер отдельного этапа: время (общее и процессорное) и память (пик выделений Python и максимальный RSS процесса).
+# tracemalloc заметно замедляет выполнение, поэтому его можно отключить.
+import time
+import tracemalloc
+
+from common.instrumentation import max_rss_kb
+
+
+# Выполняет func(*args, **kwargs); возвращает результат и запись с метриками этапа
+def measure(stage, func, *args, trace_memory=True, **kwargs):
+    if trace_memory:
+        tracemalloc.start()
+    started = time.perf_counter()
+    cpu_started = time.process_time()
+    try:
+        result = func(*args, **kwargs)
+    finally:
+        wall_time = time.perf_counter() - started
+        cpu_time = time.process_time() - cpu_started
+        peak_alloc = None
+        if trace_memory:
+            peak_alloc = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+
+    record = {
+        'stage': stage,
+        'wall_s': round(wall_time, 6),
+        'cpu_s': round(cpu_time, 6),
+        'peak_alloc_bytes': peak_alloc,
+        'max_rss_kb': max_rss_kb(),
+    }
+    return result, record
+
+
+# Сравнение двух результатов по общему времени этапов: (задание, строки, этап, было, стало, отношение)
+def compare_results(previous, current):
+    previous_times = {(run['task'], run['rows'], run['stage']): run['wall_s'] for run in previous['runs']}
+    comparison = []
+    for run in current['runs']:
+        key = (run['task'], run['rows'], run['stage'])
+        if key in previous_times and previous_times[key] > 0:
+            comparison.append(key + (previous_times[key], run['wall_s'], run['wall_s'] / previous_times[key]))
+    return comparison
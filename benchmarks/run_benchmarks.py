@@ -0,0 +1,260 @@
+# Запуск бенчмарков: для каждого задания и размера данных генерируются входные файлы, затем каждый этап
+# (разбор, загрузка, изменения, индексы, каждый отчёт, выгрузка) выполняется и замеряется отдельно.
+# Результаты пишутся в JSON; с --compare печатается сравнение времени с предыдущим запуском.
+#
+#   python benchmarks/run_benchmarks.py --rows 1000 100000 --tasks fourth_task fifth_task
+import argparse
+import importlib
+import json
+import os
+import platform
+import shutil
+import sqlite3
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(ROOT)
+
+from benchmarks.generators import COMMENTS, DEFAULT_SEED, TASK_FILES, generate_task_data
+from benchmarks.harness import compare_results, measure
+from common.bulk import iter_csv_rows
+from common.db import ConnectionManager
+from common.export import export_report
+from common.index_advisor import advise_indexes
+from common.records import read_records
+from common.sidecar import iter_pickle_rows
+
+TASKS = list(TASK_FILES)
+DEFAULT_ROWS = [1_000]
+DEFAULT_DATA_DIR = '.benchmark_data'
+DEFAULT_OUTPUT = 'benchmark_results.json'
+# Число поисковых запросов в этапе search_*: задержка одного запроса - время этапа, делённое на него
+SEARCH_QUERIES = 100
+
+
+def count(items):
+    return sum(1 for _ in items)
+
+
+# Этап поиска: SEARCH_QUERIES запросов search(text) по текстам из texts (по кругу)
+def search_stage(search, texts):
+    def run():
+        for number in range(SEARCH_QUERIES):
+            search(texts[number % len(texts)])
+    return run
+
+
+# Этапы задания (rows - число сгенерированных записей): список (имя этапа, функция без аргументов)
+# и функция закрытия ресурсов.
+# Этапы выполняются по порядку в каталоге с данными и используют общее состояние (соединение, изменения).
+def first_task_stages(module, files, rows):
+    db = ConnectionManager()
+    stages = [
+        ('parse', lambda: count(iter_csv_rows(files['item.csv'], module.ITEM_CSV_SCHEMA, delimiter=';'))),
+        ('load', lambda: (module.create_database(db), module.populate_database_from_csv(db, files['item.csv']))),
+        ('index', lambda: module.create_report_indexes(db, after_load=True)),
+        ('report_first_sorted', lambda: module.export_to_json(db, 34)),
+        ('report_aggregates', lambda: module.calculate_aggregates_and_export_to_json(db)),
+        ('report_frequency', lambda: module.categorical_field_frequency_and_export_to_json(db, 'city')),
+        ('report_filtered', lambda: module.export_filtered_data_to_json(db, 34, [('prob_price', '>', 100000000)])),
+    ]
+    return stages, db.close
+
+
+def second_task_stages(module, files, rows):
+    db = ConnectionManager()
+    stages = [
+        ('parse', lambda: count(iter_pickle_rows(files['subitem.pkl'], module.SUBITEM_FIELDS))),
+        ('load', lambda: (module.create_subitems_table(db), module.populate_subitems_from_pkl(db, files['subitem.pkl']))),
+        ('index', lambda: module.create_report_indexes(db, after_load=True)),
+        ('report_product_ratings', lambda: module.display_product_ratings(db)),
+        ('report_average_ratings', lambda: module.average_ratings(db)),
+        ('report_highest_and_lowest', lambda: module.find_highest_and_lowest_rated_products(db)),
+        ('search_index', lambda: module.create_search_index(db)),
+        # Слова комментариев встречаются в большинстве строк - худший случай для ранжирования bm25
+        ('search_common_words', search_stage(lambda text: module.search_comments(db, text),
+                                             [word for comment in COMMENTS for word in comment.split()])),
+    ]
+    return stages, db.close
+
+
+def third_task_stages(module, files, rows):
+    # Построчная загрузка того же текстового файла в отдельную базу - для сравнения со столбцовой (load_text)
+    def load_text_rows():
+        os.makedirs('rows', exist_ok=True)
+        previous_dir = os.getcwd()
+        os.chdir('rows')
+        try:
+            module.create_songs_table()
+            module.populate_songs_from_txt(files['_part_1.text'])
+        finally:
+            os.chdir(previous_dir)
+
+    stages = [
+        ('parse', lambda: count(iter_pickle_rows(files['_part_2.pkl'], module.SONG_PKL_FIELDS))
+         + count(read_records(files['_part_1.text'], module.SONG_TEXT_SCHEMA))),
+        ('load_pkl', lambda: (module.create_songs_table(), module.populate_songs_from_pkl(files['_part_2.pkl']))),
+        ('load_text_rows', load_text_rows),
+        ('load_text', lambda: module.populate_songs_from_txt_columnar(files['_part_1.text'])),
+        ('index', lambda: module.create_report_indexes(after_load=True)),
+        ('report_first_sorted', lambda: module.export_first_sorted_to_json(34, 'duration_ms')),
+        ('report_aggregates', lambda: module.export_aggregate_results('tempo')),
+        ('report_frequency', lambda: module.export_categorical_frequency('genre')),
+        ('report_filtered', lambda: module.export_filtered_sorted_to_json(34, [('year', '>', 2000)], 'year')),
+    ]
+    return stages, lambda: None
+
+
+def fourth_task_stages(module, files, rows):
+    conn = sqlite3.connect('fourth_task.db')
+    cursor = conn.cursor()
+    state = {}
+
+    def parse():
+        state['changes'] = module.load_changes(files['_update_data.pkl'])
+        return count(read_records(files['_product_data.text'], module.PRODUCT_TEXT_SCHEMA)) + len(state['changes'])
+
+    def load():
+        module.create_products_table(cursor)
+        module.insert_products_from_text(cursor, files['_product_data.text'])
+        conn.commit()
+
+    def update():
+        module.apply_changes_folded(cursor, state['changes'])
+        conn.commit()
+
+    def category_reports():
+        state['price'], state['quantity'], state['custom'] = module.query_category_reports_from_summary(cursor)
+
+    def export():
+        for name in ('top_updated', 'price', 'quantity', 'custom'):
+            export_report(state[name], f"{name}.json")
+
+    stages = [
+        ('parse', parse),
+        ('load', load),
+        ('update', update),
+        ('index', lambda: (advise_indexes(cursor, module.REPORT_QUERIES, after_load=True), conn.commit())),
+        ('report_top_updated', lambda: state.update(top_updated=module.query_top_updated_products(cursor))),
+        ('report_category', category_reports),
+        ('export', export),
+    ]
+    return stages, conn.close
+
+
+def fifth_task_stages(module, files, rows):
+    conn = sqlite3.connect('movies_and_shows.db')
+    cursor = conn.cursor()
+    csv_file, json_file = files['cleaned_first_part.csv'], files['cleaned_second_part.json']
+    results = {}
+    # Номера названий "Title N" для поиска, равномерно по всем строкам
+    titles = [str(number * 7919 % rows + 1) for number in range(SEARCH_QUERIES)]
+
+    # Разбор в потоках (под общим GIL) и в процессах; данные для отчётов остаются от второй загрузки
+    def load(processes):
+        module.create_tables(cursor, reset=True)
+        module.load_movies_concurrently(cursor, module.movie_sources(csv_file, json_file), processes=processes)
+        conn.commit()
+
+    def report_stage(report, filename):
+        return lambda: results.update({filename: list(report(cursor))})
+
+    def export():
+        for filename, items in results.items():
+            export_report(items, filename)
+
+    stages = [
+        ('parse', lambda: count(module.iter_movies_from_csv(csv_file)) + count(module.iter_movies_from_json(json_file))),
+        ('load_threads', lambda: load(False)),
+        ('load_processes', lambda: load(True)),
+        ('index', lambda: (advise_indexes(cursor, module.REPORT_QUERIES, after_load=True), conn.commit())),
+        ('search_index', lambda: (module.create_search_index(cursor), conn.commit())),
+        # Избирательные запросы: номер названия (одно совпадение) и его префикс (десятки-сотни совпадений)
+        ('search_exact', search_stage(lambda text: module.search_titles(cursor, text), titles)),
+        ('search_prefix', search_stage(lambda text: module.search_titles(cursor, text[:3], prefix=True), titles)),
+    ]
+    stages += [(f"report_{report.__name__}", report_stage(report, filename)) for report, filename in module.REPORTS]
+    stages.append(('export', export))
+    return stages, conn.close
+
+
+TASK_STAGES = {
+    'first_task': first_task_stages,
+    'second_task': second_task_stages,
+    'third_task': third_task_stages,
+    'fourth_task': fourth_task_stages,
+    'fifth_task': fifth_task_stages,
+}
+
+
+def import_task(task):
+    task_dir = os.path.join(ROOT, task)
+    if task_dir not in sys.path:
+        sys.path.append(task_dir)
+    return importlib.import_module(task)
+
+
+# Один прогон задания на свежих данных в отдельном каталоге; возвращает записи по этапам
+def run_task(task, rows, data_dir, seed=DEFAULT_SEED, trace_memory=True):
+    directory = os.path.abspath(os.path.join(data_dir, f"{task}_{rows}"))
+    shutil.rmtree(directory, ignore_errors=True)
+    files, record = measure('generate', generate_task_data, task, directory, rows, seed, trace_memory=False)
+    records = [record]
+
+    module = import_task(task)
+    previous_dir = os.getcwd()
+    os.chdir(directory)
+    try:
+        stages, close = TASK_STAGES[task](module, files, rows)
+        try:
+            for stage, func in stages:
+                _, record = measure(stage, func, trace_memory=trace_memory)
+                records.append(record)
+        finally:
+            close()
+    finally:
+        os.chdir(previous_dir)
+
+    for record in records:
+        record.update(task=task, rows=rows)
+        print(f"{task:12} {rows:>10} {record['stage']:36} {record['wall_s']:10.3f} с")
+    return records
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки загрузки и отчётов на синтетических данных')
+    parser.add_argument('--tasks', nargs='+', choices=TASKS, default=TASKS)
+    parser.add_argument('--rows', nargs='+', type=int, default=DEFAULT_ROWS, help='размеры данных (10^3..10^8)')
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR)
+    parser.add_argument('--output', default=DEFAULT_OUTPUT)
+    parser.add_argument('--no-tracemalloc', action='store_true', help='не замерять пик выделений памяти (быстрее)')
+    parser.add_argument('--compare', help='JSON с результатами предыдущего запуска')
+    args = parser.parse_args()
+
+    results = {
+        'created': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'platform': platform.platform(),
+        'seed': args.seed,
+        'runs': [],
+    }
+    for task in args.tasks:
+        for rows in args.rows:
+            results['runs'] += run_task(task, rows, args.data_dir, args.seed, not args.no_tracemalloc)
+
+    with open(args.output, 'w', encoding='utf-8') as file:
+        json.dump(results, file, indent=4, ensure_ascii=False)
+    print(f"Результаты сохранены: {args.output}")
+
+    if args.compare:
+        with open(args.compare, 'r', encoding='utf-8') as file:
+            previous = json.load(file)
+        for task, rows, stage, before, after, ratio in compare_results(previous, results):
+            print(f"{task:12} {rows:>10} {stage:36} {before:10.3f} -> {after:10.3f} с (x{ratio:.2f})")
+
+
+if __name__ == "__main__":
+    main()
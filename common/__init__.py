@@ -0,0 +1 @@
+# Общие модули для заданий лабораторной работы
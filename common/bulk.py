@@ -0,0 +1,42 @@
+# Пакетная загрузка строк в SQLite: executemany по итератору с фиксацией каждые N строк
+import csv
+import time
+from itertools import islice
+
+from common.records import convert_value
+
+DEFAULT_BATCH_SIZE = 50_000
+
+
+# Разбиение итератора на списки фиксированного размера
+def batched(iterable, batch_size):
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+# Потоковое чтение CSV с приведением столбцов к типам схемы (ключ, тип, значение по умолчанию)
+def iter_csv_rows(filename, schema, delimiter=','):
+    with open(filename, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.DictReader(file, delimiter=delimiter)
+        for row in reader:
+            yield tuple(convert_value(row.get(key) or '', field_type, default)
+                        for key, field_type, default in schema)
+
+
+# Вставка строк пакетами; возвращает количество строк и печатает скорость загрузки
+def bulk_insert(conn, sql, rows, batch_size=DEFAULT_BATCH_SIZE):
+    cursor = conn.cursor()
+    started = time.perf_counter()
+    total = 0
+    for batch in batched(rows, batch_size):
+        cursor.executemany(sql, batch)
+        conn.commit()
+        total += len(batch)
+    elapsed = time.perf_counter() - started
+    rate = total / elapsed if elapsed > 0 else float('inf')
+    print(f"Загружено строк: {total} за {elapsed:.3f} с ({rate:.0f} строк/с)")
+    return total
@@ -0,0 +1,154 @@
+# Столбцовые форматы отчётов с сохранением типов (int/float/text/bool):
+# Parquet или Arrow IPC, если установлен pyarrow, иначе NumPy .npz со схемой в отдельном массиве "__schema__".
+# Явно запрошенный недоступный формат - ошибка; если не установлено ничего, экспорт "лучшего доступного"
+# формата пропускается с замечанием в отчёте о запуске (common.instrumentation).
+import json
+
+try:
+    import pyarrow
+    import pyarrow.ipc
+except ImportError:
+    pyarrow = None
+
+try:
+    import pyarrow.parquet
+except ImportError:
+    parquet = None
+else:
+    parquet = pyarrow.parquet
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from common.instrumentation import note
+
+COLUMN_TYPES = ('bool', 'int', 'float', 'text')
+# Формат и пакет, без которого он недоступен
+FORMAT_PACKAGES = {'parquet': 'pyarrow', 'arrow': 'pyarrow', 'npz': 'numpy'}
+
+
+# Накопление записей (словарей или кортежей) по столбцам; names - имена столбцов для кортежей
+# (без них столбцы называются column_0, column_1, ...)
+class ColumnBuffer:
+    def __init__(self, names=None):
+        self.names = list(names) if names else None
+        self.columns = {}
+        self.count = 0
+
+    def add(self, item):
+        if not isinstance(item, dict):
+            if self.names is not None and len(self.names) == len(item):
+                item = dict(zip(self.names, item))
+            else:
+                item = {f'column_{index}': value for index, value in enumerate(item)}
+        for name in item:
+            if name not in self.columns:
+                self.columns[name] = [None] * self.count
+        for name, values in self.columns.items():
+            values.append(item.get(name))
+        self.count += 1
+
+
+# Тип столбца по значениям: bool < int < float < text
+def column_type(values):
+    result = 'bool'
+    for value in values:
+        if value is None:
+            continue
+        if isinstance(value, bool):
+            kind = 'bool'
+        elif isinstance(value, int):
+            kind = 'int'
+        elif isinstance(value, float):
+            kind = 'float'
+        else:
+            return 'text'
+        result = max(result, kind, key=COLUMN_TYPES.index)
+    return result
+
+
+def available_format():
+    if pyarrow is not None:
+        return 'parquet' if parquet is not None else 'arrow'
+    if numpy is not None:
+        return 'npz'
+    return None
+
+
+def format_available(format):
+    return {'parquet': parquet, 'arrow': pyarrow, 'npz': numpy}[format] is not None
+
+
+def _arrow_table(columns):
+    arrow_types = {'bool': pyarrow.bool_(), 'int': pyarrow.int64(), 'float': pyarrow.float64(), 'text': pyarrow.string()}
+    arrays = {}
+    for name, values in columns.items():
+        kind = column_type(values)
+        if kind == 'text':
+            values = [None if value is None else str(value) for value in values]
+        elif kind == 'float':
+            values = [None if value is None else float(value) for value in values]
+        arrays[name] = pyarrow.array(values, type=arrow_types[kind])
+    return pyarrow.table(arrays)
+
+
+def _write_npz(columns, filename):
+    numpy_types = {'bool': numpy.bool_, 'int': numpy.int64, 'float': numpy.float64, 'text': numpy.str_}
+    empty_values = {'bool': False, 'int': 0, 'float': float('nan'), 'text': ''}
+    arrays = {}
+    schema = []
+    for name, values in columns.items():
+        kind = column_type(values)
+        nullable = any(value is None for value in values)
+        data = [empty_values[kind] if value is None else value for value in values]
+        if kind == 'text':
+            data = [str(value) for value in data]
+        arrays[name] = numpy.array(data, dtype=numpy_types[kind])
+        if nullable:
+            arrays[f'{name}__null'] = numpy.array([value is None for value in values], dtype=numpy.bool_)
+        schema.append({'name': name, 'type': kind, 'nullable': nullable})
+    arrays['__schema__'] = numpy.array(json.dumps(schema, ensure_ascii=False))
+    numpy.savez(filename, **arrays)
+
+
+# Запись столбцов в файл filename_base + расширение формата (по умолчанию - лучший доступный);
+# возвращает путь или None, если не доступен ни один формат
+def write_columns(columns, filename_base, format=None):
+    if format is None:
+        format = available_format()
+        if format is None:
+            note("Столбцовый экспорт пропущен: не установлены ни pyarrow, ни numpy")
+            return None
+    elif format not in FORMAT_PACKAGES:
+        raise ValueError(f"Неизвестный столбцовый формат: {format}")
+    elif not format_available(format):
+        raise ValueError(f"Столбцовый формат {format} недоступен: не установлен {FORMAT_PACKAGES[format]}")
+
+    if format == 'parquet':
+        filename = filename_base + '.parquet'
+        parquet.write_table(_arrow_table(columns), filename)
+    elif format == 'arrow':
+        filename = filename_base + '.arrow'
+        table = _arrow_table(columns)
+        with pyarrow.OSFile(filename, 'wb') as sink, pyarrow.ipc.new_file(sink, table.schema) as writer:
+            writer.write_table(table)
+    else:
+        filename = filename_base + '.npz'
+        _write_npz(columns, filename)
+    return filename
+
+
+# Чтение .npz отчёта: {столбец: массив}, NULL-значения восстанавливаются по маске как None
+def read_npz(filename):
+    with numpy.load(filename) as data:
+        schema = json.loads(str(data['__schema__']))
+        columns = {}
+        for field in schema:
+            values = data[field['name']].tolist()
+            if field['nullable']:
+                mask = data[f"{field['name']}__null"].tolist()
+                values = [None if is_null else value for value, is_null in zip(values, mask)]
+            columns[field['name']] = values
+    return columns
@@ -0,0 +1,57 @@
+# Менеджер долгоживущих соединений SQLite: одно настроенное соединение на файл базы данных
+import sqlite3
+from contextlib import contextmanager
+
+from common.instrumentation import trace_connection
+
+# Настройки, применяемые один раз при открытии соединения
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'cache_size': -64000,  # Отрицательное значение - размер в КиБ (~64 МБ)
+    'mmap_size': 268435456,  # 256 МБ
+}
+
+
+class ConnectionManager:
+    def __init__(self, pragmas=None, row_factory=sqlite3.Row):
+        self.pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+        self.row_factory = row_factory
+        self._connections = {}
+
+    # Соединение для файла базы данных (создаётся и настраивается при первом обращении)
+    def connection(self, path):
+        conn = self._connections.get(path)
+        if conn is None:
+            conn = sqlite3.connect(path)
+            conn.row_factory = self.row_factory
+            for name, value in self.pragmas.items():
+                conn.execute(f"PRAGMA {name} = {value}")
+            trace_connection(conn)
+            self._connections[path] = conn
+        return conn
+
+    # Курсор в контексте: фиксация при успехе, откат при ошибке
+    @contextmanager
+    def cursor(self, path):
+        conn = self.connection(path)
+        cursor = conn.cursor()
+        try:
+            yield cursor
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cursor.close()
+
+    def close(self):
+        for conn in self._connections.values():
+            conn.close()
+        self._connections.clear()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
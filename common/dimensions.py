@@ -0,0 +1,27 @@
+# Интернирование значений справочников (жанры, страны и т.п.): имя -> id без запросов к базе на каждую строку
+class DimensionCache:
+    def __init__(self, cursor, table, column):
+        self.cursor = cursor
+        self.table = table
+        self.column = column
+        # Загружаем уже существующие значения справочника одним запросом
+        cursor.execute(f"SELECT {column}, id FROM {table}")
+        self.ids = dict(cursor.fetchall())
+        self.next_id = max(self.ids.values(), default=0) + 1
+        self.pending = []
+
+    # id значения; новые значения получают id сразу и записываются в базу при flush()
+    def get_id(self, name):
+        value_id = self.ids.get(name)
+        if value_id is None:
+            value_id = self.next_id
+            self.next_id += 1
+            self.ids[name] = value_id
+            self.pending.append((value_id, name))
+        return value_id
+
+    # Запись новых значений справочника одним INSERT
+    def flush(self):
+        if self.pending:
+            self.cursor.executemany(f"INSERT INTO {self.table} (id, {self.column}) VALUES (?, ?)", self.pending)
+            self.pending = []
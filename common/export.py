@@ -0,0 +1,104 @@
+# Потоковая запись отчётов в JSON: строки читаются из курсора через fetchmany и записываются по одной,
+# поэтому объём памяти не зависит от размера результата.
+import gzip
+import json
+import os
+import sqlite3
+
+from common.columnar import ColumnBuffer, write_columns
+from common.instrumentation import count_rows, stage
+
+DEFAULT_FETCH_SIZE = 1000
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+
+# Строки результата запроса порциями по fetch_size
+def iter_rows(cursor, fetch_size=DEFAULT_FETCH_SIZE):
+    while True:
+        rows = cursor.fetchmany(fetch_size)
+        if not rows:
+            return
+        yield from rows
+
+
+# Строки результата в виде словарей {столбец: значение}
+def iter_dicts(cursor, fetch_size=DEFAULT_FETCH_SIZE):
+    headers = [description[0] for description in cursor.description]
+    for row in iter_rows(cursor, fetch_size):
+        yield dict(zip(headers, row))
+
+
+# Буферизованный файл для записи (gzip, если compress=True)
+def open_output(filename, compress=False):
+    if compress:
+        return gzip.open(filename if filename.endswith('.gz') else filename + '.gz', 'wt', encoding='utf-8')
+    return open(filename, 'w', encoding='utf-8', buffering=WRITE_BUFFER_SIZE)
+
+
+# Запись элементов JSON массивом (как json.dump с тем же indent) или в формате JSON Lines
+def write_json_items(items, filename, indent=4, ensure_ascii=False, json_lines=False, compress=False):
+    with open_output(filename, compress) as file:
+        if json_lines:
+            written = 0
+            for item in items:
+                file.write(json.dumps(item, ensure_ascii=ensure_ascii))
+                file.write('\n')
+                written += 1
+            count_rows(written)
+            return
+
+        if indent is None:
+            prefix, separator, suffix = '[', ', ', ']'
+        else:
+            padding = ' ' * indent
+            prefix, separator, suffix = '[\n' + padding, ',\n' + padding, '\n]'
+
+        written = 0
+        for item in items:
+            file.write(prefix if not written else separator)
+            text = json.dumps(item, indent=indent, ensure_ascii=ensure_ascii)
+            file.write(text if indent is None else text.replace('\n', '\n' + padding))
+            written += 1
+        file.write(suffix if written else '[]')
+        count_rows(written)
+
+
+# Форматы вывода отчётов по умолчанию - только JSON. Столбцовый файл (Parquet/Arrow/NPZ - что доступно)
+# включается явно: formats=COLUMNAR_OUTPUT_FORMATS. Он собирается из всех записей отчёта в памяти,
+# поэтому подходит для отчётов ограниченного размера, а не для потоковой выгрузки больших результатов
+DEFAULT_OUTPUT_FORMATS = ('json',)
+COLUMNAR_OUTPUT_FORMATS = ('json', 'columnar')
+
+
+# Запись отчёта (последовательности записей или курсора) во все запрошенные форматы за один проход по данным;
+# в отчёте о запуске (common.instrumentation) это отдельный этап. Возвращает список записанных файлов.
+# columns - имена столбцов для записей-кортежей (для курсора берутся из cursor.description)
+def export_report(items, filename, formats=DEFAULT_OUTPUT_FORMATS, columns=None, **json_options):
+    with stage(f"export:{os.path.basename(filename)}"):
+        if isinstance(items, sqlite3.Cursor):
+            columns = columns or [description[0] for description in items.description]
+            items = iter_rows(items)
+        columnar_formats = [output_format for output_format in formats if output_format != 'json']
+        buffer = ColumnBuffer(columns) if columnar_formats else None
+
+        def tee(source):
+            for item in source:
+                buffer.add(item)
+                yield item
+
+        if buffer is not None:
+            items = tee(items)
+        written = []
+        if 'json' in formats:
+            write_json_items(items, filename, **json_options)
+            written.append(filename if not json_options.get('compress') or filename.endswith('.gz') else filename + '.gz')
+        elif buffer is not None:
+            for _ in items:
+                pass
+
+        base = filename[:-len('.json')] if filename.endswith('.json') else filename
+        for output_format in columnar_formats:
+            columnar_file = write_columns(buffer.columns, base, None if output_format == 'columnar' else output_format)
+            if columnar_file is not None:
+                written.append(columnar_file)
+        return written
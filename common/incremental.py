@@ -0,0 +1,149 @@
+# Инкрементальная загрузка: отпечатки исходных файлов (размер, время изменения, хэши блоков содержимого)
+# хранятся в таблице source_files той же базы. Неизменённые источники пропускаются без чтения,
+# изменённые загружаются заново через INSERT ... ON CONFLICT по ключу строки: естественному (если он есть
+# в источнике) или ключу происхождения (файл-источник, номер записи в нём).
+import hashlib
+import json
+import os
+import time
+
+FINGERPRINT_CHUNK_SIZE = 1024 * 1024
+
+
+def create_source_table(cursor):
+    cursor.execute('''CREATE TABLE IF NOT EXISTS source_files (
+                        source TEXT PRIMARY KEY,
+                        version TEXT,
+                        size INTEGER,
+                        mtime_ns INTEGER,
+                        chunk_hashes TEXT)''')
+
+
+# Хэши содержимого файла по блокам фиксированного размера
+def chunk_hashes(filename, chunk_size=FINGERPRINT_CHUNK_SIZE):
+    hashes = []
+    with open(filename, 'rb') as file:
+        while True:
+            chunk = file.read(chunk_size)
+            if not chunk:
+                break
+            hashes.append(hashlib.sha256(chunk).hexdigest())
+    return hashes
+
+
+def file_fingerprint(filename):
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'chunk_hashes': chunk_hashes(filename)}
+
+
+# Проверка источника: (изменился ли, отпечаток для record_source).
+# Совпадение размера и времени изменения считается отсутствием изменений без чтения файла;
+# иначе сравниваются хэши блоков (файл мог быть перезаписан тем же содержимым).
+# version - версия схемы/загрузчика: при её смене источник загружается заново.
+def source_changed(cursor, filename, version=''):
+    create_source_table(cursor)
+    source = os.path.normpath(filename)
+    cursor.execute("SELECT version, size, mtime_ns, chunk_hashes FROM source_files WHERE source = ?", (source,))
+    row = cursor.fetchone()
+    stat = os.stat(filename)
+    if row is not None and row[0] == version and row[1] == stat.st_size and row[2] == stat.st_mtime_ns:
+        return False, None
+
+    fingerprint = file_fingerprint(filename)
+    if row is not None and row[0] == version and json.loads(row[3]) == fingerprint['chunk_hashes']:
+        record_source(cursor, filename, fingerprint, version)  # Содержимое то же - обновляем только время
+        return False, None
+    return True, fingerprint
+
+
+# Запись отпечатка после успешной загрузки источника
+def record_source(cursor, filename, fingerprint, version=''):
+    create_source_table(cursor)
+    cursor.execute('''INSERT INTO source_files (source, version, size, mtime_ns, chunk_hashes) VALUES (?, ?, ?, ?, ?)
+                      ON CONFLICT(source) DO UPDATE SET version = excluded.version, size = excluded.size,
+                      mtime_ns = excluded.mtime_ns, chunk_hashes = excluded.chunk_hashes''',
+                   (os.path.normpath(filename), version, fingerprint['size'], fingerprint['mtime_ns'],
+                    json.dumps(fingerprint['chunk_hashes'])))
+
+
+# Удаление дубликатов по естественному ключу (остаётся последняя строка) и создание уникального индекса,
+# нужного для ON CONFLICT. Исправляет таблицы, в которые данные дописывались при каждом запуске.
+def ensure_natural_key(cursor, table, key_columns, index_name):
+    columns = ', '.join(key_columns)
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,))
+    if cursor.fetchone() is None:
+        cursor.execute(f"DELETE FROM {table} WHERE rowid NOT IN (SELECT MAX(rowid) FROM {table} GROUP BY {columns})")
+        cursor.execute(f"CREATE UNIQUE INDEX {index_name} ON {table} ({columns})")
+
+
+# Версия загрузчиков с ключом происхождения: источники, загруженные раньше (по естественному ключу
+# или дописыванием при каждом запуске), загружаются заново
+SOURCE_KEY_VERSION = 'source-row-1'
+
+
+# Ключ происхождения (source, source_row) для таблиц без естественного ключа в источнике. В отличие от ключа
+# по значениям сохраняет все записи: полностью совпадающие отзывы, повторы внутри файла и одинаковые записи
+# из разных файлов. legacy_indexes - прежние уникальные индексы по значениям, которые удаляются.
+def ensure_source_key(cursor, table, index_name, legacy_indexes=()):
+    _add_columns(cursor, table, (('source', 'TEXT'), ('source_row', 'INTEGER')))
+    for legacy_index in legacy_indexes:
+        cursor.execute(f"DROP INDEX IF EXISTS {legacy_index}")
+
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,))
+    if cursor.fetchone() is None:
+        # Строки без источника остались от прежних загрузок; их источники загружаются заново (SOURCE_KEY_VERSION)
+        cursor.execute(f"DELETE FROM {table} WHERE source IS NULL")
+        cursor.execute(f"CREATE UNIQUE INDEX {index_name} ON {table} (source, source_row)")
+
+
+def _add_columns(cursor, table, columns):
+    cursor.execute(f"PRAGMA table_info({table})")
+    existing = {row[1] for row in cursor.fetchall()}
+    for column, column_type in columns:
+        if column not in existing:
+            cursor.execute(f"ALTER TABLE {table} ADD COLUMN {column} {column_type}")
+
+
+# Нумерация записей источника для вставки по ключу происхождения: строки дополняются (source, source_row)
+# спереди. Нумерация продолжается между вызовами keyed (загрузка пакетами); после загрузки delete_stale
+# удаляет строки, которых в источнике больше нет (файл стал короче)
+class SourceRows:
+    def __init__(self, filename):
+        self.source = os.path.normpath(filename)
+        self.count = 0
+
+    def keyed(self, rows):
+        for row in rows:
+            yield (self.source, self.count) + tuple(row)
+            self.count += 1
+
+    def delete_stale(self, cursor, table):
+        cursor.execute(f"DELETE FROM {table} WHERE source = ? AND source_row >= ?", (self.source, self.count))
+
+
+# Версия загрузчиков с номером загрузки: источники, загруженные раньше без него, загружаются заново
+SOURCE_LOAD_VERSION = 'source-load-1'
+
+
+# Столбцы (source, source_load) для таблиц с естественным ключом (см. SourceLoad)
+def ensure_source_load(cursor, table):
+    _add_columns(cursor, table, (('source', 'TEXT'), ('source_load', 'INTEGER')))
+
+
+# Загрузка по естественному ключу: строки дополняются (source, source_load) - файлом и номером текущей
+# загрузки - в конце, и ON CONFLICT обновляет их вместе с данными. После загрузки delete_stale удаляет строки
+# источника, которых в нём больше нет (в отличие от SourceRows ключ не связан с номером записи).
+# Строки без источника остались от загрузок до появления этих столбцов и тоже удаляются, поэтому таблица
+# с такими строками должна заполняться из одного источника
+class SourceLoad:
+    def __init__(self, filename):
+        self.source = os.path.normpath(filename)
+        self.load = time.time_ns()
+
+    def keyed(self, rows):
+        for row in rows:
+            yield tuple(row) + (self.source, self.load)
+
+    def delete_stale(self, cursor, table):
+        cursor.execute(f"DELETE FROM {table} WHERE (source = ? OR source IS NULL) AND source_load IS NOT ?",
+                       (self.source, self.load))
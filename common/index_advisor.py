@@ -0,0 +1,86 @@
+# Советник по индексам для отчётных запросов.
+# Для каждого зарегистрированного запроса выполняется EXPLAIN QUERY PLAN; если в плане есть полное сканирование
+# таблицы или сортировка во временном B-дереве, создаются индексы, указанные для этого запроса.
+# Вызывается после массовой загрузки, чтобы индексы не замедляли вставку. Результат - отчёт "до/после" в JSON.
+# Замеры времени и ANALYZE выполняются, только если создаётся новый индекс или данные только что загружены;
+# иначе (повторный запуск без изменений) проверяются только планы, а прежний отчёт остаётся как есть.
+import json
+import time
+
+from common.instrumentation import instrumented
+
+DEFAULT_REPORT_FILE = 'index_report.json'
+
+
+# Описание отчётного запроса: имя, текст SQL, параметры и индексы (имя индекса, таблица, столбцы)
+def report_query(name, sql, indexes, params=()):
+    return {'name': name, 'sql': sql, 'params': tuple(params), 'indexes': list(indexes)}
+
+
+def explain(cursor, sql, params=()):
+    cursor.execute(f"EXPLAIN QUERY PLAN {sql}", params)
+    return [row[3] for row in cursor.fetchall()]
+
+
+# Строки плана, указывающие на полное сканирование или сортировку во временном B-дереве
+def plan_issues(plan):
+    return [detail for detail in plan
+            if 'USE TEMP B-TREE' in detail or (detail.startswith('SCAN ') and ' USING ' not in detail)]
+
+
+# Лучшее время выполнения запроса (в миллисекундах) из нескольких повторов
+def time_query(cursor, sql, params=(), repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        cursor.execute(sql, params)
+        cursor.fetchall()
+        elapsed = (time.perf_counter() - started) * 1000
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def index_exists(cursor, index_name):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = ?", (index_name,))
+    return cursor.fetchone() is not None
+
+
+def create_index(cursor, index_name, table, columns):
+    cursor.execute(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({', '.join(columns)})")
+
+
+# Анализ запросов, создание недостающих индексов и запись отчёта.
+# after_load - данные только что загружены (статистика ANALYZE и замеры устарели, даже если индексы уже есть).
+# Возвращает отчёт или None, если ничего не менялось и замеры пропущены
+@instrumented()
+def advise_indexes(cursor, queries, report_file=DEFAULT_REPORT_FILE, repeat=3, after_load=False):
+    plans = [explain(cursor, query['sql'], query['params']) for query in queries]
+    missing = [[index for index in query['indexes'] if not index_exists(cursor, index[0])] if plan_issues(plan) else []
+               for query, plan in zip(queries, plans)]
+    if not after_load and not any(missing):
+        return None
+
+    report = []
+    for query, plan in zip(queries, plans):
+        report.append({
+            'query': query['name'],
+            'plan_before': plan,
+            'issues': plan_issues(plan),
+            'time_before_ms': time_query(cursor, query['sql'], query['params'], repeat),
+            'created_indexes': [],
+        })
+
+    for indexes, entry in zip(missing, report):
+        for index_name, table, columns in indexes:
+            create_index(cursor, index_name, table, columns)
+            entry['created_indexes'].append(index_name)
+    cursor.execute("ANALYZE")
+
+    for query, entry in zip(queries, report):
+        entry['plan_after'] = explain(cursor, query['sql'], query['params'])
+        entry['time_after_ms'] = time_query(cursor, query['sql'], query['params'], repeat)
+
+    if report_file:
+        with open(report_file, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4, ensure_ascii=False)
+    return report
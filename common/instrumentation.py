@@ -0,0 +1,255 @@
+# Инструментирование этапов (загрузка, преобразование, запросы, выгрузка) без правки кода заданий.
+# Включается переменными окружения:
+#   RUN_REPORT=run_report.json  - записывать отчёт о запуске (без неё декораторы и контексты ничего не делают)
+#   RUN_REPORT_PROFILE=1        - cProfile для каждого этапа (самые затратные функции)
+#   RUN_REPORT_TRACEMALLOC=1    - пик выделений памяти Python для каждого этапа
+#   RUN_REPORT_SQL=1            - журнал SQL-запросов через set_trace_callback с временем выполнения
+# Для каждого этапа записываются общее и процессорное время, число строк, прочитанные/записанные байты и пиковый RSS.
+import cProfile
+import functools
+import json
+import os
+import pstats
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+RUN_REPORT_ENV = 'RUN_REPORT'
+PROFILE_ENV = 'RUN_REPORT_PROFILE'
+TRACEMALLOC_ENV = 'RUN_REPORT_TRACEMALLOC'
+SQL_TRACE_ENV = 'RUN_REPORT_SQL'
+
+PROFILE_TOP_FUNCTIONS = 15
+TOP_STATEMENTS = 50
+
+
+def max_rss_kb():
+    if resource is None:
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+# Прочитанные и записанные процессом байты (только Linux: /proc/self/io); None, если недоступно
+def io_counters():
+    try:
+        with open('/proc/self/io', 'r') as file:
+            counters = dict(line.split(': ') for line in file.read().splitlines())
+        return int(counters['rchar']), int(counters['wchar'])
+    except (OSError, KeyError, ValueError):
+        return None
+
+
+class RunReport:
+    def __init__(self, filename=None, profile=False, trace_memory=False, trace_sql=False):
+        self.filename = filename
+        self.enabled = filename is not None
+        self.profile = profile
+        self.trace_memory = trace_memory
+        self.trace_sql = trace_sql
+        self.started = time.time()
+        self.stages = []
+        self.notes = []
+        self.statements = {}
+        self._connections = []
+        self._lock = threading.Lock()
+        # Стек активных этапов и текущий SQL-запрос - свои в каждом потоке (отчёты могут выполняться параллельно)
+        self._local = threading.local()
+
+    @property
+    def _active(self):
+        if not hasattr(self._local, 'active'):
+            self._local.active = []
+        return self._local.active
+
+    @classmethod
+    def from_environment(cls):
+        return cls(os.environ.get(RUN_REPORT_ENV) or None,
+                   profile=os.environ.get(PROFILE_ENV) == '1',
+                   trace_memory=os.environ.get(TRACEMALLOC_ENV) == '1',
+                   trace_sql=os.environ.get(SQL_TRACE_ENV) == '1')
+
+    # Этап: вложенные этапы допускаются, cProfile и tracemalloc включаются только для внешнего
+    # (tracemalloc - только если его ещё не запустил этап в другом потоке)
+    @contextmanager
+    def stage(self, name):
+        if not self.enabled:
+            yield None
+            return
+
+        outermost = not self._active
+        record = {'stage': name, 'rows': 0}
+        self._active.append(record)
+        profiler = cProfile.Profile() if self.profile and outermost else None
+        trace_memory = self.trace_memory and outermost and not tracemalloc.is_tracing()
+        if trace_memory:
+            tracemalloc.start()
+        changes = self._total_changes()
+        io_started = io_counters()
+        started = time.perf_counter()
+        cpu_started = time.process_time()
+        if profiler is not None:
+            try:
+                profiler.enable()
+            except ValueError:  # Профилировщик уже активен в другом потоке
+                profiler = None
+        try:
+            yield record
+        finally:
+            if profiler is not None:
+                profiler.disable()
+            self._finish_statement()
+            record['wall_s'] = round(time.perf_counter() - started, 6)
+            record['cpu_s'] = round(time.process_time() - cpu_started, 6)
+            # Строки: изменённые в отслеживаемых соединениях и явно учтённые (count_rows)
+            record['rows'] += self._total_changes() - changes
+            io_finished = io_counters()
+            if io_started is not None and io_finished is not None:
+                record['bytes_read'] = io_finished[0] - io_started[0]
+                record['bytes_written'] = io_finished[1] - io_started[1]
+            record['max_rss_kb'] = max_rss_kb()
+            if trace_memory:
+                record['peak_alloc_bytes'] = tracemalloc.get_traced_memory()[1]
+                tracemalloc.stop()
+            if profiler is not None:
+                record['profile'] = top_functions(profiler)
+            self._active.pop()
+            with self._lock:
+                self.stages.append(record)
+
+    def count_rows(self, rows):
+        if self._active:
+            self._active[-1]['rows'] += rows
+
+    # Замечание (например, пропущенный шаг) к текущему этапу, а вне этапов - к запуску в целом
+    def note(self, message):
+        if not self.enabled:
+            return
+        with self._lock:
+            if self._active:
+                self._active[-1].setdefault('notes', []).append(message)
+            else:
+                self.notes.append(message)
+
+    # Отслеживание соединения: изменённые строки и (с RUN_REPORT_SQL) время каждого SQL-запроса.
+    # Обратный вызов срабатывает в начале выполнения запроса, поэтому время запроса отсчитывается до начала
+    # следующего запроса или конца этапа и включает выборку результатов.
+    # count_changes=False - только журнал запросов (например, для соединений только на чтение)
+    def trace_connection(self, conn, count_changes=True):
+        if not self.enabled:
+            return
+        if count_changes:
+            self._connections.append(conn)
+        if self.trace_sql:
+            conn.set_trace_callback(self._trace_statement)
+
+    def _total_changes(self):
+        total = 0
+        for conn in self._connections:
+            try:
+                total += conn.total_changes
+            except Exception:  # Соединение уже закрыто
+                pass
+        return total
+
+    def _trace_statement(self, sql):
+        self._finish_statement()
+        self._local.statement = (' '.join(sql.split()), time.perf_counter())
+
+    def _finish_statement(self):
+        statement = getattr(self._local, 'statement', None)
+        if statement is None:
+            return
+        sql, started = statement
+        self._local.statement = None
+        elapsed = time.perf_counter() - started
+        with self._lock:
+            stats = self.statements.setdefault(sql, {'sql': sql, 'calls': 0, 'total_s': 0.0, 'max_s': 0.0})
+            stats['calls'] += 1
+            stats['total_s'] += elapsed
+            stats['max_s'] = max(stats['max_s'], elapsed)
+
+    def to_dict(self):
+        self._finish_statement()
+        statements = sorted(self.statements.values(), key=lambda stats: stats['total_s'], reverse=True)
+        return {
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'wall_s': round(time.time() - self.started, 6),
+            'max_rss_kb': max_rss_kb(),
+            'stages': self.stages,
+            'notes': self.notes,
+            'statements': [dict(stats, total_s=round(stats['total_s'], 6), max_s=round(stats['max_s'], 6))
+                           for stats in statements[:TOP_STATEMENTS]],
+        }
+
+    def write(self):
+        if not self.enabled:
+            return
+        report = self.to_dict()
+        with open(self.filename, 'w', encoding='utf-8') as file:
+            json.dump(report, file, indent=4, ensure_ascii=False)
+        for stage in report['stages']:
+            print(f"Этап {stage['stage']}: {stage['wall_s']:.3f} с (CPU {stage['cpu_s']:.3f} с), строк {stage['rows']}")
+            for message in stage.get('notes', []):
+                print(f"    {message}")
+        for message in report['notes']:
+            print(message)
+        if report['statements']:
+            slowest = report['statements'][0]
+            print(f"Самый затратный запрос: {slowest['sql'][:100]} ({slowest['calls']} раз, {slowest['total_s']:.3f} с)")
+        print(f"Отчёт о запуске сохранён: {self.filename}")
+
+
+# Самые затратные функции этапа по суммарному времени (с вложенными вызовами)
+def top_functions(profiler, limit=PROFILE_TOP_FUNCTIONS):
+    stats = pstats.Stats(profiler).stats
+    functions = sorted(stats.items(), key=lambda entry: entry[1][3], reverse=True)[:limit]
+    return [{'function': f"{filename}:{line}({name})", 'calls': calls, 'own_s': round(own_time, 6),
+             'cumulative_s': round(cumulative_time, 6)}
+            for (filename, line, name), (_, calls, own_time, cumulative_time, _) in functions]
+
+
+# Отчёт текущего запуска (настраивается переменными окружения)
+_run_report = RunReport.from_environment()
+
+
+def run_report():
+    return _run_report
+
+
+def stage(name):
+    return _run_report.stage(name)
+
+
+def count_rows(rows):
+    _run_report.count_rows(rows)
+
+
+def trace_connection(conn, count_changes=True):
+    _run_report.trace_connection(conn, count_changes)
+
+
+def note(message):
+    _run_report.note(message)
+
+
+def write_run_report():
+    _run_report.write()
+
+
+# Декоратор: каждый вызов функции - отдельный этап (по умолчанию с именем функции)
+def instrumented(name=None):
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not _run_report.enabled:
+                return function(*args, **kwargs)
+            with _run_report.stage(name or function.__name__):
+                return function(*args, **kwargs)
+        return wrapper
+    return decorator
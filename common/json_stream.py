@@ -0,0 +1,127 @@
+# Потоковое чтение JSON: элементы массива верхнего уровня по одному, без загрузки всего файла.
+# Если файл не начинается с "[", он читается как JSON Lines (один объект на строку).
+# Ошибки формата - ValueError с позицией (номер символа от начала файла или номер строки JSON Lines);
+# некорректный элемент обнаруживается сразу, без дочитывания файла до конца.
+import json
+
+from common.records import DEFAULT_CHUNK_SIZE, iter_lines
+
+MAX_ITEM_SIZE = 64 * 1024 * 1024  # Наибольший размер одного элемента массива (символов)
+
+_decoder = json.JSONDecoder()
+_WHITESPACE = ' \t\n\r'
+_BOM = '\ufeff'
+# Ошибка не дальше стольких символов от конца буфера может означать, что элемент просто не дочитан
+# ("tru", "-", "\u00", ...); незакрытая строка сообщается с позиции её начала
+_TRUNCATION_TAIL = 6
+
+
+class _Buffer:
+    def __init__(self, file, chunk_size):
+        self.file = file
+        self.chunk_size = chunk_size
+        self.text = ''
+        self.pos = 0
+        self.offset = 0  # Сколько символов файла уже отброшено из начала буфера
+        self.eof = False
+
+    def position(self):
+        return self.offset + self.pos
+
+    # Дочитывание: разобранная часть отбрасывается, а читается не меньше уже накопленного хвоста,
+    # поэтому большой элемент разбирается за логарифмическое число попыток, а не за квадратичное время
+    def read_more(self):
+        self.offset += self.pos
+        self.text = self.text[self.pos:]
+        self.pos = 0
+        chunk = self.file.read(max(self.chunk_size, len(self.text)))
+        if chunk:
+            self.text += chunk
+        else:
+            self.eof = True
+
+    # Следующий значащий символ ('' в конце файла)
+    def peek(self):
+        while True:
+            while self.pos < len(self.text) and self.text[self.pos] in _WHITESPACE:
+                self.pos += 1
+            if self.pos < len(self.text) or self.eof:
+                return self.text[self.pos:self.pos + 1]
+            self.read_more()
+
+
+def _maybe_truncated(error, text):
+    return error.pos >= len(text) - _TRUNCATION_TAIL or error.msg.startswith('Unterminated string')
+
+
+def _decode_item(buffer, max_item_size):
+    if not buffer.peek():
+        raise ValueError(f"Неожиданный конец JSON массива на позиции {buffer.position()}")
+    while True:
+        try:
+            item, end = _decoder.raw_decode(buffer.text, buffer.pos)
+        except json.JSONDecodeError as error:
+            if buffer.eof or not _maybe_truncated(error, buffer.text):
+                raise ValueError(f"Некорректный JSON на позиции {buffer.offset + error.pos}: {error.msg}") from error
+        else:
+            # Элемент, дошедший до конца буфера, может быть неполным (например, число) - дочитываем
+            if end < len(buffer.text) or buffer.eof:
+                buffer.pos = end
+                return item
+        if len(buffer.text) - buffer.pos > max_item_size:
+            raise ValueError(f"Элемент JSON на позиции {buffer.position()} длиннее {max_item_size} символов")
+        buffer.read_more()
+
+
+def iter_json_items(file, chunk_size=DEFAULT_CHUNK_SIZE, max_item_size=MAX_ITEM_SIZE):
+    buffer = _Buffer(file, chunk_size)
+
+    # Определяем формат по первому значащему символу (BOM пропускается)
+    first = buffer.peek()
+    if first == _BOM:
+        buffer.pos += 1
+        first = buffer.peek()
+    if not first:
+        return
+    if first != '[':
+        yield from _iter_json_lines(buffer.text[buffer.pos:], file, chunk_size)
+        return
+
+    buffer.pos += 1
+    if buffer.peek() == ']':
+        return
+    while True:
+        yield _decode_item(buffer, max_item_size)
+        separator = buffer.peek()
+        if separator == ']':
+            return
+        if separator != ',':
+            found = f"'{separator}'" if separator else 'конец файла'
+            raise ValueError(f"Ожидалась ',' или ']' на позиции {buffer.position()}, найдено: {found}")
+        buffer.pos += 1
+
+
+# Разбор JSON Lines: прочитанное начало файла плюс остаток, построчно
+def _iter_json_lines(head, file, chunk_size):
+    class _Rest:
+        def __init__(self):
+            self.head = head
+
+        def read(self, size):
+            if self.head:
+                data, self.head = self.head, ''
+                return data
+            return file.read(size)
+
+    for number, line in enumerate(iter_lines(_Rest(), chunk_size), 1):
+        line = line.strip()
+        if line:
+            try:
+                yield json.loads(line)
+            except json.JSONDecodeError as error:
+                raise ValueError(f"Некорректный JSON в строке {number} JSON Lines: {error.msg}") from error
+
+
+def read_json_items(filename, chunk_size=DEFAULT_CHUNK_SIZE):
+    with open(filename, 'r', encoding='utf-8') as file:
+        yield from iter_json_items(file, chunk_size)
@@ -0,0 +1,53 @@
+# Кэш нормализующих функций (очистка текста, разбор чисел и т.п.): ограниченный LRU со счётчиками попаданий.
+# Все кэши регистрируются, чтобы в конце запуска вывести их статистику и подобрать размер.
+from functools import lru_cache, wraps
+
+DEFAULT_CACHE_SIZE = 4096
+
+_caches = {}
+
+
+# Нехешируемые аргументы (например, список или словарь из JSON) не кэшируются - функция вызывается напрямую
+def normalization_cache(maxsize=DEFAULT_CACHE_SIZE, name=None):
+    def decorator(function):
+        cached = lru_cache(maxsize=maxsize)(function)
+
+        @wraps(function)
+        def wrapper(*args, **kwargs):
+            try:
+                return cached(*args, **kwargs)
+            except TypeError:
+                try:
+                    hash((args, tuple(kwargs.items())))
+                except TypeError:
+                    return function(*args, **kwargs)
+                raise
+
+        wrapper.cache_info = cached.cache_info
+        wrapper.cache_clear = cached.cache_clear
+        _caches[name or function.__qualname__] = wrapper
+        return wrapper
+    return decorator
+
+
+# Статистика всех кэшей: попадания, промахи, доля попаданий, текущий и максимальный размер
+def cache_stats():
+    stats = {}
+    for name, cached in _caches.items():
+        info = cached.cache_info()
+        calls = info.hits + info.misses
+        stats[name] = {
+            'hits': info.hits,
+            'misses': info.misses,
+            'hit_rate': info.hits / calls if calls else None,
+            'size': info.currsize,
+            'maxsize': info.maxsize,
+        }
+    return stats
+
+
+def print_cache_stats():
+    for name, stats in cache_stats().items():
+        hit_rate = f"{stats['hit_rate']:.1%}" if stats['hit_rate'] is not None else '-'
+        print(f"Кэш {name}: попаданий {stats['hits']}, промахов {stats['misses']} ({hit_rate}), "
+              f"размер {stats['size']}/{stats['maxsize']}")
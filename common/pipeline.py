@@ -0,0 +1,106 @@
+# Параллельный разбор нескольких источников: каждый источник читается в своём потоке или процессе,
+# пакеты строк передаются через ограниченную очередь единственному потребителю (писателю в базу).
+# Потоки совмещают чтение файлов и запись в базу (sqlite3 освобождает GIL на время запросов),
+# но разбор на Python всё равно выполняется под GIL: общее время - примерно сумма времени разбора.
+# С processes=True каждый источник разбирается в отдельном процессе, и общее время приближается
+# ко времени самого медленного разборщика (плюс передача пакетов между процессами через pickle).
+# Источник для процесса - кортеж (функция, аргументы...): функция уровня модуля, возвращающая итератор строк.
+import multiprocessing
+import threading
+from queue import Empty, Full, Queue
+
+from common.bulk import DEFAULT_BATCH_SIZE, batched
+
+DEFAULT_QUEUE_SIZE = 8
+PUT_TIMEOUT = 0.1  # Как часто заблокированный источник проверяет, не остановлен ли разбор (секунды)
+
+
+# Маркеры передаются и между процессами, поэтому это классы, а не object()
+class _SourceDone:
+    pass
+
+
+class _SourceError:
+    def __init__(self, error):
+        self.error = error
+
+
+# Помещение в очередь с ожиданием места; False - разбор остановлен и элемент никому не нужен
+def _put(queue, item, stop):
+    while not stop.is_set():
+        try:
+            queue.put(item, timeout=PUT_TIMEOUT)
+            return True
+        except Full:
+            pass
+    return False
+
+
+def _produce(source, queue, batch_size, stop):
+    try:
+        for batch in batched(source, batch_size):
+            if not _put(queue, batch, stop):  # Блокируется, если очередь заполнена - память остаётся ограниченной
+                return
+    except BaseException as error:
+        _put(queue, _SourceError(error), stop)
+    finally:
+        _put(queue, _SourceDone(), stop)
+
+
+# Точка входа дочернего процесса: источник создаётся уже в процессе
+def _produce_in_process(source, queue, batch_size, stop):
+    function, *args = source
+    try:
+        rows = function(*args)
+    except BaseException as error:
+        _put(queue, _SourceError(error), stop)
+        _put(queue, _SourceDone(), stop)
+        return
+    _produce(rows, queue, batch_size, stop)
+
+
+def _drain(queue):
+    while True:
+        try:
+            queue.get_nowait()
+        except Empty:
+            break
+
+
+# Строки всех источников по мере разбора; вызывающий поток остаётся единственным писателем.
+# Если потребитель прервал чтение или один из источников завершился ошибкой, остальные источники
+# останавливаются и их потоки (процессы) завершаются до выхода из генератора
+def iter_concurrently(sources, batch_size=DEFAULT_BATCH_SIZE, queue_size=DEFAULT_QUEUE_SIZE, processes=False):
+    if processes:
+        queue = multiprocessing.Queue(maxsize=queue_size)
+        stop = multiprocessing.Event()
+        workers = [multiprocessing.Process(target=_produce_in_process, args=(source, queue, batch_size, stop),
+                                           daemon=True)
+                   for source in sources]
+    else:
+        queue = Queue(maxsize=queue_size)
+        stop = threading.Event()
+        workers = [threading.Thread(target=_produce, args=(source, queue, batch_size, stop), daemon=True)
+                   for source in sources]
+    for worker in workers:
+        worker.start()
+
+    try:
+        remaining = len(workers)
+        while remaining:
+            item = queue.get()
+            if isinstance(item, _SourceDone):
+                remaining -= 1
+            elif isinstance(item, _SourceError):
+                raise item.error
+            else:
+                yield from item
+    finally:
+        stop.set()
+        # Освобождение очереди, чтобы источники, ожидающие места, увидели остановку
+        # (процесс не завершится, пока его данные не вычитаны из канала)
+        for worker in workers:
+            while worker.is_alive():
+                _drain(queue)
+                worker.join(PUT_TIMEOUT)
+        _drain(queue)
@@ -0,0 +1,57 @@
+# Построитель параметризованных запросов для отчётов с произвольным полем/условием.
+# Имена полей проверяются по белому списку, значения условий и LIMIT передаются параметрами,
+# поэтому текст запроса одинаков для разных порогов и sqlite3 повторно использует подготовленный запрос.
+
+OPERATORS = ('=', '!=', '<', '<=', '>', '>=', 'LIKE')
+AGGREGATE_FUNCTIONS = ('SUM', 'MIN', 'MAX', 'AVG', 'COUNT')
+
+
+class QueryBuilderError(ValueError):
+    pass
+
+
+def check_field(field, allowed_fields):
+    if field not in allowed_fields:
+        raise QueryBuilderError(f"Недопустимое поле: {field!r}")
+    return field
+
+
+# Условие WHERE из списка (поле, оператор, значение), объединённых через AND
+def where_clause(predicates, allowed_fields):
+    conditions = []
+    params = []
+    for field, operator, value in predicates:
+        operator = operator.upper()
+        if operator not in OPERATORS:
+            raise QueryBuilderError(f"Недопустимый оператор: {operator!r}")
+        conditions.append(f"{check_field(field, allowed_fields)} {operator} ?")
+        params.append(value)
+    return (' WHERE ' + ' AND '.join(conditions) if conditions else ''), params
+
+
+# SELECT с необязательными условиями, сортировкой и LIMIT; возвращает (текст запроса, параметры)
+def select_query(table, allowed_fields, columns=None, predicates=(), order_by=None, descending=False, limit=None):
+    selected = ', '.join(check_field(column, allowed_fields) for column in columns) if columns else '*'
+    where, params = where_clause(predicates, allowed_fields)
+    sql = f"SELECT {selected} FROM {table}{where}"
+    if order_by is not None:
+        sql += f" ORDER BY {check_field(order_by, allowed_fields)}{' DESC' if descending else ''}"
+    if limit is not None:
+        sql += " LIMIT ?"
+        params.append(int(limit))
+    return sql, params
+
+
+# Частота значений поля: (значение, frequency)
+def frequency_query(table, allowed_fields, field):
+    field = check_field(field, allowed_fields)
+    return f"SELECT {field}, COUNT({field}) AS frequency FROM {table} GROUP BY {field}", []
+
+
+# Агрегаты по полю: SUM, MIN, MAX, AVG (или указанные функции)
+def aggregate_query(table, allowed_fields, field, functions=('SUM', 'MIN', 'MAX', 'AVG')):
+    field = check_field(field, allowed_fields)
+    for function in functions:
+        if function not in AGGREGATE_FUNCTIONS:
+            raise QueryBuilderError(f"Недопустимая агрегатная функция: {function!r}")
+    return f"SELECT {', '.join(f'{function}({field})' for function in functions)} FROM {table}", []
@@ -0,0 +1,65 @@
+# Потоковое чтение файлов формата "ключ::значение" с записями, разделёнными строкой "====="
+#
+# Пример записи:
+#   name::delightful melon
+#   price::17.51
+#   =====
+#
+# Схема таблицы задаётся кортежем (ключ, тип, значение по умолчанию), где тип - int, float, bool или str.
+# Записи возвращаются кортежами в порядке схемы, поэтому их можно сразу передавать в executemany.
+
+RECORD_SEPARATOR = '====='
+FIELD_SEPARATOR = '::'
+DEFAULT_CHUNK_SIZE = 64 * 1024
+
+
+# Преобразование строкового значения к типу поля схемы
+def convert_value(value, field_type, default):
+    if field_type is str:
+        return value
+    if field_type is bool:
+        return value == 'True'
+    try:
+        return field_type(value)
+    except ValueError:
+        return default
+
+
+# Построчное чтение файла блоками фиксированного размера (память не зависит от размера файла)
+def iter_lines(file, chunk_size=DEFAULT_CHUNK_SIZE):
+    tail = ''
+    while True:
+        chunk = file.read(chunk_size)
+        if not chunk:
+            break
+        lines = (tail + chunk).split('\n')
+        tail = lines.pop()  # Последняя строка блока может быть неполной
+        yield from lines
+    if tail:
+        yield tail
+
+
+# Генератор записей: по одному типизированному кортежу на запись
+def iter_records(file, schema, chunk_size=DEFAULT_CHUNK_SIZE):
+    types = {key: (field_type, default) for key, field_type, default in schema}
+    record = {}
+    for line in iter_lines(file, chunk_size):
+        line = line.strip()
+        if line == RECORD_SEPARATOR:
+            if record:
+                yield tuple(record.get(key, default) for key, _, default in schema)
+            record = {}
+            continue
+        key, separator, value = line.partition(FIELD_SEPARATOR)  # Каждое поле разбивается ровно один раз
+        if not separator or key not in types:
+            continue
+        field_type, default = types[key]
+        record[key] = convert_value(value.strip(), field_type, default)
+    if record:
+        yield tuple(record.get(key, default) for key, _, default in schema)
+
+
+# Чтение записей из файла по имени
+def read_records(filename, schema, chunk_size=DEFAULT_CHUNK_SIZE):
+    with open(filename, 'r', encoding='utf-8') as file:
+        yield from iter_records(file, schema, chunk_size)
@@ -0,0 +1,197 @@
+# Кэш готовых отчётов с автоматической инвалидацией.
+# Ключ - (текст запроса или отпечаток функции отчёта, параметры, версии данных таблиц, файл базы, файл отчёта
+# и доступный столбцовый формат). Отпечаток функции - её исходный код вместе с константами модуля, на которые
+# она ссылается (текст SQL, пороги, форматы вывода), и кодом вызываемых ею функций. Версия таблицы хранится в таблице
+# data_versions и меняется один раз на загрузку (bump_data_version вызывают загрузчики после записи данных),
+# а не триггером на каждую строку - массовая загрузка не выполняет лишний UPDATE для каждой вставленной строки.
+# При совпадении ключа запрос не выполняется, а файлы отчёта не перезаписываются, если они не изменились
+# (файл с прежними размером и временем изменения не читается, иначе сравнивается хэш содержимого).
+# Содержимое отчётов хранится на диске, число записей ограничено (вытесняются давно не использованные).
+import hashlib
+import inspect
+import json
+import os
+import shutil
+import threading
+import time
+
+from common.columnar import available_format
+
+DEFAULT_CACHE_DIR = '.report_cache'
+DEFAULT_MAX_ENTRIES = 64
+# Функции и классы, код которых входит в отпечаток отчёта: модуля самого отчёта и общего кода заданий
+TRACKED_PACKAGE = 'common.'
+CONSTANT_TYPES = (str, bytes, int, float, bool, type(None))
+
+
+# Таблица версий и строка версии для таблицы table; триггеры прежних версий (по строке на изменение) удаляются
+def install_data_version(cursor, table):
+    cursor.execute('''CREATE TABLE IF NOT EXISTS data_versions (
+                        table_name TEXT PRIMARY KEY,
+                        version INTEGER NOT NULL DEFAULT 0)''')
+    cursor.execute("INSERT OR IGNORE INTO data_versions (table_name, version) VALUES (?, 0)", (table,))
+    for event in ('insert', 'update', 'delete'):
+        cursor.execute(f"DROP TRIGGER IF EXISTS {table}_data_version_{event}")
+
+
+# Новая версия данных таблиц после загрузки или изменения. Версия - время изменения в наносекундах,
+# поэтому она не повторяется и после пересоздания базы (кэш отчётов хранится вне базы)
+def bump_data_version(cursor, *tables):
+    version = time.time_ns()
+    cursor.executemany("UPDATE data_versions SET version = ? WHERE table_name = ?", [(version, table) for table in tables])
+
+
+def table_versions(cursor, tables):
+    placeholders = ', '.join('?' for _ in tables)
+    cursor.execute(f"SELECT table_name, version FROM data_versions WHERE table_name IN ({placeholders})", list(tables))
+    versions = dict(tuple(row) for row in cursor.fetchall())
+    return [versions.get(table) for table in tables]
+
+
+# Имена глобальных переменных, на которые ссылается код (и вложенные в него функции, lambda, генераторы)
+def _global_names(code):
+    names = set(code.co_names)
+    for constant in code.co_consts:
+        if inspect.iscode(constant):
+            names |= _global_names(constant)
+    return names
+
+
+# Значение, представление которого одинаково между запусками: скаляры и коллекции из них
+def _plain_constant(value):
+    if isinstance(value, CONSTANT_TYPES):
+        return True
+    if isinstance(value, (tuple, list, frozenset, set)):
+        return all(_plain_constant(item) for item in value)
+    if isinstance(value, dict):
+        return all(_plain_constant(key) and _plain_constant(item) for key, item in value.items())
+    return False
+
+
+# Отпечаток функции отчёта: исходный код функции и (рекурсивно) функций и классов её модуля и common,
+# на которые она ссылается, и значения констант, которые они используют
+def report_fingerprint(report):
+    report = inspect.unwrap(report)
+    parts = {}
+    pending = [report]
+    while pending:
+        value = inspect.unwrap(pending.pop())
+        name = f"{value.__module__}.{value.__qualname__}"
+        if name in parts:
+            continue
+        parts[name] = inspect.getsource(value)
+        if not inspect.isfunction(value):
+            continue
+        for global_name in _global_names(value.__code__):
+            if global_name not in value.__globals__:
+                continue
+            referenced = value.__globals__[global_name]
+            if _plain_constant(referenced):
+                parts[f"{value.__module__}.{global_name}"] = repr(referenced)
+            elif (inspect.isfunction(referenced) or inspect.isclass(referenced)) and (
+                    referenced.__module__ == report.__module__ or referenced.__module__.startswith(TRACKED_PACKAGE)):
+                pending.append(referenced)
+    return json.dumps(sorted(parts.items()))
+
+
+# Файл основной базы соединения курсора ('' для базы в памяти)
+def database_path(cursor):
+    cursor.execute("PRAGMA database_list")
+    return next((row[2] for row in cursor.fetchall() if row[1] == 'main'), '')
+
+
+def file_state(filename):
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns}
+
+
+def file_hash(filename):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for block in iter(lambda: file.read(1024 * 1024), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class ReportCache:
+    def __init__(self, directory=DEFAULT_CACHE_DIR, max_entries=DEFAULT_MAX_ENTRIES):
+        self.directory = directory
+        self.max_entries = max_entries
+        self.index_file = os.path.join(directory, 'index.json')
+        self._fingerprints = {}
+        # Отчёты могут материализоваться из нескольких потоков (common.report_runner)
+        self._lock = threading.RLock()
+        os.makedirs(directory, exist_ok=True)
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as file:
+                self.index = json.load(file)
+        except (OSError, ValueError):
+            self.index = {}
+
+    # Ключ кэша; query - текст SQL или функция отчёта (используется её отпечаток, см. report_fingerprint),
+    # context - остальное, от чего зависит результат (файл базы, файл отчёта)
+    def key(self, query, params, versions, context=()):
+        if callable(query):
+            with self._lock:
+                if query not in self._fingerprints:
+                    self._fingerprints[query] = report_fingerprint(query)
+                query = self._fingerprints[query]
+        text = json.dumps([query, repr(tuple(params)), versions, list(context), available_format()])
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    # Отчёт output_file по данным таблиц tables: produce() вызывается, только если ключ не найден в кэше.
+    # produce() может вернуть список всех записанных файлов (например, JSON и столбцовый файл из export_report) -
+    # тогда в кэше сохраняются и восстанавливаются все они. Возвращает True, если отчёт был пересчитан.
+    def materialize(self, cursor, tables, output_file, produce, query, params=()):
+        key = self.key(query, params, table_versions(cursor, tables), (database_path(cursor), output_file))
+        with self._lock:
+            entry = self.index.get(key)
+            if entry is not None and self._restore(key, entry):
+                entry['last_used'] = time.time()
+                self._save()
+                return False
+
+        outputs = produce() or [output_file]
+        files = []
+        for number, output in enumerate(outputs):
+            shutil.copyfile(output, self._stored_file(key, number))
+            files.append({'output': output, 'sha256': file_hash(output), **file_state(output)})
+        with self._lock:
+            self.index[key] = {'files': files, 'last_used': time.time()}
+            self._evict()
+            self._save()
+        return True
+
+    def _stored_file(self, key, number):
+        return os.path.join(self.directory, f"{key}.{number}")
+
+    # Восстановление файлов отчёта из кэша (только отсутствующих или изменённых); False, если запись неполная.
+    # Файл с теми же размером и временем изменения, что при записи (или прошлой проверке), не хэшируется
+    def _restore(self, key, entry):
+        files = entry.get('files')
+        if not files or not all(os.path.exists(self._stored_file(key, number)) for number in range(len(files))):
+            return False
+        for number, file in enumerate(files):
+            output = file['output']
+            state = file_state(output) if os.path.exists(output) else None
+            if state is not None and state == {'size': file.get('size'), 'mtime_ns': file.get('mtime_ns')}:
+                continue
+            if state is None or file_hash(output) != file['sha256']:
+                shutil.copyfile(self._stored_file(key, number), output)
+            file.update(file_state(output))
+        return True
+
+    # Вытеснение давно не использованных записей сверх max_entries
+    def _evict(self):
+        while len(self.index) > self.max_entries:
+            oldest = min(self.index, key=lambda key: self.index[key]['last_used'])
+            entry = self.index.pop(oldest)
+            for number in range(len(entry.get('files', ()))):
+                try:
+                    os.remove(self._stored_file(oldest, number))
+                except OSError:
+                    pass
+
+    def _save(self):
+        with open(self.index_file, 'w', encoding='utf-8') as file:
+            json.dump(self.index, file)
@@ -0,0 +1,63 @@
+# Параллельное выполнение независимых отчётов: задания (функция отчёта, файл) выполняются в пуле потоков,
+# у каждого задания своё соединение только для чтения (URI с mode=ro). sqlite3 освобождает GIL на время
+# выполнения запроса, поэтому запросы одних отчётов идут одновременно с записью файлов других.
+# Чтение параллельно с открытым соединением-писателем требует режима WAL (см. enable_wal).
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.request import pathname2url
+
+from common.export import export_report
+from common.instrumentation import trace_connection
+
+DEFAULT_WORKERS = min(8, os.cpu_count() or 1)
+
+
+# Описание задания: report(cursor) возвращает записи отчёта, которые пишутся в output_file
+def report_job(report, output_file, **export_options):
+    return {'report': report, 'output': output_file, 'export_options': export_options}
+
+
+def enable_wal(conn):
+    conn.execute("PRAGMA journal_mode = WAL")
+
+
+def connect_read_only(db_path):
+    conn = sqlite3.connect(f"file:{pathname2url(os.path.abspath(db_path))}?mode=ro", uri=True)
+    trace_connection(conn, count_changes=False)
+    return conn
+
+
+# Одно задание в своём потоке; с cache отчёт пересчитывается, только если изменились данные таблиц tables
+def _run_job(db_path, job, cache, tables):
+    started = time.perf_counter()
+    conn = connect_read_only(db_path)
+    try:
+        cursor = conn.cursor()
+        produce = lambda: export_report(job['report'](cursor), job['output'], **job['export_options'])
+        if cache is None:
+            produce()
+            recomputed = True
+        else:
+            # Параметры записи (форматы, сжатие и т.п.) - часть ключа кэша
+            recomputed = cache.materialize(cursor, tables, job['output'], produce, job['report'],
+                                           sorted(job['export_options'].items()))
+    finally:
+        conn.close()
+    return {'report': job['report'].__name__, 'output': job['output'], 'recomputed': recomputed,
+            'seconds': round(time.perf_counter() - started, 6)}
+
+
+# Выполнение заданий в пуле потоков; результат - время выполнения каждого задания (в порядке заданий)
+def run_reports(db_path, jobs, workers=DEFAULT_WORKERS, cache=None, tables=()):
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_job, db_path, job, cache, tables) for job in jobs]
+        results = [future.result() for future in futures]
+
+    for result in results:
+        status = 'пересчитан' if result['recomputed'] else 'из кэша'
+        print(f"Отчёт {result['output']}: {result['seconds']:.3f} с ({status})")
+    print(f"Отчёты выполнены за {time.perf_counter() - started:.3f} с ({workers} потоков)")
+    return results
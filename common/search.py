@@ -0,0 +1,124 @@
+# Полнотекстовый поиск по текстовым столбцам таблицы через FTS5 (индекс с внешним содержимым - тексты не дублируются).
+# Индекс заполняется одной командой 'rebuild' после массовой загрузки, а дальше поддерживается триггерами
+# на INSERT/UPDATE/DELETE исходной таблицы. Если SQLite собран без FTS5, поиск выполняется через LIKE (без ранжирования).
+# Ранжирование bm25 оценивает все совпадения, поэтому запрос из слов, встречающихся почти в каждой строке,
+# на сотнях тысяч строк заметно медленнее избирательного.
+import sqlite3
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 1000
+DEFAULT_TOKENIZE = 'unicode61 remove_diacritics 2'  # 'trigram' - поиск по подстрокам (SQLite 3.34+)
+
+
+class SearchError(ValueError):
+    pass
+
+
+def fts5_available(cursor):
+    try:
+        cursor.execute("CREATE VIRTUAL TABLE temp.fts5_probe USING fts5(value)")
+        cursor.execute("DROP TABLE temp.fts5_probe")
+    except Exception:
+        return False
+    return True
+
+
+def index_exists(cursor, index_table):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (index_table,))
+    return cursor.fetchone() is not None
+
+
+# Индекс index_table по столбцам columns таблицы source_table (ключ - id). Новый индекс заполняется сразу.
+# Возвращает False, если FTS5 недоступен.
+def install_search_index(cursor, index_table, source_table, columns, tokenize=DEFAULT_TOKENIZE):
+    if not fts5_available(cursor):
+        return False
+
+    created = not index_exists(cursor, index_table)
+    column_list = ', '.join(columns)
+    new_values = ', '.join(f"new.{column}" for column in columns)
+    old_values = ', '.join(f"old.{column}" for column in columns)
+    cursor.execute(f"""CREATE VIRTUAL TABLE IF NOT EXISTS {index_table} USING fts5(
+                           {column_list}, content='{source_table}', content_rowid='id', tokenize='{tokenize}')""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {index_table}_insert AFTER INSERT ON {source_table} BEGIN
+                           INSERT INTO {index_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+                       END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {index_table}_delete AFTER DELETE ON {source_table} BEGIN
+                           INSERT INTO {index_table} ({index_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                       END""")
+    cursor.execute(f"""CREATE TRIGGER IF NOT EXISTS {index_table}_update AFTER UPDATE OF {column_list} ON {source_table} BEGIN
+                           INSERT INTO {index_table} ({index_table}, rowid, {column_list}) VALUES ('delete', old.id, {old_values});
+                           INSERT INTO {index_table} (rowid, {column_list}) VALUES (new.id, {new_values});
+                       END""")
+    if created:
+        rebuild_search_index(cursor, index_table)
+    return True
+
+
+# Полное перестроение индекса по текущему содержимому таблицы (после массовой загрузки без триггеров)
+def rebuild_search_index(cursor, index_table):
+    cursor.execute(f"INSERT INTO {index_table} ({index_table}) VALUES ('rebuild')")
+
+
+# Шаблон LIKE для поиска подстроки: % и _ в тексте пользователя - обычные символы
+def like_pattern(text):
+    escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+    return f"%{escaped}%"
+
+
+def _quote(term):
+    return '"' + term.replace('"', '""') + '"'
+
+
+# Запрос FTS5 из текста пользователя: слова через AND, phrase - точная фраза, prefix - последнее слово как префикс
+# ("Titl" находит "Title"); raw - текст уже в синтаксисе FTS5 (OR, NEAR, column:...)
+def match_expression(text, prefix=False, phrase=False, raw=False):
+    if raw:
+        return text
+    terms = text.split()
+    if not terms:
+        return None
+    if phrase:
+        expression = _quote(' '.join(terms))
+        return expression + ' *' if prefix else expression
+    expression = ' '.join(_quote(term) for term in terms)
+    return expression + ' *' if prefix else expression
+
+
+# Страница результатов поиска, лучшие совпадения первыми (bm25): {'hits': [...], 'page', 'page_size', 'has_more'}.
+# Каждое совпадение - словарь со столбцами result_columns исходной таблицы и рангом (меньше - лучше).
+# Ошибки пользователя (номер или размер страницы, синтаксис raw-запроса) - SearchError
+def search(cursor, index_table, source_table, result_columns, text, page=1, page_size=DEFAULT_PAGE_SIZE,
+           prefix=False, phrase=False, raw=False, search_columns=None):
+    if not isinstance(page, int) or page < 1:
+        raise SearchError(f"Номер страницы должен быть целым числом не меньше 1: {page!r}")
+    if not isinstance(page_size, int) or not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise SearchError(f"Размер страницы должен быть целым числом от 1 до {MAX_PAGE_SIZE}: {page_size!r}")
+    offset = (page - 1) * page_size
+    selected = ', '.join(f"s.{column}" for column in result_columns)
+    expression = match_expression(text, prefix, phrase, raw)
+    if expression is None:
+        rows = []
+    elif index_exists(cursor, index_table):
+        try:
+            cursor.execute(f"""SELECT {selected}, {index_table}.rank FROM {index_table}
+                               JOIN {source_table} AS s ON s.id = {index_table}.rowid
+                               WHERE {index_table} MATCH ? ORDER BY {index_table}.rank LIMIT ? OFFSET ?""",
+                           (expression, page_size + 1, offset))
+            rows = cursor.fetchall()
+        except sqlite3.OperationalError as error:  # Синтаксис FTS5 в raw-запросе
+            raise SearchError(f"Некорректный поисковый запрос {text!r}: {error}") from error
+    else:
+        # Без FTS5: подстрока в любом из столбцов search_columns, порядок - по id
+        columns = search_columns or result_columns
+        condition = ' OR '.join(f"s.{column} LIKE ? ESCAPE '\\'" for column in columns)
+        cursor.execute(f"""SELECT {selected}, NULL FROM {source_table} AS s WHERE {condition}
+                           ORDER BY s.id LIMIT ? OFFSET ?""",
+                       tuple(like_pattern(text) for _ in columns) + (page_size + 1, offset))
+        rows = cursor.fetchall()
+
+    hits = []
+    for row in rows[:page_size]:
+        values = tuple(row)
+        hits.append(dict(zip(result_columns, values[:-1]), rank=values[-1]))
+    return {'query': text, 'page': page, 'page_size': page_size, 'has_more': len(rows) > page_size, 'hits': hits}
@@ -0,0 +1,196 @@
+# Столбцовый кэш рядом с .pkl-источником (список словарей): при первом чтении файл распаковывается один раз
+# и раскладывается по столбцам в каталог "<источник>.columns":
+#   числа и bool - массивы .npy, которые открываются через memory-mapping;
+#   строки - смещения (.offsets.npy) и общий буфер UTF-8 (.blob);
+#   остальные столбцы (значения разных типов, кортежи, даты, bytes, int вне диапазона int64) - списком в pickle;
+#   None - маска .nulls.npy (только если в столбце есть пропуски).
+# Повторные чтения не распаковывают pickle источника и не создают словари: строки собираются пакетами из столбцов.
+# Актуальность проверяется по размеру и времени изменения источника, а если они изменились - по хэшам блоков
+# содержимого (те же, что в отпечатке common.incremental, поэтому загрузчик может передать уже посчитанный
+# отпечаток). Без numpy используется обычный pickle.load.
+import json
+import os
+import pickle
+import shutil
+
+try:
+    import numpy
+except ImportError:
+    numpy = None
+
+from common.bulk import DEFAULT_BATCH_SIZE
+from common.incremental import chunk_hashes
+
+SIDECAR_SUFFIX = '.columns'
+META_FILE = 'meta.json'
+SIDECAR_VERSION = 2
+
+NUMERIC_DTYPES = {'bool': 'bool', 'int': 'int64', 'float': 'float64'}
+
+
+def sidecar_directory(filename):
+    return filename + SIDECAR_SUFFIX
+
+
+# Тип столбца: bool, int, float, text или pickle (всё, что нельзя без потерь сохранить в массиве или как текст)
+def value_column_type(values):
+    kinds = {type(value) for value in values if value is not None}
+    if len(kinds) != 1:
+        return 'pickle' if kinds else 'text'
+    kind = kinds.pop()
+    if kind is bool:
+        return 'bool'
+    if kind is int:
+        return 'int' if all(value is None or -2 ** 63 <= value < 2 ** 63 for value in values) else 'pickle'
+    if kind is float:
+        return 'float'
+    if kind is str:
+        return 'text'
+    return 'pickle'
+
+
+def _write_text(directory, name, texts):
+    offsets = numpy.zeros(len(texts) + 1, dtype='int64')
+    with open(os.path.join(directory, f"{name}.blob"), 'wb') as blob:
+        position = 0
+        for index, text in enumerate(texts):
+            data = text.encode('utf-8')
+            blob.write(data)
+            position += len(data)
+            offsets[index + 1] = position
+    numpy.save(os.path.join(directory, f"{name}.offsets.npy"), offsets)
+
+
+# Отметка об источнике в meta.json: размер, время изменения и хэши блоков содержимого
+def source_stamp(filename, hashes):
+    stat = os.stat(filename)
+    return {'size': stat.st_size, 'mtime_ns': stat.st_mtime_ns, 'chunk_hashes': hashes}
+
+
+# Разбор pickle и запись столбцов; meta.json пишется последним, поэтому прерванная запись считается устаревшей.
+# hashes - хэши блоков источника, если они уже посчитаны
+def build_sidecar(filename, hashes=None):
+    directory = sidecar_directory(filename)
+    shutil.rmtree(directory, ignore_errors=True)
+    os.makedirs(directory)
+    source = source_stamp(filename, hashes if hashes is not None else chunk_hashes(filename))
+
+    with open(filename, 'rb') as file:
+        items = pickle.load(file)
+
+    names = []
+    for item in items:
+        for name in item:
+            if name not in names:
+                names.append(name)
+
+    columns = []
+    for index, name in enumerate(names):
+        values = [item.get(name) for item in items]
+        kind = value_column_type(values)
+        nulls = [value is None for value in values]
+        stem = f"c{index}"
+        if kind in NUMERIC_DTYPES:
+            array = numpy.array([0 if value is None else value for value in values], dtype=NUMERIC_DTYPES[kind])
+            numpy.save(os.path.join(directory, f"{stem}.npy"), array)
+        elif kind == 'text':
+            _write_text(directory, stem, ['' if value is None else value for value in values])
+        else:
+            with open(os.path.join(directory, f"{stem}.pkl"), 'wb') as file:
+                pickle.dump(values, file, protocol=pickle.HIGHEST_PROTOCOL)
+        if any(nulls) and kind != 'pickle':
+            numpy.save(os.path.join(directory, f"{stem}.nulls.npy"), numpy.array(nulls, dtype='bool'))
+        columns.append({'name': name, 'type': kind, 'file': stem, 'nulls': any(nulls) and kind != 'pickle'})
+
+    meta = {'version': SIDECAR_VERSION, 'source': source, 'rows': len(items), 'columns': columns}
+    write_meta(filename, meta)
+    return meta
+
+
+def write_meta(filename, meta):
+    with open(os.path.join(sidecar_directory(filename), META_FILE), 'w', encoding='utf-8') as file:
+        json.dump(meta, file, ensure_ascii=False, indent=4)
+
+
+def read_meta(filename):
+    try:
+        with open(os.path.join(sidecar_directory(filename), META_FILE), 'r', encoding='utf-8') as file:
+            meta = json.load(file)
+    except (OSError, ValueError):
+        return None
+    return meta if meta.get('version') == SIDECAR_VERSION else None
+
+
+# Столбцы, открытые без копирования: массивы - numpy.memmap, строки - смещения и буфер через memmap
+class SidecarTable:
+    def __init__(self, directory, meta):
+        self.rows = meta['rows']
+        self.columns = {}
+        for column in meta['columns']:
+            path = os.path.join(directory, column['file'])
+            if column['type'] in NUMERIC_DTYPES:
+                data = numpy.load(f"{path}.npy", mmap_mode='r')
+            elif column['type'] == 'pickle':
+                with open(f"{path}.pkl", 'rb') as file:
+                    data = pickle.load(file)  # Столбец целиком в памяти
+            else:
+                offsets = numpy.load(f"{path}.offsets.npy", mmap_mode='r')
+                blob = numpy.memmap(f"{path}.blob", dtype='uint8', mode='r') if offsets[-1] else None
+                data = (offsets, blob)
+            nulls = numpy.load(f"{path}.nulls.npy", mmap_mode='r') if column['nulls'] else None
+            self.columns[column['name']] = (column['type'], data, nulls)
+
+    # Значения столбца для строк [start, stop) как объекты Python
+    def column_slice(self, name, start, stop):
+        if name not in self.columns:
+            return [None] * (stop - start)
+        kind, data, nulls = self.columns[name]
+        if kind in NUMERIC_DTYPES:
+            values = data[start:stop].tolist()
+        elif kind == 'pickle':
+            values = data[start:stop]
+        else:
+            offsets, blob = data
+            bounds = offsets[start:stop + 1].tolist()
+            chunk = blob[bounds[0]:bounds[-1]].tobytes() if blob is not None else b''
+            base = bounds[0]
+            values = [chunk[begin - base:end - base].decode('utf-8') for begin, end in zip(bounds, bounds[1:])]
+        if nulls is not None:
+            values = [None if null else value for value, null in zip(values, nulls[start:stop].tolist())]
+        return values
+
+    # Кортежи значений полей fields пакетами по batch_size строк
+    def iter_rows(self, fields, batch_size=DEFAULT_BATCH_SIZE):
+        for start in range(0, self.rows, batch_size):
+            stop = min(start + batch_size, self.rows)
+            yield from zip(*(self.column_slice(name, start, stop) for name in fields))
+
+
+# Столбцовый кэш источника (создаётся или пересоздаётся, если источник изменился); None без numpy.
+# Источник читается для проверки, только если изменились его размер или время изменения;
+# fingerprint - отпечаток источника из common.incremental.source_changed, тогда источник не читается и в этом случае
+def open_sidecar(filename, fingerprint=None):
+    if numpy is None:
+        return None
+    meta = read_meta(filename)
+    stat = os.stat(filename)
+    if meta is None or (meta['source']['size'], meta['source']['mtime_ns']) != (stat.st_size, stat.st_mtime_ns):
+        hashes = fingerprint['chunk_hashes'] if fingerprint is not None else chunk_hashes(filename)
+        if meta is None or meta['source']['chunk_hashes'] != hashes:
+            print(f"Построение столбцового кэша: {filename}")
+            meta = build_sidecar(filename, hashes)
+        else:
+            meta['source'] = source_stamp(filename, hashes)  # Содержимое то же - обновляем только время
+            write_meta(filename, meta)
+    return SidecarTable(sidecar_directory(filename), meta)
+
+
+# Кортежи значений полей fields из .pkl-источника (отсутствующие поля - None)
+def iter_pickle_rows(filename, fields, batch_size=DEFAULT_BATCH_SIZE, fingerprint=None):
+    table = open_sidecar(filename, fingerprint)
+    if table is not None:
+        return table.iter_rows(fields, batch_size)
+
+    with open(filename, 'rb') as file:
+        items = pickle.load(file)
+    return (tuple(item.get(name) for name in fields) for item in items)
@@ -0,0 +1,184 @@
+# Сводная таблица агрегатов по группам, поддерживаемая триггерами на INSERT/UPDATE/DELETE исходной таблицы.
+# Для каждой меры хранятся count, sum, сумма квадратов, min и max; сумма и count обновляются инкрементально,
+# (без объявленного типа, чтобы суммы целых оставались целыми), а min/max помечаются устаревшими (stale), только если удалено текущее крайнее значение,
+# и пересчитываются только для таких групп: refresh_stale на соединении-писателе, а до этого read_summary
+# считает их по исходной таблице без записи.
+# NULL - отдельная группа: строки сводки ищутся через IS, а не =, поэтому строки с NULL в столбце группы
+# попадают в одну строку сводки, а не теряются.
+#
+# Мера задаётся как (имя, выражение, условие). В выражении и условии {row} заменяется на NEW/OLD
+# (в триггерах) или на имя исходной таблицы (при пересчёте), например ('price', '{row}.price', None).
+import math
+import re
+
+MEASURE_COLUMNS = ('count', 'sum', 'sum_squares', 'min', 'max', 'stale')
+
+
+def _condition(condition, row):
+    return condition.format(row=row) if condition else '1'
+
+
+# Фрагменты SET для добавления строки row в группу
+def _add_row(measures, row):
+    parts = ['row_count = row_count + 1']
+    for name, expression, condition in measures:
+        value, cond = expression.format(row=row), _condition(condition, row)
+        parts += [
+            f"{name}_count = {name}_count + (CASE WHEN {cond} AND {value} IS NOT NULL THEN 1 ELSE 0 END)",
+            f"{name}_sum = {name}_sum + (CASE WHEN {cond} THEN COALESCE({value}, 0) ELSE 0 END)",
+            f"{name}_sum_squares = {name}_sum_squares + (CASE WHEN {cond} THEN COALESCE({value} * {value}, 0) ELSE 0 END)",
+            f"{name}_min = CASE WHEN {cond} AND ({name}_min IS NULL OR {value} < {name}_min) THEN {value} ELSE {name}_min END",
+            f"{name}_max = CASE WHEN {cond} AND ({name}_max IS NULL OR {value} > {name}_max) THEN {value} ELSE {name}_max END",
+        ]
+    return ', '.join(parts)
+
+
+# Фрагменты SET для удаления строки row из группы
+def _remove_row(measures, row):
+    parts = ['row_count = row_count - 1']
+    for name, expression, condition in measures:
+        value, cond = expression.format(row=row), _condition(condition, row)
+        parts += [
+            f"{name}_count = {name}_count - (CASE WHEN {cond} AND {value} IS NOT NULL THEN 1 ELSE 0 END)",
+            f"{name}_sum = {name}_sum - (CASE WHEN {cond} THEN COALESCE({value}, 0) ELSE 0 END)",
+            f"{name}_sum_squares = {name}_sum_squares - (CASE WHEN {cond} THEN COALESCE({value} * {value}, 0) ELSE 0 END)",
+            f"{name}_stale = CASE WHEN {cond} AND ({value} <= {name}_min OR {value} >= {name}_max) THEN 1 ELSE {name}_stale END",
+        ]
+    return ', '.join(parts)
+
+
+# Создание сводной таблицы и триггеров; при первом создании таблица заполняется по текущим данным
+def install_summary(cursor, summary_table, source_table, group_column, measures):
+    cursor.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (summary_table,))
+    created = cursor.fetchone() is None
+
+    columns = [f"{group_column} PRIMARY KEY", "row_count INTEGER NOT NULL DEFAULT 0"]
+    for name, _, _ in measures:
+        columns += [f"{name}_count INTEGER NOT NULL DEFAULT 0", f"{name}_sum NOT NULL DEFAULT 0",
+                    f"{name}_sum_squares NOT NULL DEFAULT 0", f"{name}_min", f"{name}_max",
+                    f"{name}_stale INTEGER NOT NULL DEFAULT 0"]
+    cursor.execute(f"CREATE TABLE IF NOT EXISTS {summary_table} ({', '.join(columns)})")
+
+    # Первичный ключ не мешает нескольким NULL, поэтому наличие группы проверяется явно
+    ensure_group = ("INSERT INTO {table} ({group}) SELECT {row}.{group} "
+                    "WHERE NOT EXISTS (SELECT 1 FROM {table} WHERE {group} IS {row}.{group});")
+    drop_empty = "DELETE FROM {table} WHERE {group} IS {row}.{group} AND row_count = 0;"
+    add = "UPDATE {table} SET {sets} WHERE {group} IS {row}.{group};"
+    watched = ', '.join(sorted({group_column} | _referenced_columns(measures)))
+    triggers = {
+        'insert': (f"AFTER INSERT ON {source_table}", [
+            ensure_group.format(table=summary_table, group=group_column, row='NEW'),
+            add.format(table=summary_table, sets=_add_row(measures, 'NEW'), group=group_column, row='NEW'),
+        ]),
+        'delete': (f"AFTER DELETE ON {source_table}", [
+            add.format(table=summary_table, sets=_remove_row(measures, 'OLD'), group=group_column, row='OLD'),
+            drop_empty.format(table=summary_table, group=group_column, row='OLD'),
+        ]),
+        'update': (f"AFTER UPDATE OF {watched} ON {source_table}", [
+            add.format(table=summary_table, sets=_remove_row(measures, 'OLD'), group=group_column, row='OLD'),
+            ensure_group.format(table=summary_table, group=group_column, row='NEW'),
+            add.format(table=summary_table, sets=_add_row(measures, 'NEW'), group=group_column, row='NEW'),
+            drop_empty.format(table=summary_table, group=group_column, row='OLD'),
+        ]),
+    }
+    # Триггеры другой версии (например, без отдельной группы NULL) заменяются, а сводка пересчитывается заново
+    outdated = False
+    for event, (timing, statements) in triggers.items():
+        name = f"{summary_table}_{event}"
+        sql = f"CREATE TRIGGER {name} {timing} BEGIN {' '.join(statements)} END"
+        cursor.execute("SELECT sql FROM sqlite_master WHERE type = 'trigger' AND name = ?", (name,))
+        existing = cursor.fetchone()
+        if existing is None or existing[0] != sql:
+            outdated = outdated or existing is not None
+            cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            cursor.execute(sql)
+
+    if created or outdated:
+        rebuild_summary(cursor, summary_table, source_table, group_column, measures)
+
+
+# Столбцы исходной таблицы, от которых зависят меры (для триггера UPDATE OF ...)
+def _referenced_columns(measures):
+    columns = set()
+    for _, expression, condition in measures:
+        for text in (expression, condition or ''):
+            columns.update(re.findall(r'\{row\}\.(\w+)', text))
+    return columns
+
+
+# Агрегаты мер по исходной таблице (для всей таблицы или одной группы)
+def _aggregate_columns(measures, source_table):
+    columns = ['COUNT(*)']
+    for name, expression, condition in measures:
+        value, cond = expression.format(row=source_table), _condition(condition, source_table)
+        conditional = f"CASE WHEN {cond} THEN {value} END"
+        columns += [f"COUNT({conditional})", f"COALESCE(SUM({conditional}), 0)",
+                    f"COALESCE(SUM(({conditional}) * ({conditional})), 0)", f"MIN({conditional})", f"MAX({conditional})"]
+    return ', '.join(columns)
+
+
+def _measure_column_names(measures):
+    names = ['row_count']
+    for name, _, _ in measures:
+        names += [f"{name}_count", f"{name}_sum", f"{name}_sum_squares", f"{name}_min", f"{name}_max"]
+    return names
+
+
+# Полный пересчёт сводной таблицы
+def rebuild_summary(cursor, summary_table, source_table, group_column, measures):
+    names = _measure_column_names(measures)
+    cursor.execute(f"DELETE FROM {summary_table}")
+    cursor.execute(f'''INSERT INTO {summary_table} ({group_column}, {', '.join(names)})
+                       SELECT {group_column}, {_aggregate_columns(measures, source_table)}
+                       FROM {source_table} GROUP BY {group_column}''')
+
+
+def _stale_condition(measures):
+    return ' OR '.join(f"{name}_stale = 1" for name, _, _ in measures)
+
+
+# Агрегаты мер одной группы по исходной таблице (в порядке _measure_column_names)
+def _group_aggregates(cursor, source_table, group_column, measures, group):
+    cursor.execute(f"SELECT {_aggregate_columns(measures, source_table)} FROM {source_table} WHERE {group_column} IS ?",
+                   (group,))
+    return tuple(cursor.fetchone())
+
+
+# Пересчёт и сохранение групп с устаревшими min/max (на соединении-писателе)
+def refresh_stale(cursor, summary_table, source_table, group_column, measures):
+    cursor.execute(f"SELECT {group_column} FROM {summary_table} WHERE {_stale_condition(measures)}")
+    groups = [row[0] for row in cursor.fetchall()]
+    names = _measure_column_names(measures)
+    assignments = ', '.join(f"{name} = ?" for name in names)
+    reset = ', '.join(f"{name}_stale = 0" for name, _, _ in measures)
+    for group in groups:
+        values = _group_aggregates(cursor, source_table, group_column, measures, group)
+        cursor.execute(f"UPDATE {summary_table} SET {assignments}, {reset} WHERE {group_column} IS ?", values + (group,))
+    return len(groups)
+
+
+# Чтение сводки: {group_column: группа, row_count, <мера>: {count, sum, min, max, avg, stddev}}.
+# Только чтение (подходит для соединений mode=ro): устаревшие группы считаются по исходной таблице, но не сохраняются
+def read_summary(cursor, summary_table, source_table, group_column, measures):
+    names = _measure_column_names(measures)
+    cursor.execute(f"""SELECT {group_column}, {_stale_condition(measures)}, {', '.join(names)}
+                       FROM {summary_table} ORDER BY {group_column}""")
+    results = []
+    for row in cursor.fetchall():
+        row_values = _group_aggregates(cursor, source_table, group_column, measures, row[0]) if row[1] else row[2:]
+        values = dict(zip(names, row_values))
+        result = {group_column: row[0], 'row_count': values['row_count']}
+        for name, _, _ in measures:
+            count = values[f"{name}_count"]
+            total = values[f"{name}_sum"]
+            mean = total / count if count else None
+            result[name] = {
+                'count': count,
+                'sum': total if count else None,
+                'min': values[f"{name}_min"] if count else None,
+                'max': values[f"{name}_max"] if count else None,
+                'avg': mean,
+                'stddev': math.sqrt(max(values[f"{name}_sum_squares"] / count - mean * mean, 0.0)) if count else None,
+            }
+        results.append(result)
+    return results
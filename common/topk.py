@@ -0,0 +1,121 @@
+# Top-K / Bottom-K за один проход с ограниченными кучами (память O(K)).
+# Если для сортировки есть подходящий индекс (в плане нет "USE TEMP B-TREE"), используется ORDER BY ... LIMIT,
+# иначе все запросы top-K по одной таблице обслуживаются одним сканированием.
+import heapq
+from itertools import count
+
+from common.index_advisor import explain
+
+
+class _Reversed:
+    __slots__ = ('value',)
+
+    def __init__(self, value):
+        self.value = value
+
+    def __lt__(self, other):
+        return other.value < self.value
+
+    def __eq__(self, other):
+        return self.value == other.value
+
+
+# Ограниченная куча: хранит K лучших элементов по ключу
+class TopK:
+    def __init__(self, k, key, largest=True):
+        self.k = k
+        self.key = key
+        self.largest = largest
+        self._heap = []
+        self._order = count()
+
+    def push(self, item):
+        value = self.key(item)
+        # В корне кучи - худший из сохранённых элементов
+        entry = (value if self.largest else _Reversed(value), next(self._order), item)
+        if len(self._heap) < self.k:
+            heapq.heappush(self._heap, entry)
+        elif self._heap[0][0] < entry[0]:
+            heapq.heapreplace(self._heap, entry)
+
+    def items(self):
+        entries = sorted(self._heap, key=lambda entry: entry[0], reverse=True)
+        return [item for _, _, item in entries]
+
+
+# Описание запроса top-K: order_by - столбцы ключа (первый - основной), largest - по убыванию
+def top_k_spec(name, order_by, k, largest=True):
+    return {'name': name, 'order_by': list(order_by), 'k': k, 'largest': largest}
+
+
+def _order_sql(spec):
+    direction = ' DESC' if spec['largest'] else ''
+    return ', '.join(f"{column}{direction}" for column in spec['order_by'])
+
+
+# Ключ сортировки строки как в SQLite: NULL меньше любого значения (первым по возрастанию, последним по убыванию)
+def _sort_key(row, indexes):
+    return tuple((row[i] is not None, row[i]) for i in indexes)
+
+
+# Несколько запросов top-K по одной таблице: {имя: список строк со столбцами columns}.
+# Строки с NULL в основном столбце сортировки не учитываются, NULL в остальных столбцах упорядочиваются как в SQLite.
+def top_k_reports(cursor, table, columns, specs, use_index=True):
+    results = {}
+    scan_specs = []
+    for spec in specs:
+        sql = (f"SELECT {', '.join(columns)} FROM {table} WHERE {spec['order_by'][0]} IS NOT NULL "
+               f"ORDER BY {_order_sql(spec)} LIMIT ?")
+        if use_index and not any('USE TEMP B-TREE' in detail for detail in explain(cursor, sql, (spec['k'],))):
+            cursor.execute(sql, (spec['k'],))
+            results[spec['name']] = cursor.fetchall()
+        else:
+            scan_specs.append(spec)
+
+    if scan_specs:
+        order_columns = sorted({column for spec in scan_specs for column in spec['order_by']} - set(columns))
+        selected = list(columns) + order_columns
+        positions = {column: index for index, column in enumerate(selected)}
+        heaps = []
+        for spec in scan_specs:
+            indexes = [positions[column] for column in spec['order_by']]
+            heaps.append((spec, TopK(spec['k'], lambda row, indexes=indexes: _sort_key(row, indexes), spec['largest'])))
+        cursor.execute(f"SELECT {', '.join(selected)} FROM {table}")
+        while True:
+            rows = cursor.fetchmany(1000)
+            if not rows:
+                break
+            for row in rows:
+                for spec, heap in heaps:
+                    if row[positions[spec['order_by'][0]]] is not None:
+                        heap.push(row)
+        for spec, heap in heaps:
+            results[spec['name']] = [row[:len(columns)] if order_columns else row for row in heap.items()]
+    return results
+
+
+# Текущий top-K для монотонно растущих оценок (например, счётчиков обновлений), обновляемый по ходу изменений.
+# Удаление элемента из top-K делает список неполным (следующий кандидат неизвестен) - тогда нужен пересчёт.
+class RunningTopK:
+    def __init__(self, k, entries=()):
+        self.k = k
+        self.entries = {}
+        self.complete = True
+        for item_id, score, payload in entries:
+            self.entries[item_id] = (score, payload)
+
+    def update(self, item_id, score, payload=None):
+        if item_id in self.entries or len(self.entries) < self.k:
+            self.entries[item_id] = (score, payload)
+            return
+        worst_id = min(self.entries, key=lambda key: self.entries[key][0])
+        if self.entries[worst_id][0] < score:
+            del self.entries[worst_id]
+            self.entries[item_id] = (score, payload)
+
+    def remove(self, item_id):
+        if self.entries.pop(item_id, None) is not None:
+            self.complete = False
+
+    def items(self):
+        return sorted(self.entries.items(), key=lambda entry: entry[1][0], reverse=True)
@@ -1,25 +1,58 @@
+import argparse
+import os
+import sys
 import sqlite3
-import json
 import csv
 
-
-# 1. Создание таблиц
-def create_tables(cursor):
-    # Удаляем старые таблицы, если они существуют
-    cursor.execute('''DROP TABLE IF EXISTS Movies_and_Shows''')
-    cursor.execute('''DROP TABLE IF EXISTS Genres''')
-    cursor.execute('''DROP TABLE IF EXISTS Countries''')
-    cursor.execute('''DROP TABLE IF EXISTS Reviews''')
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.bulk import DEFAULT_BATCH_SIZE, batched
+from common.dimensions import DimensionCache
+from common.export import iter_rows
+from common.incremental import SourceLoad, ensure_natural_key, record_source, source_changed
+from common.index_advisor import advise_indexes, report_query
+from common.instrumentation import instrumented, trace_connection, write_run_report
+from common.json_stream import read_json_items
+from common.normalize_cache import normalization_cache, print_cache_stats
+from common.pipeline import DEFAULT_QUEUE_SIZE, iter_concurrently
+from common.report_cache import ReportCache, bump_data_version, install_data_version
+from common.report_runner import enable_wal, report_job, run_reports
+from common.search import DEFAULT_PAGE_SIZE, SearchError, install_search_index, search
+from common.topk import top_k_reports, top_k_spec
+
+
+# Версия схемы таблиц (хранится в PRAGMA user_version и в отпечатках источников): база с другой версией
+# создаётся заново, и оба источника загружаются заново
+SCHEMA_VERSION = 5
+
+
+# 1. Создание таблиц (reset - удалить существующие таблицы и данные)
+def create_tables(cursor, reset=False):
+    cursor.execute("PRAGMA user_version")
+    if reset or cursor.fetchone()[0] != SCHEMA_VERSION:
+        # Удаляем старые таблицы, если они существуют
+        cursor.execute('''DROP TABLE IF EXISTS Movies_search''')
+        cursor.execute('''DROP TABLE IF EXISTS Movies_and_Shows''')
+        cursor.execute('''DROP TABLE IF EXISTS Genres''')
+        cursor.execute('''DROP TABLE IF EXISTS Countries''')
+        cursor.execute('''DROP TABLE IF EXISTS Ratings''')
+        cursor.execute('''DROP TABLE IF EXISTS Reviews''')
+        cursor.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
 
     # Таблица жанров
     cursor.execute('''CREATE TABLE IF NOT EXISTS Genres (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        genre_name TEXT)''')
+                        genre_name TEXT UNIQUE)''')
 
     # Таблица стран
     cursor.execute('''CREATE TABLE IF NOT EXISTS Countries (
                         id INTEGER PRIMARY KEY AUTOINCREMENT,
-                        country_name TEXT)''')
+                        country_name TEXT UNIQUE)''')
+
+    # Справочник рейтингов (возрастные категории хранятся кодом, а не строкой в каждой записи)
+    cursor.execute('''CREATE TABLE IF NOT EXISTS Ratings (
+                        id INTEGER PRIMARY KEY AUTOINCREMENT,
+                        rating_name TEXT UNIQUE)''')
 
     # Таблица фильмов и шоу
     cursor.execute('''CREATE TABLE IF NOT EXISTS Movies_and_Shows (
@@ -27,105 +60,157 @@ def create_tables(cursor):
                         title TEXT,
                         type TEXT,
                         release_year INTEGER,
-                        rating TEXT,
+                        rating_id INTEGER,
                         duration TEXT,
+                        duration_minutes INTEGER,
+                        seasons INTEGER,
                         genre_id INTEGER,
                         country_id INTEGER,
                         views INTEGER,
+                        source TEXT,  -- файл-источник
+                        source_load INTEGER,  -- номер загрузки, в которой строка была в источнике
+                        FOREIGN KEY (rating_id) REFERENCES Ratings(id),
                         FOREIGN KEY (genre_id) REFERENCES Genres(id),
                         FOREIGN KEY (country_id) REFERENCES Countries(id))''')
+    # Естественный ключ - название (в источниках названия уникальны): повторная загрузка обновляет строки
+    ensure_natural_key(cursor, 'Movies_and_Shows', ['title'], 'idx_movies_title')
+
+    # Версии данных таблиц для кэша отчётов (меняются после загрузки)
+    for table in REPORT_TABLES:
+        install_data_version(cursor, table)
+
+
+# Нормализация значений с небольшим числом различных вариантов (жанр, страна, рейтинг и т.п.) с кэшированием.
+# Названия почти все уникальны, поэтому для них кэш не используется.
+@normalization_cache()
+def normalize_text(value):
+    return str(value or '').strip()
+
+
+# Продолжительность: (минуты, сезоны) - "104 min" -> (104, None), "3 Seasons" -> (None, 3)
+@normalization_cache()
+def parse_duration(duration):
+    parts = duration.split()
+    if len(parts) != 2 or not parts[0].isdigit():
+        return None, None
+    unit = parts[1].lower()
+    if unit.startswith('min'):
+        return int(parts[0]), None
+    if unit.startswith('season'):
+        return None, int(parts[0])
+    return None, None
+
+
+# Нормализация записи о фильме (общая для CSV и JSON); None для строк с неполными данными
+def normalize_movie(record):
+    title = str(record.get('Title') or '').strip()  # Используем .get() для защиты от KeyError
+    type = normalize_text(record.get('Type'))
+    genre = normalize_text(record.get('Genre'))
+    release_year = normalize_text(record.get('Release Year'))
+    rating = normalize_text(record.get('Rating'))
+    duration = normalize_text(record.get('Duration'))
+    country = normalize_text(record.get('Country'))
+
+    if not title or not genre or not country:  # Пропустим строки с неполными данными
+        return None
+
+    duration_minutes, seasons = parse_duration(duration)
+    return (title, type, genre, int(release_year) if release_year.isdigit() else None, rating, duration,
+            duration_minutes, seasons, country)
+
+
+# Вставка фильма или обновление по названию; просмотры, накопленные в базе, сохраняются
+MOVIE_UPSERT_SQL = '''INSERT INTO Movies_and_Shows (title, type, release_year, rating_id, duration, duration_minutes,
+                                                    seasons, genre_id, country_id, views, source, source_load)
+                      VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 0, ?, ?)
+                      ON CONFLICT(title) DO UPDATE SET type = excluded.type, release_year = excluded.release_year,
+                      rating_id = excluded.rating_id, duration = excluded.duration,
+                      duration_minutes = excluded.duration_minutes,
+                      seasons = excluded.seasons, genre_id = excluded.genre_id, country_id = excluded.country_id,
+                      source = excluded.source, source_load = excluded.source_load'''
+
+
+# Вставка нормализованных записей с отметкой загрузки (iter_keyed_movies) пакетами: справочники интернируются
+# в памяти, один INSERT на таблицу на пакет
+def insert_movies(cursor, movies, batch_size=DEFAULT_BATCH_SIZE):
+    genres = DimensionCache(cursor, 'Genres', 'genre_name')
+    countries = DimensionCache(cursor, 'Countries', 'country_name')
+    ratings = DimensionCache(cursor, 'Ratings', 'rating_name')
+
+    for batch in batched(movies, batch_size):
+        rows = [(title, type, release_year, ratings.get_id(rating) if rating else None, duration, duration_minutes,
+                 seasons, genres.get_id(genre), countries.get_id(country), source, load)
+                for title, type, genre, release_year, rating, duration, duration_minutes, seasons, country, source, load
+                in batch]
+        genres.flush()
+        countries.flush()
+        ratings.flush()
+        cursor.executemany(MOVIE_UPSERT_SQL, rows)
+
+
+# 2. Чтение CSV. Обход формата источника: в cleaned_first_part.csv каждая строка целиком взята в кавычки
+# ("Title 1,TV Show,..."), и стандартный диалект читает её как одно поле - такое поле разбирается ещё раз.
+# Строки в обычном формате читаются как есть
+def iter_movies_from_csv(csv_file):
+    with open(csv_file, 'r', encoding='utf-8', newline='') as file:
+        reader = csv.reader(file)
+        headers = None
+        for fields in reader:
+            if len(fields) == 1:
+                fields = next(csv.reader([fields[0]]))
+            if headers is None:
+                headers = fields
+                continue
+            yield normalize_movie(dict(zip(headers, fields)))
 
 
-# 2. Загрузка данных из CSV в таблицы
-def load_movies_from_csv(cursor, csv_file):
-    with open(csv_file, 'r', encoding='utf-8') as file:
-        reader = csv.DictReader(file)
+# 3. Потоковое чтение JSON (массив или JSON Lines): фильмы разбираются по одному
+def iter_movies_from_json(json_file):
+    for movie in read_json_items(json_file):
+        yield normalize_movie(movie)
 
-        # Проверим, что заголовки корректно распознались
-        headers = reader.fieldnames
-        print(f"Заголовки в CSV: {headers}")  # Это для отладки
 
-        for row in reader:
-            # Прочитаем данные из строки
-            title = row.get('Title', '').strip()  # Используем .get() для защиты от KeyError
-            type = row.get('Type', '').strip()
-            genre = row.get('Genre', '').strip()
-            release_year = row.get('Release Year', '').strip()
-            rating = row.get('Rating', '').strip()
-            duration = row.get('Duration', '').strip()
-            country = row.get('Country', '').strip()
+# Одновременная загрузка из нескольких источников (кортежи (функция, аргументы...)): разбор в отдельных
+# процессах (processes=True) или потоках, запись - одним писателем.
+# Кэши нормализации в дочерних процессах свои, и в статистику print_cache_stats они не попадают
+def load_movies_concurrently(cursor, sources, batch_size=DEFAULT_BATCH_SIZE, queue_size=DEFAULT_QUEUE_SIZE,
+                             processes=False):
+    if not processes:
+        sources = [function(*args) for function, *args in sources]
+    insert_movies(cursor, iter_concurrently(sources, batch_size, queue_size, processes), batch_size)
 
-            if not title or not genre or not country:  # Пропустим строки с неполными данными
-                continue
 
-            # Вставляем данные в таблицу Genres
-            cursor.execute('''INSERT OR IGNORE INTO Genres (genre_name) VALUES (?)''',
-                           (genre,))
-            cursor.execute('''INSERT OR IGNORE INTO Countries (country_name) VALUES (?)''',
-                           (country,))
-
-            # Получаем ID жанра и страны
-            cursor.execute('''SELECT id FROM Genres WHERE genre_name = ?''', (genre,))
-            genre_id = cursor.fetchone()[0]
-            cursor.execute('''SELECT id FROM Countries WHERE country_name = ?''', (country,))
-            country_id = cursor.fetchone()[0]
-
-            # Вставляем данные в таблицу Movies_and_Shows
-            cursor.execute('''INSERT INTO Movies_and_Shows (title, type, release_year, rating, duration, genre_id, country_id, views)
-                              VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                           (title, type, int(release_year) if release_year.isdigit() else None, rating, duration,
-                            genre_id, country_id, 0))
-
-
-# 3. Загрузка данных из JSON
-def load_movies_from_json(cursor, json_file):
-    with open(json_file, 'r', encoding='utf-8') as file:
-        movies = json.load(file)
-
-    for movie in movies:
-        title = movie.get('Title', '').strip()
-        type = movie.get('Type', '').strip()
-        genre = movie.get('Genre', '').strip()
-        release_year = movie.get('Release Year', '').strip()
-        rating = movie.get('Rating', '').strip()
-        duration = movie.get('Duration', '').strip()
-        country = movie.get('Country', '').strip()
-
-        if not title or not genre or not country:
-            continue
-
-        # Вставляем данные в таблицу Genres и Countries
-        cursor.execute('''INSERT OR IGNORE INTO Genres (genre_name) VALUES (?)''', (genre,))
-        cursor.execute('''INSERT OR IGNORE INTO Countries (country_name) VALUES (?)''', (country,))
-
-        # Получаем ID жанра и страны
-        cursor.execute('''SELECT id FROM Genres WHERE genre_name = ?''', (genre,))
-        genre_id = cursor.fetchone()[0]
-        cursor.execute('''SELECT id FROM Countries WHERE country_name = ?''', (country,))
-        country_id = cursor.fetchone()[0]
-
-        # Вставляем данные в таблицу Movies_and_Shows
-        cursor.execute('''INSERT INTO Movies_and_Shows (title, type, release_year, rating, duration, genre_id, country_id, views)
-                          VALUES (?, ?, ?, ?, ?, ?, ?, ?)''',
-                       (title, type, int(release_year) if release_year.isdigit() else None, rating, duration, genre_id,
-                        country_id, 0))
+# Полные записи источника с отметкой загрузки (см. SourceLoad); функция модуля, поэтому годится и для разбора
+# в отдельном процессе
+def iter_keyed_movies(load, function, *args):
+    return load.keyed(movie for movie in function(*args) if movie is not None)
+
+
+# Источники фильмов (CSV и JSON), каждый со своей загрузкой: (iter_keyed_movies, загрузка, функция разбора, файл)
+def movie_sources(csv_file, json_file):
+    return [(iter_keyed_movies, SourceLoad(filename), function, filename)
+            for function, filename in ((iter_movies_from_csv, csv_file), (iter_movies_from_json, json_file))]
 
 
 # 4. Запрос: Топ-10 самых обновляемых фильмов/шоу (по просмотрам)
+# Ограниченная куча за один проход, либо ORDER BY ... LIMIT по индексу просмотров, если он уже создан
 def top_10_movies_by_views(cursor):
-    cursor.execute('''SELECT title, views FROM Movies_and_Shows ORDER BY views DESC LIMIT 10''')
-    rows = cursor.fetchall()
+    rows = top_k_reports(cursor, 'Movies_and_Shows', ['title', 'views'],
+                         [top_k_spec('top_views', ['views', 'title'], 10)])['top_views']
     return [{"Title": row[0], "Views": row[1]} for row in rows]
 
 
-# 5. Запрос: Средняя оценка по жанрам
-def average_rating_by_genre(cursor):
-    cursor.execute('''SELECT genre_name, AVG(rating) as avg_rating 
-                      FROM Movies_and_Shows 
-                      JOIN Genres ON Movies_and_Shows.genre_id = Genres.id 
-                      GROUP BY genre_name''')
+# 5. Запрос: Распределение рейтингов по жанрам. Рейтинг в источниках - возрастная категория (PG, TV-MA, ...),
+# а не оценка, поэтому вместо среднего считается число фильмов каждой категории (по коду из справочника)
+RATING_BY_GENRE_QUERY = '''SELECT genre_name, rating_name, COUNT(*) FROM Movies_and_Shows
+                           JOIN Genres ON Movies_and_Shows.genre_id = Genres.id
+                           LEFT JOIN Ratings ON Movies_and_Shows.rating_id = Ratings.id
+                           GROUP BY genre_name, rating_name'''
+
+def rating_distribution_by_genre(cursor):
+    cursor.execute(RATING_BY_GENRE_QUERY)
     rows = cursor.fetchall()
-    return [{"Genre": row[0], "Average Rating": row[1]} for row in rows]
+    return [{"Genre": row[0], "Rating": row[1], "Count": row[2]} for row in rows]
 
 
 # 6. Запрос: Количество фильмов по странам
@@ -138,74 +223,149 @@ def count_movies_by_country(cursor):
     return [{"Country": row[0], "Movie Count": row[1]} for row in rows]
 
 
-# 7. Запрос: Фильмы с рейтингом выше 8
-def movies_with_rating_above_8(cursor):
-    cursor.execute('''SELECT title, rating FROM Movies_and_Shows WHERE rating > "8"''')
-    rows = cursor.fetchall()
-    return [{"Title": row[0], "Rating": row[1]} for row in rows]
-
+# 7-8. Отчёты по числовой оценке (фильмы с рейтингом выше 8) убраны: в источниках рейтинг - только
+# возрастная категория
 
-# 8. Произвольный запрос: Все фильмы/шоу с рейтингом выше 8
-def custom_query(cursor):
-    cursor.execute('''SELECT title, rating FROM Movies_and_Shows WHERE rating > "8"''')
-    rows = cursor.fetchall()
-    return [{"Title": row[0], "Rating": row[1]} for row in rows]
 
+# 9. Группировка по типу фильма и подсчет фильмов каждой категории рейтинга для каждого типа
+RATING_BY_TYPE_QUERY = '''SELECT type, rating_name, COUNT(*) FROM Movies_and_Shows
+                          LEFT JOIN Ratings ON Movies_and_Shows.rating_id = Ratings.id
+                          GROUP BY type, rating_name'''
 
-# 9. Группировка по типу фильма и подсчет среднего рейтинга для каждого типа
-def avg_rating_by_type(cursor):
-    cursor.execute('''SELECT type, AVG(rating) as avg_rating 
-                      FROM Movies_and_Shows 
-                      GROUP BY type''')
+def rating_distribution_by_type(cursor):
+    cursor.execute(RATING_BY_TYPE_QUERY)
     rows = cursor.fetchall()
-    return [{"Type": row[0], "Average Rating": row[1]} for row in rows]
+    return [{"Type": row[0], "Rating": row[1], "Count": row[2]} for row in rows]
 
 
 # 10. Вывод информации о фильмах с минимальной продолжительностью (например, 1 сезон или короткие фильмы)
+# Два диапазона по числовым столбцам, каждый - поиск по своему индексу
+SHORT_MOVIE_MAX_MINUTES = 90
+SHORT_MOVIES_QUERY = '''SELECT title, duration FROM Movies_and_Shows
+                        WHERE seasons = 1 OR duration_minutes <= ?'''
+
 def short_movies(cursor):
-    cursor.execute('''SELECT title, duration FROM Movies_and_Shows WHERE duration LIKE "1%" OR duration LIKE "%Seasons"''')
-    rows = cursor.fetchall()
-    return [{"Title": row[0], "Duration": row[1]} for row in rows]
+    cursor.execute(SHORT_MOVIES_QUERY, (SHORT_MOVIE_MAX_MINUTES,))
+    return ({"Title": row[0], "Duration": row[1]} for row in iter_rows(cursor))
 
 
-# Основная функция
-def main():
-    conn = sqlite3.connect('movies_and_shows.db')
-    cursor = conn.cursor()
+# Разбор источников в отдельных процессах; на одном ядре процессы только добавляют передачу пакетов через pickle
+PARSE_IN_PROCESSES = (os.cpu_count() or 1) > 1
+
 
-    # Создание таблиц
+# Загрузка изменившихся источников: строки обновляются по названию, а строки источника, которых в нём
+# больше нет, удаляются. Строки неизменённого источника не трогаются
+@instrumented()
+def load_movies_if_changed(cursor, csv_file, json_file):
     create_tables(cursor)
+    version = str(SCHEMA_VERSION)
+    checks = [source_changed(cursor, filename, version) for filename in (csv_file, json_file)]
+    sources = [(source, fingerprint) for source, (changed, fingerprint) in zip(movie_sources(csv_file, json_file), checks)
+               if changed]
+    if not sources:
+        print("Источники не изменились, загрузка пропущена")
+        return False
+
+    load_movies_concurrently(cursor, [source for source, _ in sources], processes=PARSE_IN_PROCESSES)
+    for (_, load, _, filename), fingerprint in sources:
+        load.delete_stale(cursor, 'Movies_and_Shows')
+        record_source(cursor, filename, fingerprint, version)
+    create_search_index(cursor)
+    bump_data_version(cursor, *REPORT_TABLES)  # Кэшированные отчёты устарели
+    return True
+
+
+# Полнотекстовый индекс по названиям: новый заполняется одной командой после первой загрузки, дальше - триггерами
+def create_search_index(cursor):
+    install_search_index(cursor, 'Movies_search', 'Movies_and_Shows', ['title'])
+
+
+# Поиск фильмов/шоу по названию: страница результатов, лучшие совпадения первыми
+def search_titles(cursor, text, page=1, page_size=DEFAULT_PAGE_SIZE, prefix=False, phrase=False):
+    return search(cursor, 'Movies_search', 'Movies_and_Shows', ['id', 'title', 'type', 'release_year'], text, page,
+                  page_size, prefix=prefix, phrase=phrase, search_columns=['title'])
+
+
+# Отчётные запросы и индексы для них (создаются после загрузки данных)
+REPORT_QUERIES = [
+    report_query('top_10_movies_by_views', "SELECT title, views FROM Movies_and_Shows ORDER BY views DESC LIMIT 10",
+                 [('idx_movies_views', 'Movies_and_Shows', ['views', 'title'])]),
+    report_query('rating_distribution_by_genre', RATING_BY_GENRE_QUERY,
+                 [('idx_movies_genre_id', 'Movies_and_Shows', ['genre_id', 'rating_id'])]),
+    report_query('count_movies_by_country', '''SELECT country_name, COUNT(*) FROM Movies_and_Shows
+                                              JOIN Countries ON Movies_and_Shows.country_id = Countries.id GROUP BY country_name''',
+                 [('idx_movies_country_id', 'Movies_and_Shows', ['country_id'])]),
+    report_query('rating_distribution_by_type', RATING_BY_TYPE_QUERY,
+                 [('idx_movies_type', 'Movies_and_Shows', ['type', 'rating_id'])]),
+    report_query('short_movies', SHORT_MOVIES_QUERY,
+                 [('idx_movies_seasons', 'Movies_and_Shows', ['seasons', 'title', 'duration']),
+                  ('idx_movies_duration_minutes', 'Movies_and_Shows', ['duration_minutes', 'title', 'duration'])],
+                 params=(SHORT_MOVIE_MAX_MINUTES,)),
+]
+
+
+# Отчёты и файлы, в которые они записываются
+REPORTS = [
+    (top_10_movies_by_views, 'top_updated_movies.json'),
+    (rating_distribution_by_genre, 'rating_distribution_by_genre.json'),
+    (count_movies_by_country, 'count_movies_by_country.json'),
+    (rating_distribution_by_type, 'rating_distribution_by_type.json'),
+    (short_movies, 'short_movies.json'),
+]
+REPORT_TABLES = ['Genres', 'Countries', 'Ratings', 'Movies_and_Shows']
+
+
+DB_PATH = 'movies_and_shows.db'
+
+
+def print_search_results(results):
+    for hit in results['hits']:
+        print(f"{hit['id']}: {hit['title']} ({hit['type']}, {hit['release_year']})")
+    more = ', есть следующая страница' if results['has_more'] else ''
+    print(f"Найдено на странице {results['page']}: {len(results['hits'])}{more}")
+
+
+# Основная функция; search_text - поиск по названиям после загрузки (страница page)
+def main(search_text=None, page=1):
+    conn = sqlite3.connect(DB_PATH)
+    enable_wal(conn)  # Отчёты читают базу из других соединений
+    trace_connection(conn)
+    cursor = conn.cursor()
 
-    # Загрузка данных
-    load_movies_from_csv(cursor, 'cleaned_first_part.csv')  # Путь к вашему CSV файлу
-    load_movies_from_json(cursor, 'cleaned_second_part.json')  # Путь к вашему JSON файлу
+    # Создание таблиц и загрузка данных (CSV и JSON разбираются параллельно), если источники изменились
+    loaded = load_movies_if_changed(cursor,
+                                    'cleaned_first_part.csv',  # Путь к вашему CSV файлу
+                                    'cleaned_second_part.json')  # Путь к вашему JSON файлу
 
     # Сохранение данных в базу
     conn.commit()
 
-    # Запросы и сохранение в JSON
-    with open('top_updated_movies.json', 'w', encoding='utf-8') as file:
-        json.dump(top_10_movies_by_views(cursor), file, ensure_ascii=False, indent=4)
-
-    with open('average_rating_by_genre.json', 'w', encoding='utf-8') as file:
-        json.dump(average_rating_by_genre(cursor), file, ensure_ascii=False, indent=4)
-
-    with open('count_movies_by_country.json', 'w', encoding='utf-8') as file:
-        json.dump(count_movies_by_country(cursor), file, ensure_ascii=False, indent=4)
-
-    with open('movies_with_rating_above_8.json', 'w', encoding='utf-8') as file:
-        json.dump(movies_with_rating_above_8(cursor), file, ensure_ascii=False, indent=4)
+    # Индексы для отчётов создаются после загрузки (без загрузки и новых индексов замеры пропускаются)
+    advise_indexes(cursor, REPORT_QUERIES, after_load=loaded)
+    conn.commit()
 
-    with open('avg_rating_by_type.json', 'w', encoding='utf-8') as file:
-        json.dump(avg_rating_by_type(cursor), file, ensure_ascii=False, indent=4)
+    # Запросы и сохранение в JSON параллельно, каждый отчёт - в своём соединении только для чтения
+    # (отчёты пересчитываются, только если изменились данные или код запроса)
+    run_reports(DB_PATH, [report_job(report, filename) for report, filename in REPORTS],
+                cache=ReportCache(), tables=REPORT_TABLES)
 
-    with open('short_movies.json', 'w', encoding='utf-8') as file:
-        json.dump(short_movies(cursor), file, ensure_ascii=False, indent=4)
+    if search_text is not None:
+        try:
+            print_search_results(search_titles(cursor, search_text, page))
+        except SearchError as error:
+            print(error)
 
     # Закрытие соединения с базой данных
     conn.close()
 
+    print_cache_stats()
+    write_run_report()
+
 
 if __name__ == "__main__":
-    main()
+    parser = argparse.ArgumentParser(description='Загрузка фильмов/шоу, отчёты и поиск по названиям')
+    parser.add_argument('--search', help='текст для поиска по названиям')
+    parser.add_argument('--page', type=int, default=1, help='страница результатов поиска')
+    args = parser.parse_args()
+    main(args.search, args.page)
 
@@ -1,64 +1,112 @@
-import sqlite3
+import os
+import sys
 import json
-import pandas as pd
 from tabulate import tabulate
 
-def create_database():
-    conn = sqlite3.connect('baza_dannix.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute('''CREATE TABLE IF NOT EXISTS baza_dannix
-                      (id INTEGER, name TEXT, street TEXT, city TEXT, zipcode INTEGER, 
-                       floors INTEGER, year INTEGER, parking BOOLEAN, prob_price INTEGER, views INTEGER)''')
-    conn.commit()
-    conn.close()
-
-def populate_database_from_csv(filename):
-    conn = sqlite3.connect('baza_dannix.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    # Загрузить данные из CSV файла
-    data = pd.read_csv('../1-2/item.csv', delimiter=';')
-
-    # Вставить данные в таблицу
-    sql_query = "INSERT INTO baza_dannix VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
-    cursor.executemany(sql_query, [
-        (row['id'], row['name'], row['street'], row['city'], row['zipcode'],
-         row['floors'], row['year'], row['parking'], row['prob_price'], row['views']) for _, row in data.iterrows()
-    ])
-    conn.commit()
-    conn.close()
-
-def display_database_contents():
-    conn = sqlite3.connect('baza_dannix.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute("SELECT * FROM baza_dannix")
-    rows = cursor.fetchall()
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.bulk import DEFAULT_BATCH_SIZE, bulk_insert, iter_csv_rows
+from common.db import ConnectionManager
+from common.export import COLUMNAR_OUTPUT_FORMATS, export_report, iter_rows
+from common.incremental import (SOURCE_LOAD_VERSION, SourceLoad, ensure_natural_key, ensure_source_load, record_source,
+                                source_changed)
+from common.index_advisor import advise_indexes, report_query
+from common.instrumentation import instrumented, write_run_report
+from common.query_builder import aggregate_query, frequency_query, select_query
+from common.report_cache import ReportCache, bump_data_version, install_data_version
+
+DB_PATH = 'baza_dannix.db'
+# Поля таблицы, допустимые в отчётах с произвольным полем/условием (и выводимые в них - без служебных столбцов источника)
+ITEM_FIELDS = ('id', 'name', 'street', 'city', 'zipcode', 'floors', 'year', 'parking', 'prob_price', 'views')
+
+@instrumented()
+def create_database(db):
+    with db.cursor(DB_PATH) as cursor:
+        cursor.execute('''CREATE TABLE IF NOT EXISTS baza_dannix
+                          (id INTEGER, name TEXT, street TEXT, city TEXT, zipcode INTEGER, 
+                           floors INTEGER, year INTEGER, parking BOOLEAN, prob_price INTEGER, views INTEGER)''')
+        # Естественный ключ - id объекта из выгрузки
+        ensure_natural_key(cursor, 'baza_dannix', ['id'], 'idx_baza_dannix_id')
+        # Источник и номер загрузки строки: по ним удаляются объекты, которых в выгрузке больше нет
+        ensure_source_load(cursor, 'baza_dannix')
+        install_data_version(cursor, 'baza_dannix')
+
+ITEM_CSV_SCHEMA = (
+    ('id', int, None),
+    ('name', str, ''),
+    ('street', str, ''),
+    ('city', str, ''),
+    ('zipcode', int, None),
+    ('floors', int, None),
+    ('year', int, None),
+    ('parking', bool, False),
+    ('prob_price', int, None),
+    ('views', int, None),
+)
+
+@instrumented()
+def populate_database_from_csv(db, filename, batch_size=DEFAULT_BATCH_SIZE):
+    # Неизменённый файл повторно не загружается
+    with db.cursor(DB_PATH) as cursor:
+        changed, fingerprint = source_changed(cursor, filename, SOURCE_LOAD_VERSION)
+    if not changed:
+        print(f"Источник не изменился, загрузка пропущена: {filename}")
+        return False
+
+    # Потоково читаем CSV файл и вставляем (или обновляем по id) данные в таблице пакетами
+    load = SourceLoad(filename)
+    rows = load.keyed(iter_csv_rows(filename, ITEM_CSV_SCHEMA, delimiter=';'))
+    sql_query = '''INSERT INTO baza_dannix (id, name, street, city, zipcode, floors, year, parking, prob_price, views,
+                                            source, source_load)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT(id) DO UPDATE SET name = excluded.name, street = excluded.street, city = excluded.city,
+                   zipcode = excluded.zipcode, floors = excluded.floors, year = excluded.year, parking = excluded.parking,
+                   prob_price = excluded.prob_price, views = excluded.views, source = excluded.source,
+                   source_load = excluded.source_load'''
+    bulk_insert(db.connection(DB_PATH), sql_query, rows, batch_size)
+
+    with db.cursor(DB_PATH) as cursor:
+        load.delete_stale(cursor, 'baza_dannix')  # Объекты, которых в файле больше нет
+        bump_data_version(cursor, 'baza_dannix')  # Кэшированные отчёты по таблице устарели
+        record_source(cursor, filename, fingerprint, SOURCE_LOAD_VERSION)
+    return True
+
+# Отчётные запросы и индексы для них (создаются после загрузки данных)
+REPORT_QUERIES = [
+    report_query('export_to_json', "SELECT * FROM baza_dannix ORDER BY prob_price LIMIT 44",
+                 [('idx_baza_dannix_prob_price', 'baza_dannix', ['prob_price'])]),
+    report_query('categorical_field_frequency', "SELECT city, COUNT(city) FROM baza_dannix GROUP BY city",
+                 [('idx_baza_dannix_city', 'baza_dannix', ['city'])]),
+    report_query('export_filtered_data', "SELECT * FROM baza_dannix WHERE prob_price > ? ORDER BY prob_price LIMIT 44",
+                 [('idx_baza_dannix_prob_price', 'baza_dannix', ['prob_price'])], params=(100000000,)),
+]
+
+# after_load - данные только что загружены (иначе замеры выполняются, только если создаётся индекс)
+def create_report_indexes(db, after_load=False):
+    with db.cursor(DB_PATH) as cursor:
+        advise_indexes(cursor, REPORT_QUERIES, after_load=after_load)
+
+def display_database_contents(db):
+    with db.cursor(DB_PATH) as cursor:
+        cursor.execute(*select_query('baza_dannix', ITEM_FIELDS, columns=ITEM_FIELDS))
+        rows = cursor.fetchall()
     headers = rows[0].keys() if rows else []
     print(tabulate(rows, headers=headers, tablefmt="fancy_grid"))
-    conn.close()
-
-def export_to_json(var):
-    conn = sqlite3.connect('baza_dannix.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    num_field = 'prob_price'
-    cursor.execute(f"SELECT * FROM baza_dannix ORDER BY {num_field} LIMIT {var + 10}")
-    rows = cursor.fetchall()
-    data = [dict(row) for row in rows]
-    with open(r'output.json', 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
-    conn.close()
-
-def calculate_aggregates_and_export_to_json():
-    conn = sqlite3.connect('baza_dannix.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    num_field = 'prob_price'  # Выберите числовое поле для агрегирования
-    cursor.execute(f"SELECT SUM({num_field}), MIN({num_field}), MAX({num_field}), AVG({num_field}) FROM baza_dannix")
-    result = cursor.fetchone()
+
+@instrumented()
+def export_to_json(db, var):
+    with db.cursor(DB_PATH) as cursor:
+        num_field = 'prob_price'
+        cursor.execute(*select_query('baza_dannix', ITEM_FIELDS, columns=ITEM_FIELDS, order_by=num_field,
+                                     limit=var + 10))
+        return export_report((dict(row) for row in iter_rows(cursor)), r'output.json', formats=COLUMNAR_OUTPUT_FORMATS)
+
+@instrumented()
+def calculate_aggregates_and_export_to_json(db):
+    with db.cursor(DB_PATH) as cursor:
+        num_field = 'prob_price'  # Выберите числовое поле для агрегирования
+        cursor.execute(*aggregate_query('baza_dannix', ITEM_FIELDS, num_field))
+        result = cursor.fetchone()
     data = {
         "Sum": result[0],
         "Min": result[1],
@@ -67,36 +115,41 @@ def calculate_aggregates_and_export_to_json():
     }
     with open(r'aggregates_output.json', 'w', encoding='utf-8') as file:
         json.dump(data, file, indent=4, ensure_ascii=False)
-    conn.close()
-
-def categorical_field_frequency_and_export_to_json(cat_field):
-    conn = sqlite3.connect('baza_dannix.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    cursor.execute(f"SELECT {cat_field}, COUNT({cat_field}) FROM baza_dannix GROUP BY {cat_field}")
-    results = cursor.fetchall()
-    data = {row[cat_field]: row[f'COUNT({cat_field})'] for row in results}
+
+@instrumented()
+def categorical_field_frequency_and_export_to_json(db, cat_field):
+    with db.cursor(DB_PATH) as cursor:
+        cursor.execute(*frequency_query('baza_dannix', ITEM_FIELDS, cat_field))
+        results = cursor.fetchall()
+    data = {row[cat_field]: row['frequency'] for row in results}
     with open(r'categorical_frequency_output.json', 'w', encoding='utf-8') as file:
         json.dump(data, file, indent=4, ensure_ascii=False)
-    conn.close()
-
-def export_filtered_data_to_json(var, filter_predicate):
-    conn = sqlite3.connect('baza_dannix.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    num_field = 'prob_price'
-    cursor.execute(f"SELECT * FROM baza_dannix WHERE {filter_predicate} ORDER BY {num_field} LIMIT {var + 10}")
-    rows = cursor.fetchall()
-    data = [dict(row) for row in rows]
-    with open(r'filtered_output.json', 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
-    conn.close()
-
-# Выполнение шагов
-create_database()
-populate_database_from_csv('../1-2/item.csv')
-display_database_contents()
-export_to_json(34)
-calculate_aggregates_and_export_to_json()
-categorical_field_frequency_and_export_to_json('city')  #  по городам
-export_filtered_data_to_json(34, 'prob_price > 100000000')  # фильтрация по полю prob_price
+
+# filter_predicates - список условий (поле, оператор, значение), объединённых через AND
+@instrumented()
+def export_filtered_data_to_json(db, var, filter_predicates):
+    with db.cursor(DB_PATH) as cursor:
+        num_field = 'prob_price'
+        cursor.execute(*select_query('baza_dannix', ITEM_FIELDS, columns=ITEM_FIELDS, predicates=filter_predicates,
+                                     order_by=num_field, limit=var + 10))
+        return export_report((dict(row) for row in iter_rows(cursor)), r'filtered_output.json',
+                             formats=COLUMNAR_OUTPUT_FORMATS)
+
+# Отчёт пересчитывается, только если изменились данные таблицы, параметры или код функции отчёта
+def cached_report(db, cache, output_file, report, *args):
+    with db.cursor(DB_PATH) as cursor:
+        cache.materialize(cursor, ['baza_dannix'], output_file, lambda: report(db, *args), report, args)
+
+# Выполнение шагов (одно соединение с базой данных на весь запуск)
+if __name__ == "__main__":
+    with ConnectionManager() as db:
+        cache = ReportCache()
+        create_database(db)
+        loaded = populate_database_from_csv(db, '../1-2/item.csv')
+        create_report_indexes(db, after_load=loaded)
+        display_database_contents(db)
+        cached_report(db, cache, 'output.json', export_to_json, 34)
+        cached_report(db, cache, 'aggregates_output.json', calculate_aggregates_and_export_to_json)
+        cached_report(db, cache, 'categorical_frequency_output.json', categorical_field_frequency_and_export_to_json, 'city')  #  по городам
+        cached_report(db, cache, 'filtered_output.json', export_filtered_data_to_json, 34, [('prob_price', '>', 100000000)])  # фильтрация по полю prob_price
+    write_run_report()
@@ -1,6 +1,29 @@
+import os
+import sys
 import sqlite3
-import json
-import pickle
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.export import COLUMNAR_OUTPUT_FORMATS
+from common.index_advisor import advise_indexes, report_query
+from common.instrumentation import instrumented, trace_connection, write_run_report
+from common.records import read_records
+from common.report_runner import enable_wal, report_job, run_reports
+from common.sidecar import iter_pickle_rows
+from common.summary import install_summary, read_summary, refresh_stale
+from common.topk import RunningTopK, top_k_reports, top_k_spec
+
+# Условие произвольного запроса ({row} - строка таблицы products)
+CUSTOM_QUERY_FILTER_TEMPLATE = '{row}.quantity > 10 AND {row}.isAvailable = 1'
+
+# Меры сводной таблицы category_stats, поддерживаемой триггерами на products
+CATEGORY_MEASURES = [
+    ('price', '{row}.price', None),
+    ('quantity', '{row}.quantity', None),
+    ('custom_price', '{row}.price', CUSTOM_QUERY_FILTER_TEMPLATE),
+    ('custom_quantity', '{row}.quantity', CUSTOM_QUERY_FILTER_TEMPLATE),
+]
+
 
 # 1. Создание таблицы products с добавлением счётчика обновлений
 def create_products_table(cursor):
@@ -16,56 +39,43 @@ def create_products_table(cursor):
         views INTEGER,
         update_counter INTEGER DEFAULT 0  -- Счётчик обновлений
     )''')
+    # Сводка по категориям обновляется триггерами при вставке, изменении и удалении товаров
+    install_summary(cursor, 'category_stats', 'products', 'category', CATEGORY_MEASURES)
 
 # 2. Обработка данных из .text файла (товары)
-def insert_products_from_text(cursor, products_data):
-    products = products_data.split('=====\n')  # Разделим товары по разделителю
-
-    all_products = []
-    for product in products:
-        # Убираем лишние пробелы по краям строки и разбиваем на строки по '\n'
-        product_info = product.strip().split('\n')
-
-        # Проверяем, что строка имеет хотя бы 6 элементов
-        if len(product_info) >= 6:
-            try:
-                # Чтение данных с проверками на наличие
-                name = product_info[0].split('::')[1].strip() if len(product_info[0].split('::')) > 1 else 'Unknown'
-                price = round(float(product_info[1].split('::')[1].strip()), 2) if len(
-                    product_info[1].split('::')) > 1 else 0.0  # Округление до 2 знаков
-                quantity = int(product_info[2].split('::')[1].strip()) if len(product_info[2].split('::')) > 1 else 0
-                category = product_info[3].split('::')[1].strip() if len(product_info[3].split('::')) > 1 else 'Unknown'
-                fromCity = product_info[4].split('::')[1].strip() if len(product_info[4].split('::')) > 1 else 'Unknown'
-                isAvailable = product_info[5].split('::')[1].strip() == 'True' if len(
-                    product_info[5].split('::')) > 1 else False
-
-                # Проверка для views, если элемент не существует, ставим 0
-                views = 0  # Значение по умолчанию
-                if len(product_info) > 6:
-                    try:
-                        views = int(product_info[6].split('::')[1].strip())
-                    except ValueError:
-                        views = 0  # Если не удалось преобразовать в число
-
-                # Добавляем товар в список
-                all_products.append((name, price, quantity, category, fromCity, isAvailable, views))
-            except IndexError:
-                print(f"Ошибка в строке товара (недостаточно данных): {product}")
-            except ValueError as ve:
-                print(f"Ошибка в формате данных для товара: {product}, ошибка: {ve}")
-
-    # Вставляем данные в таблицу, если они корректные
+PRODUCT_TEXT_SCHEMA = (
+    ('name', str, 'Unknown'),
+    ('price', float, 0.0),
+    ('quantity', int, 0),
+    ('category', str, 'Unknown'),
+    ('fromCity', str, 'Unknown'),
+    ('isAvailable', bool, False),
+    ('views', int, 0),
+)
+
+
+@instrumented()
+def insert_products_from_text(cursor, filename):
+    # Записи читаются потоково, цена округляется до 2 знаков
+    products = ((name, round(price, 2), quantity, category, fromCity, isAvailable, views)
+                for name, price, quantity, category, fromCity, isAvailable, views
+                in read_records(filename, PRODUCT_TEXT_SCHEMA))
+
     cursor.executemany(
         "INSERT INTO products (name, price, quantity, category, fromCity, isAvailable, views) VALUES (?, ?, ?, ?, ?, ?, ?)",
-        all_products)
+        products)
 
 # 3. Обработка изменений из .pkl файла
-def apply_changes(cursor, changes):
-    for change in changes:
-        name = change['name']
-        method = change['method']
-        param = change['param']
+# Изменения - кортежи (name, method, param), читаются из столбцового кэша источника без создания словарей
+CHANGE_FIELDS = ('name', 'method', 'param')
+
+
+def load_changes(filename):
+    return list(iter_pickle_rows(filename, CHANGE_FIELDS))
 
+
+def apply_changes(cursor, changes):
+    for name, method, param in changes:
         if method == 'available':
             cursor.execute("UPDATE products SET isAvailable = ?, update_counter = update_counter + 1 WHERE name = ? AND isAvailable != ?",
                            (param, name, param))
@@ -84,113 +94,222 @@ def apply_changes(cursor, changes):
         elif method == 'remove':
             cursor.execute("DELETE FROM products WHERE name = ?", (name,))
 
+# Свёртка изменений в памяти: изменения товара применяются по порядку к его текущим значениям
+# с теми же условиями, что и в запросах apply_changes (NULL в условии - изменение не применяется).
+# Возвращает итоговые (price, quantity, isAvailable, число засчитанных обновлений) или None, если товар удалён.
+def fold_product_changes(price, quantity, is_available, product_changes):
+    updates = 0
+    for method, param in product_changes:
+        if method == 'available':
+            if is_available is not None and param is not None and is_available != param:
+                is_available = param
+                updates += 1
+        elif method == 'price_percent':
+            # Условие запроса не зависит от param: при param = NULL цена становится NULL
+            if price is not None and price > 0:
+                price = price * (1 + param) if param is not None else None
+                updates += 1
+        elif method == 'price_abs':
+            if price is not None and param is not None and price + param >= 0:
+                price = price + param
+                updates += 1
+        elif method == 'quantity_add':
+            if quantity is not None and param is not None and quantity + param >= 0:
+                quantity = quantity + param
+                updates += 1
+        elif method == 'quantity_sub':
+            if quantity is not None and param is not None and quantity - param >= 0:
+                quantity = quantity - param
+                updates += 1
+        elif method == 'remove':
+            return None
+    return price, quantity, is_available, updates
+
+
+# Применение свёрнутых изменений множествами: итог каждого товара (условия уже проверены при свёртке)
+# записывается во временную таблицу, затем один UPDATE ... FROM для изменённых и один DELETE для удалённых товаров.
+# top_updated (RunningTopK) - текущий топ самых обновляемых товаров, обновляется вместе с таблицей
+@instrumented()
+def apply_changes_folded(cursor, changes, top_updated=None):
+    changes_by_name = {}
+    for name, method, param in changes:
+        changes_by_name.setdefault(name, []).append((method, param))
+
+    cursor.execute("CREATE TEMP TABLE IF NOT EXISTS changed_products (name TEXT PRIMARY KEY)")
+    cursor.executemany("INSERT INTO changed_products (name) VALUES (?)", ((name,) for name in changes_by_name))
+    cursor.execute('''SELECT id, name, price, quantity, isAvailable, update_counter FROM products
+                      WHERE name IN (SELECT name FROM changed_products)''')
+    products = cursor.fetchall()
+    cursor.execute("DROP TABLE changed_products")
+
+    deltas = []
+    for product_id, name, price, quantity, is_available, update_counter in products:
+        folded = fold_product_changes(price, quantity, is_available, changes_by_name[name])
+        if folded is None:
+            deltas.append((product_id, None, None, None, 0, 1))
+            if top_updated is not None:
+                top_updated.remove(product_id)
+        elif folded[3]:
+            deltas.append((product_id,) + folded + (0,))
+            if top_updated is not None:
+                top_updated.update(product_id, (update_counter + folded[3], name), name)
+
+    cursor.execute('''CREATE TEMP TABLE IF NOT EXISTS product_deltas
+                      (id INTEGER PRIMARY KEY, price, quantity, isAvailable, updates INTEGER, removed INTEGER)''')
+    cursor.executemany("INSERT INTO product_deltas VALUES (?, ?, ?, ?, ?, ?)", deltas)
+    cursor.execute('''UPDATE products SET price = d.price, quantity = d.quantity, isAvailable = d.isAvailable,
+                             update_counter = products.update_counter + d.updates
+                      FROM product_deltas AS d WHERE products.id = d.id AND d.removed = 0''')
+    cursor.execute("DELETE FROM products WHERE id IN (SELECT id FROM product_deltas WHERE removed = 1)")
+    cursor.execute("DROP TABLE product_deltas")
+
+
 # 4. Запрос: Топ-10 самых обновляемых товаров
+# Ограниченная куча за один проход, либо ORDER BY ... LIMIT по индексу счётчика, если он уже создан
+TOP_UPDATED_SPEC = top_k_spec('top_updated', ['update_counter', 'name'], 10)
+
+@instrumented()
 def query_top_updated_products(cursor):
-    cursor.execute("SELECT name, update_counter FROM products ORDER BY update_counter DESC LIMIT 10")
-    top_updated_products = cursor.fetchall()
+    top_updated_products = top_k_reports(cursor, 'products', ['name', 'update_counter'], [TOP_UPDATED_SPEC])['top_updated']
     formatted_top_updated_products = [{"Товар": product[0], "Количество обновлений": product[1]} for product in top_updated_products]
     return formatted_top_updated_products
 
-# 5. Запрос: Анализ цен товаров по категориям
-def query_price_analysis(cursor):
-    cursor.execute('''SELECT category, 
-     SUM(price) AS total_price, 
-     MIN(price) AS min_price, 
-     MAX(price) AS max_price, 
-     AVG(price) AS avg_price, 
-     COUNT(*) AS product_count 
-     FROM products 
-     GROUP BY category''')
-    price_analysis = cursor.fetchall()
-    formatted_price_analysis = [
+# Текущий топ перед применением изменений; счётчики обновлений только растут
+def running_top_updated_products(cursor):
+    top_updated_products = top_k_reports(cursor, 'products', ['id', 'name', 'update_counter'], [TOP_UPDATED_SPEC])['top_updated']
+    return RunningTopK(TOP_UPDATED_SPEC['k'], [(product_id, (update_counter, name), name)
+                                              for product_id, name, update_counter in top_updated_products])
+
+def format_running_top_updated_products(top_updated):
+    return [{"Товар": name, "Количество обновлений": score[0]} for _, (score, name) in top_updated.items()]
+
+# 5-7. Запросы: анализ цен и остатков по категориям, произвольный запрос (товары с quantity > 10 в наличии).
+# Все три отчёта читаются из сводной таблицы category_stats - без сканирования products.
+# Имена столбцов результата произвольного запроса (строки отчёта - кортежи)
+CUSTOM_QUERY_COLUMNS = ['category', 'max_price', 'min_price', 'avg_price', 'max_quantity', 'product_count']
+
+@instrumented()
+def query_category_reports_from_summary(cursor):
+    stats = [
         {
-            "Категория": category[0],
-            "Сумма цен товаров": category[1],
-            "Минимальная цена": category[2],
-            "Максимальная цена": category[3],
-            "Средняя цена": category[4],
-            "Количество товаров в категории": category[5]
-        } for category in price_analysis]
-
-    return formatted_price_analysis
-
-# 6. Запрос: Анализ остатков товаров по категориям
-def query_quantity_analysis(cursor):
-    cursor.execute('''SELECT category, 
-     SUM(quantity) AS total_quantity, 
-     MIN(quantity) AS min_quantity, 
-     MAX(quantity) AS max_quantity, 
-     AVG(quantity) AS avg_quantity, 
-     COUNT(*) AS product_count 
-     FROM products 
-     GROUP BY category''')
-    quantity_analysis = cursor.fetchall()
-    formatted_quantity_analysis = [
+            'category': row['category'],
+            'total_price': row['price']['sum'],
+            'min_price': row['price']['min'],
+            'max_price': row['price']['max'],
+            'avg_price': row['price']['avg'],
+            'total_quantity': row['quantity']['sum'],
+            'min_quantity': row['quantity']['min'],
+            'max_quantity': row['quantity']['max'],
+            'avg_quantity': row['quantity']['avg'],
+            'product_count': row['row_count'],
+            'custom_max_price': row['custom_price']['max'],
+            'custom_min_price': row['custom_price']['min'],
+            'custom_avg_price': row['custom_price']['avg'],
+            'custom_max_quantity': row['custom_quantity']['max'],
+            'custom_product_count': row['custom_price']['count'],
+        } for row in read_summary(cursor, 'category_stats', 'products', 'category', CATEGORY_MEASURES)]
+    return format_category_reports(stats)
+
+
+# Отчёты по категориям по одному на файл (для параллельного выполнения); сводная таблица маленькая,
+# поэтому повторное чтение дешевле, чем ожидание общего результата
+def query_price_analysis_from_summary(cursor):
+    return query_category_reports_from_summary(cursor)[0]
+
+def query_quantity_analysis_from_summary(cursor):
+    return query_category_reports_from_summary(cursor)[1]
+
+def query_custom_from_summary(cursor):
+    return query_category_reports_from_summary(cursor)[2]
+
+
+# Форматирование отчётов по категориям: анализ цен, анализ остатков, произвольный запрос
+def format_category_reports(stats):
+    price_analysis = [
+        {
+            "Категория": row['category'],
+            "Сумма цен товаров": row['total_price'],
+            "Минимальная цена": row['min_price'],
+            "Максимальная цена": row['max_price'],
+            "Средняя цена": row['avg_price'],
+            "Количество товаров в категории": row['product_count']
+        } for row in stats]
+    quantity_analysis = [
         {
-            "Категория": category[0],
-            "Сумма остатков товаров": category[1],
-            "Минимальный остаток": category[2],
-            "Максимальный остаток": category[3],
-            "Средний остаток": category[4],
-            "Количество товаров в категории": category[5]
-        } for category in quantity_analysis]
-    return formatted_quantity_analysis
-
-# 7. Запрос: Произвольный запрос
-def query_custom(cursor):
-    # Запрос с фильтрацией, агрегацией и сортировкой
-    cursor.execute('''
-        SELECT category, 
-               MAX(price) AS max_price, 
-               MIN(price) AS min_price, 
-               AVG(price) AS avg_price,
-               MAX(quantity) AS max_quantity, 
-               COUNT(*) AS product_count
-        FROM products
-        WHERE quantity > 10 AND isAvailable = 1
-        GROUP BY category
-        ORDER BY avg_price DESC, category ASC
-    ''')
-    rows = cursor.fetchall()
-    return rows
+            "Категория": row['category'],
+            "Сумма остатков товаров": row['total_quantity'],
+            "Минимальный остаток": row['min_quantity'],
+            "Максимальный остаток": row['max_quantity'],
+            "Средний остаток": row['avg_quantity'],
+            "Количество товаров в категории": row['product_count']
+        } for row in stats]
+    custom = [(row['category'], row['custom_max_price'], row['custom_min_price'], row['custom_avg_price'],
+               row['custom_max_quantity'], row['custom_product_count'])
+              for row in stats if row['custom_product_count']]
+    custom.sort(key=lambda row: row[0])
+    custom.sort(key=lambda row: row[3], reverse=True)
+    return price_analysis, quantity_analysis, custom
+
+# Отчётные запросы и индексы для них (создаются после загрузки данных и применения изменений)
+REPORT_QUERIES = [
+    report_query('top_updated_products', "SELECT name, update_counter FROM products ORDER BY update_counter DESC LIMIT 10",
+                 [('idx_products_update_counter', 'products', ['update_counter', 'name'])]),
+    report_query('price_analysis', "SELECT category, SUM(price), MIN(price), MAX(price), AVG(price), COUNT(*) FROM products GROUP BY category",
+                 [('idx_products_category', 'products', ['category', 'price', 'quantity', 'isAvailable'])]),
+    report_query('quantity_analysis', "SELECT category, SUM(quantity), MIN(quantity), MAX(quantity), AVG(quantity), COUNT(*) FROM products GROUP BY category",
+                 [('idx_products_category', 'products', ['category', 'price', 'quantity', 'isAvailable'])]),
+    report_query('product_by_name', "SELECT id FROM products WHERE name = ?",
+                 [('idx_products_name', 'products', ['name'])], params=('',)),
+]
+
+DB_PATH = 'fourth_task.db'
 
 # Основная функция
 def main():
-    conn = sqlite3.connect('fourth_task.db')
+    conn = sqlite3.connect(DB_PATH)
+    enable_wal(conn)  # Отчёты читают базу из других соединений
+    trace_connection(conn)
     cursor = conn.cursor()
 
     # Создание таблиц
     create_products_table(cursor)
 
     # Чтение и вставка данных из текстового файла
-    with open('_product_data.text', 'r', encoding='utf-8') as product_file:
-        products_data = product_file.read()
-    insert_products_from_text(cursor, products_data)
+    insert_products_from_text(cursor, '_product_data.text')
 
     # Применение изменений из .pkl файла
-    with open('_update_data.pkl', 'rb') as update_file:
-        changes = pickle.load(update_file)
-    apply_changes(cursor, changes)
+    changes = load_changes('_update_data.pkl')
+    top_updated = running_top_updated_products(cursor)
+    apply_changes_folded(cursor, changes, top_updated)
 
     conn.commit()
 
-    # Запросы и запись в файлы
-    with open('top_updated_products.json', 'w', encoding='utf-8') as file:
-        json.dump(query_top_updated_products(cursor), file, ensure_ascii=False, indent=4)
-
-    with open('price_analysis.json', 'w', encoding='utf-8') as file:
-        json.dump(query_price_analysis(cursor), file, ensure_ascii=False, indent=4)
+    # Индексы для отчётов создаются после загрузки; устаревшие строки сводки пересчитываются здесь,
+    # чтобы отчёты только читали базу
+    advise_indexes(cursor, REPORT_QUERIES, after_load=True)
+    refresh_stale(cursor, 'category_stats', 'products', 'category', CATEGORY_MEASURES)
+    conn.commit()
 
-    with open('quantity_analysis.json', 'w', encoding='utf-8') as file:
-        json.dump(query_quantity_analysis(cursor), file, ensure_ascii=False, indent=4)
+    # Топ обновляемых товаров поддерживается при применении изменений; если из него удалили товар - пересчёт
+    if top_updated.complete:
+        top_updated_report = lambda cursor: format_running_top_updated_products(top_updated)
+    else:
+        top_updated_report = query_top_updated_products
 
-    # Выполнение произвольного запроса и запись в JSON
-    custom_query_result = query_custom(cursor)
-    with open('custom_query_result.json', 'w', encoding='utf-8') as file:
-        json.dump(custom_query_result, file, ensure_ascii=False, indent=4)
+    # Запросы и запись в файлы параллельно, каждый отчёт - в своём соединении только для чтения.
+    # Отчёты по категориям читаются из сводной таблицы, поддерживаемой триггерами
+    run_reports(DB_PATH, [
+        report_job(top_updated_report, 'top_updated_products.json'),
+        report_job(query_price_analysis_from_summary, 'price_analysis.json', formats=COLUMNAR_OUTPUT_FORMATS),
+        report_job(query_quantity_analysis_from_summary, 'quantity_analysis.json', formats=COLUMNAR_OUTPUT_FORMATS),
+        report_job(query_custom_from_summary, 'custom_query_result.json',  # Результат произвольного запроса
+                   formats=COLUMNAR_OUTPUT_FORMATS, columns=CUSTOM_QUERY_COLUMNS),
+    ])
 
     conn.close()
 
+    write_run_report()
+
 if __name__ == "__main__":
     main()
 
@@ -1,52 +1,107 @@
-import sqlite3
-import pickle
+import os
+import sys
 import json
 
-# 1. Создание таблицы subitems с первичным ключом id
-def create_subitems_table():
-    conn = sqlite3.connect('second_task.db')
-    cursor = conn.cursor()
-    cursor.execute('''
-        CREATE TABLE IF NOT EXISTS subitems (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,  -- автоинкрементируемый первичный ключ
-            name TEXT, 
-            rating REAL, 
-            convenience REAL, 
-            security REAL, 
-            functionality REAL, 
-            comment TEXT
-        )
-    ''')
-    conn.commit()
-    conn.close()
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
-# 2. Заполнение таблицы subitems из файла .pkl
-def populate_subitems_from_pkl(filename):
-    conn = sqlite3.connect('second_task.db')
-    cursor = conn.cursor()
+from common.db import ConnectionManager
+from common.export import export_report
+from common.incremental import SOURCE_KEY_VERSION, SourceRows, ensure_source_key, record_source, source_changed
+from common.index_advisor import advise_indexes, report_query
+from common.instrumentation import instrumented, write_run_report
+from common.report_cache import ReportCache, bump_data_version, install_data_version
+from common.search import DEFAULT_PAGE_SIZE, install_search_index, search
+from common.sidecar import iter_pickle_rows
+from common.topk import top_k_reports, top_k_spec
 
-    with open(filename, 'rb') as file:
-        data = pickle.load(file)
+DB_PATH = 'second_task.db'
 
-        # Извлекаем данные из словарей и вставляем их в таблицу
-        values = [(item['name'], item['rating'], item['convenience'], item['security'], item['functionality'],
-                   item['comment'])
-                  for item in data]
+SUBITEM_FIELDS = ['name', 'rating', 'convenience', 'security', 'functionality', 'comment']
 
-        # Вставляем данные без указания id (он будет автоматически сгенерирован)
-        cursor.executemany("INSERT INTO subitems (name, rating, convenience, security, functionality, comment) VALUES (?, ?, ?, ?, ?, ?)", values)
-        conn.commit()
+# Вставка отзыва; при повторной загрузке изменённого файла строка обновляется по ключу (файл, номер записи)
+SUBITEM_UPSERT_SQL = '''INSERT INTO subitems (source, source_row, name, rating, convenience, security, functionality, comment)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT(source, source_row) DO UPDATE SET name = excluded.name, rating = excluded.rating,
+                        convenience = excluded.convenience, security = excluded.security,
+                        functionality = excluded.functionality, comment = excluded.comment'''
 
-    conn.close()
+# 1. Создание таблицы subitems с первичным ключом id
+@instrumented()
+def create_subitems_table(db):
+    with db.cursor(DB_PATH) as cursor:
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS subitems (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,  -- автоинкрементируемый первичный ключ
+                name TEXT, 
+                rating REAL, 
+                convenience REAL, 
+                security REAL, 
+                functionality REAL, 
+                comment TEXT,
+                source TEXT,  -- файл-источник
+                source_row INTEGER  -- номер записи в источнике
+            )
+        ''')
+        # У отзывов нет идентификатора в источнике, а одинаковые отзывы встречаются - ключом служит
+        # происхождение строки (файл, номер записи)
+        ensure_source_key(cursor, 'subitems', 'idx_subitems_source', ['idx_subitems_natural_key'])
+        install_data_version(cursor, 'subitems')
 
-# 3. Запрос 1: Вывести название продукта и его рейтинг
-def display_product_ratings():
-    conn = sqlite3.connect('second_task.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+# 2. Заполнение таблицы subitems из файла .pkl
+@instrumented()
+def populate_subitems_from_pkl(db, filename):
+    # Неизменённый файл повторно не загружается
+    with db.cursor(DB_PATH) as cursor:
+        changed, fingerprint = source_changed(cursor, filename, SOURCE_KEY_VERSION)
+    if not changed:
+        print(f"Источник не изменился, загрузка пропущена: {filename}")
+        return False
+
+    # Значения читаются из столбцового кэша источника (pickle распаковывается только при его построении)
+    rows = SourceRows(filename)
+    values = rows.keyed(iter_pickle_rows(filename, SUBITEM_FIELDS, fingerprint=fingerprint))
+
+    with db.cursor(DB_PATH) as cursor:
+        # Вставляем данные без указания id (он будет автоматически сгенерирован); загруженные раньше записи
+        # файла обновляются, а записи, которых в файле больше нет, удаляются
+        cursor.executemany(SUBITEM_UPSERT_SQL, values)
+        rows.delete_stale(cursor, 'subitems')
+        bump_data_version(cursor, 'subitems')  # Кэшированные отчёты по таблице устарели
+        record_source(cursor, filename, fingerprint, SOURCE_KEY_VERSION)
+    return True
+
+# Полнотекстовый индекс по комментариям: заполняется целиком после первой загрузки, дальше - триггерами
+@instrumented()
+def create_search_index(db):
+    with db.cursor(DB_PATH) as cursor:
+        install_search_index(cursor, 'subitems_search', 'subitems', ['comment'])
+
+# Поиск отзывов по тексту комментария: страница результатов, лучшие совпадения первыми
+def search_comments(db, text, page=1, page_size=DEFAULT_PAGE_SIZE, prefix=False, phrase=False):
+    with db.cursor(DB_PATH) as cursor:
+        return search(cursor, 'subitems_search', 'subitems', ['id', 'name', 'rating', 'comment'], text, page, page_size,
+                      prefix=prefix, phrase=phrase, search_columns=['comment'])
+
+# Отчётные запросы и индексы для них (создаются после загрузки данных)
+REPORT_QUERIES = [
+    report_query('lowest_rated_product', "SELECT name, rating FROM subitems ORDER BY rating ASC LIMIT 1",
+                 [('idx_subitems_rating', 'subitems', ['rating', 'name'])]),
+    report_query('highest_rated_product', "SELECT name, rating FROM subitems ORDER BY rating DESC LIMIT 1",
+                 [('idx_subitems_rating', 'subitems', ['rating', 'name'])]),
+]
+
+# after_load - данные только что загружены (иначе замеры выполняются, только если создаётся индекс)
+def create_report_indexes(db, after_load=False):
+    with db.cursor(DB_PATH) as cursor:
+        advise_indexes(cursor, REPORT_QUERIES, after_load=after_load)
 
-    cursor.execute("SELECT name, rating FROM subitems")
-    results = cursor.fetchall()
+# 3. Запрос 1: Вывести название продукта и его рейтинг
+# Порядок задан явно (порядок загрузки), чтобы он не зависел от того, какие индексы созданы
+@instrumented()
+def display_product_ratings(db):
+    with db.cursor(DB_PATH) as cursor:
+        cursor.execute("SELECT name, rating FROM subitems ORDER BY id")
+        results = cursor.fetchall()
 
     data = []
     for result in results:
@@ -56,20 +111,15 @@ def display_product_ratings():
         }
         data.append(product_info)
 
-    with open(r'product_ratings.json', 'w', encoding='utf-8') as file:
-        json.dump(data, file, indent=4, ensure_ascii=False)
-
-    conn.close()
+    export_report(data, r'product_ratings.json')
 
 # 4. Запрос 2: Вывести средние значения удобства, безопасности и функциональности
-def average_ratings():
-    conn = sqlite3.connect('second_task.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    cursor.execute('''SELECT AVG(convenience), AVG(security), AVG(functionality)
-                      FROM subitems''')
-    results = cursor.fetchone()
+@instrumented()
+def average_ratings(db):
+    with db.cursor(DB_PATH) as cursor:
+        cursor.execute('''SELECT AVG(convenience), AVG(security), AVG(functionality)
+                          FROM subitems''')
+        results = cursor.fetchone()
 
     average_data = {
         "Среднее удобство": results[0],
@@ -80,21 +130,19 @@ def average_ratings():
     with open(r'average_ratings.json', 'w', encoding='utf-8') as file:
         json.dump(average_data, file, indent=4, ensure_ascii=False)
 
-    conn.close()
-
 # 5. Запрос 3: Продукты с наибольшим и наименьшим рейтингом
-def find_highest_and_lowest_rated_products():
-    conn = sqlite3.connect('second_task.db')
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-
-    # Продукт с наименьшим рейтингом
-    cursor.execute("SELECT name, rating FROM subitems ORDER BY rating ASC LIMIT 1")
-    lowest_rated = cursor.fetchone()
-
-    # Продукт с наибольшим рейтингом
-    cursor.execute("SELECT name, rating FROM subitems ORDER BY rating DESC LIMIT 1")
-    highest_rated = cursor.fetchone()
+@instrumented()
+def find_highest_and_lowest_rated_products(db):
+    # Оба крайних значения за один проход (или по индексу рейтинга, если он уже создан)
+    with db.cursor(DB_PATH) as cursor:
+        extremes = top_k_reports(cursor, 'subitems', ['name', 'rating'], [
+            top_k_spec('lowest', ['rating', 'name'], 1, largest=False),
+            top_k_spec('highest', ['rating', 'name'], 1),
+        ])
+    # В пустой таблице (или без оценок) продукта нет - в отчёт попадают null
+    missing = {'name': None, 'rating': None}
+    lowest_rated = extremes['lowest'][0] if extremes['lowest'] else missing
+    highest_rated = extremes['highest'][0] if extremes['highest'] else missing
 
     data = {
         "Продукт с наименьшим рейтингом": {
@@ -110,11 +158,20 @@ def find_highest_and_lowest_rated_products():
     with open(r'highest_and_lowest_rated_products.json', 'w', encoding='utf-8') as file:
         json.dump(data, file, indent=4, ensure_ascii=False)
 
-    conn.close()
-
-# Выполнение всех шагов
-create_subitems_table()
-populate_subitems_from_pkl('subitem.pkl')
-display_product_ratings()
-average_ratings()
-find_highest_and_lowest_rated_products()
+# Отчёт пересчитывается, только если изменились данные таблицы или код функции отчёта
+def cached_report(db, cache, output_file, report):
+    with db.cursor(DB_PATH) as cursor:
+        cache.materialize(cursor, ['subitems'], output_file, lambda: report(db), report)
+
+# Выполнение всех шагов (одно соединение с базой данных на весь запуск)
+if __name__ == "__main__":
+    with ConnectionManager() as db:
+        cache = ReportCache()
+        create_subitems_table(db)
+        loaded = populate_subitems_from_pkl(db, 'subitem.pkl')
+        create_search_index(db)
+        create_report_indexes(db, after_load=loaded)
+        cached_report(db, cache, 'product_ratings.json', display_product_ratings)
+        cached_report(db, cache, 'average_ratings.json', average_ratings)
+        cached_report(db, cache, 'highest_and_lowest_rated_products.json', find_highest_and_lowest_rated_products)
+    write_run_report()
@@ -0,0 +1,9 @@
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Модули заданий лежат в каталогах заданий и импортируют общий код из common
+for directory in ('first_task', 'second_task', 'third_task', 'fourth_task', 'fifth_task'):
+    sys.path.insert(0, os.path.join(ROOT, directory))
+sys.path.insert(0, ROOT)
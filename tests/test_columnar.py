@@ -0,0 +1,49 @@
+import pytest
+
+import common.columnar as columnar
+import common.instrumentation as instrumentation
+from common.columnar import ColumnBuffer, read_npz, write_columns
+
+ROWS = [(1, 2.5, 'Омск', True), (None, None, None, None), (3, 4, 'x', False)]
+NAMES = ['id', 'price', 'city', 'available']
+
+
+def buffered(rows=ROWS, names=NAMES):
+    buffer = ColumnBuffer(names)
+    for row in rows:
+        buffer.add(row)
+    return buffer.columns
+
+
+def test_npz_round_trip_keeps_types_and_nulls(tmp_path):
+    pytest.importorskip('numpy')
+    filename = write_columns(buffered(), str(tmp_path / 'report'), 'npz')
+    assert filename.endswith('.npz')
+    assert read_npz(filename) == {'id': [1, None, 3], 'price': [2.5, None, 4.0], 'city': ['Омск', None, 'x'],
+                                  'available': [True, None, False]}
+
+
+def test_parquet_round_trip(tmp_path):
+    parquet = pytest.importorskip('pyarrow.parquet')
+    filename = write_columns(buffered(), str(tmp_path / 'report'), 'parquet')
+    assert parquet.read_table(filename).to_pydict() == {'id': [1, None, 3], 'price': [2.5, None, 4.0],
+                                                        'city': ['Омск', None, 'x'], 'available': [True, None, False]}
+
+
+def test_explicit_unavailable_format_raises(tmp_path, monkeypatch):
+    monkeypatch.setattr(columnar, 'numpy', None)
+    with pytest.raises(ValueError, match='не установлен numpy'):
+        write_columns(buffered(), str(tmp_path / 'report'), 'npz')
+    with pytest.raises(ValueError, match='Неизвестный'):
+        write_columns(buffered(), str(tmp_path / 'report'), 'csv')
+
+
+def test_missing_backends_are_noted_in_run_report(tmp_path, monkeypatch):
+    for name in ('pyarrow', 'parquet', 'numpy'):
+        monkeypatch.setattr(columnar, name, None)
+    report = instrumentation.RunReport(str(tmp_path / 'run.json'))
+    monkeypatch.setattr(instrumentation, '_run_report', report)
+    with report.stage('export:report.json'):
+        assert write_columns(buffered(), str(tmp_path / 'report')) is None
+    assert report.stages[0]['notes'] == ["Столбцовый экспорт пропущен: не установлены ни pyarrow, ни numpy"]
+    assert list(tmp_path.iterdir()) == []
@@ -0,0 +1,147 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import fourth_task
+
+TASK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'fourth_task')
+
+PRODUCT_COLUMNS = '(name, price, quantity, category, fromCity, isAvailable, views)'
+
+
+def products_after(apply, products, changes):
+    conn = sqlite3.connect(':memory:')
+    cursor = conn.cursor()
+    fourth_task.create_products_table(cursor)
+    cursor.executemany(f"INSERT INTO products {PRODUCT_COLUMNS} VALUES (?, ?, ?, ?, ?, ?, ?)", products)
+    apply(cursor, changes)
+    cursor.execute("SELECT * FROM products ORDER BY id")
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+def assert_same_result(products, changes):
+    expected = products_after(fourth_task.apply_changes, products, changes)
+    assert products_after(fourth_task.apply_changes_folded, products, changes) == expected
+    return expected
+
+
+def test_folded_changes_match_row_by_row_on_task_data(tmp_path):
+    # Копии источников: столбцовый кэш изменений создаётся рядом с файлом
+    for filename in ('_product_data.text', '_update_data.pkl'):
+        shutil.copy(os.path.join(TASK_DIR, filename), tmp_path)
+    changes = fourth_task.load_changes(str(tmp_path / '_update_data.pkl'))
+
+    results = []
+    for apply in (fourth_task.apply_changes, fourth_task.apply_changes_folded):
+        conn = sqlite3.connect(':memory:')
+        cursor = conn.cursor()
+        fourth_task.create_products_table(cursor)
+        fourth_task.insert_products_from_text(cursor, str(tmp_path / '_product_data.text'))
+        apply(cursor, changes)
+        cursor.execute("SELECT * FROM products ORDER BY id")
+        results.append(cursor.fetchall())
+        conn.close()
+    assert results[0] == results[1]
+
+
+def test_duplicate_names_change_every_product():
+    products = [('lamp', 10.0, 5, 'home', 'Омск', True, 1),
+                ('lamp', 0.0, 1, 'home', 'Томск', False, 2),
+                ('desk', 20.0, 3, 'home', 'Омск', True, 3)]
+    changes = [('lamp', 'price_percent', 0.5), ('lamp', 'quantity_sub', 2), ('lamp', 'available', True),
+               ('lamp', 'price_abs', -12.0)]
+    rows = assert_same_result(products, changes)
+    assert [row[-1] for row in rows] == [3, 1, 0]
+
+
+def test_changes_after_remove_are_ignored():
+    products = [('lamp', 10.0, 5, 'home', 'Омск', True, 1), ('desk', 20.0, 3, 'home', 'Омск', True, 3)]
+    changes = [('lamp', 'price_abs', 1.0), ('lamp', 'remove', None), ('lamp', 'quantity_add', 4),
+               ('desk', 'quantity_add', 1), ('lamp', 'available', False)]
+    rows = assert_same_result(products, changes)
+    assert [row[1] for row in rows] == ['desk']
+
+
+@pytest.mark.parametrize('method', ['price_percent', 'price_abs', 'quantity_add', 'quantity_sub', 'available'])
+def test_null_values_and_params(method):
+    products = [('lamp', None, None, 'home', 'Омск', None, 1),
+                ('desk', 20.0, 3, 'home', 'Омск', True, 3)]
+    changes = [('lamp', method, 1), ('desk', method, None), ('desk', method, 1)]
+    assert_same_result(products, changes)
+
+
+def test_running_top_updated_matches_query():
+    products = [(f"product {index}", 10.0, 5, 'home', 'Омск', True, index) for index in range(30)]
+    changes = [(f"product {index % 12}", 'quantity_add', 1) for index in range(60)] + [('product 9', 'remove', None)]
+
+    conn = sqlite3.connect(':memory:')
+    cursor = conn.cursor()
+    fourth_task.create_products_table(cursor)
+    cursor.executemany(f"INSERT INTO products {PRODUCT_COLUMNS} VALUES (?, ?, ?, ?, ?, ?, ?)", products)
+    top_updated = fourth_task.running_top_updated_products(cursor)
+    fourth_task.apply_changes_folded(cursor, changes[:-1], top_updated)
+    assert top_updated.complete
+    assert fourth_task.format_running_top_updated_products(top_updated) == fourth_task.query_top_updated_products(cursor)
+
+    fourth_task.apply_changes_folded(cursor, changes[-1:], top_updated)
+    assert not top_updated.complete
+    conn.close()
+
+
+def test_folded_changes_are_written_with_one_update_and_one_delete():
+    products = [(f"product {index}", 10.0, 5, 'home', 'Омск', True, index) for index in range(50)]
+    changes = ([(f"product {index}", 'quantity_add', 1) for index in range(40)]
+               + [(f"product {index}", 'remove', None) for index in range(40, 45)])
+
+    conn = sqlite3.connect(':memory:')
+    cursor = conn.cursor()
+    fourth_task.create_products_table(cursor)
+    cursor.executemany(f"INSERT INTO products {PRODUCT_COLUMNS} VALUES (?, ?, ?, ?, ?, ?, ?)", products)
+    statements = []
+    conn.set_trace_callback(statements.append)
+    fourth_task.apply_changes_folded(cursor, changes)
+    conn.set_trace_callback(None)
+
+    # Триггеры сводной таблицы повторяют в трассировке текст запроса, поэтому считаются различные запросы
+    writes = dict.fromkeys(sql for sql in statements if sql.startswith(('UPDATE products', 'DELETE FROM products')))
+    assert [sql.split()[0] for sql in writes] == ['UPDATE', 'DELETE']
+    cursor.execute("SELECT COUNT(*), SUM(update_counter) FROM products")
+    assert cursor.fetchone() == (45, 40)
+    conn.close()
+
+
+# Исходные запросы отчётов по категориям (по одному сканированию products на отчёт) - эталон для сводной таблицы
+PRICE_ANALYSIS_SQL = '''SELECT category, SUM(price), MIN(price), MAX(price), AVG(price), COUNT(*)
+                        FROM products GROUP BY category'''
+QUANTITY_ANALYSIS_SQL = '''SELECT category, SUM(quantity), MIN(quantity), MAX(quantity), AVG(quantity), COUNT(*)
+                           FROM products GROUP BY category'''
+CUSTOM_SQL = '''SELECT category, MAX(price), MIN(price), AVG(price), MAX(quantity), COUNT(*)
+                FROM products WHERE quantity > 10 AND isAvailable = 1
+                GROUP BY category ORDER BY AVG(price) DESC, category ASC'''
+
+
+def test_summary_reports_match_per_report_queries(tmp_path):
+    for filename in ('_product_data.text', '_update_data.pkl'):
+        shutil.copy(os.path.join(TASK_DIR, filename), tmp_path)
+    conn = sqlite3.connect(':memory:')
+    cursor = conn.cursor()
+    fourth_task.create_products_table(cursor)
+    fourth_task.insert_products_from_text(cursor, str(tmp_path / '_product_data.text'))
+    fourth_task.apply_changes_folded(cursor, fourth_task.load_changes(str(tmp_path / '_update_data.pkl')))
+    price, quantity, custom = fourth_task.query_category_reports_from_summary(cursor)
+
+    expected = []
+    for sql in (PRICE_ANALYSIS_SQL, QUANTITY_ANALYSIS_SQL, CUSTOM_SQL):
+        cursor.execute(sql)
+        expected.append([tuple(row) for row in cursor.fetchall()])
+    # Суммы в сводке накапливаются триггерами, поэтому вещественные значения сравниваются приближённо
+    for actual, rows in zip(([tuple(row.values()) for row in price], [tuple(row.values()) for row in quantity], custom),
+                            expected):
+        assert len(actual) == len(rows)
+        for actual_row, row in zip(actual, rows):
+            assert actual_row == pytest.approx(row)
+    conn.close()
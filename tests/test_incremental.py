@@ -0,0 +1,66 @@
+import json
+import os
+import sqlite3
+
+import fifth_task
+import first_task
+from common.db import ConnectionManager
+
+CSV_HEADER = 'Title,Type,Genre,Release Year,Rating,Duration,Country'
+
+
+def movie(index, duration='90 min'):
+    return {'Title': f"Title {index}", 'Type': 'Movie', 'Genre': 'Drama', 'Release Year': '2000', 'Rating': 'PG',
+            'Duration': duration, 'Country': 'Japan'}
+
+
+def write_sources(tmp_path, csv_movies, json_movies):
+    csv_file, json_file = tmp_path / 'movies.csv', tmp_path / 'movies.json'
+    lines = [CSV_HEADER] + [','.join(movie.values()) for movie in csv_movies]
+    csv_file.write_text('\n'.join(lines) + '\n', encoding='utf-8')
+    json_file.write_text(json.dumps(json_movies), encoding='utf-8')
+    # Время изменения может совпасть с предыдущей записью - отпечаток сравнивается по содержимому
+    for filename in (csv_file, json_file):
+        os.utime(filename, ns=(0, 0))
+    return str(csv_file), str(json_file)
+
+
+def titles(cursor):
+    cursor.execute("SELECT title, duration, views FROM Movies_and_Shows ORDER BY title")
+    return cursor.fetchall()
+
+
+def test_changed_source_is_upserted_and_shrunk(tmp_path, monkeypatch):
+    monkeypatch.setattr(fifth_task, 'PARSE_IN_PROCESSES', False)
+    conn = sqlite3.connect(str(tmp_path / 'movies.db'))
+    cursor = conn.cursor()
+    csv_movies, json_movies = [movie(1), movie(2), movie(3)], [movie(4)]
+    assert fifth_task.load_movies_if_changed(cursor, *write_sources(tmp_path, csv_movies, json_movies))
+    cursor.execute("UPDATE Movies_and_Shows SET views = 7 WHERE title = 'Title 1'")
+
+    # CSV стал короче, одна запись изменилась; JSON не менялся
+    sources = write_sources(tmp_path, [movie(1, '100 min'), movie(3)], json_movies)
+    assert fifth_task.load_movies_if_changed(cursor, *sources)
+    assert titles(cursor) == [('Title 1', '100 min', 7), ('Title 3', '90 min', 0), ('Title 4', '90 min', 0)]
+    # Полнотекстовый индекс следует за таблицей через триггеры
+    assert fifth_task.search_titles(cursor, 'Title 2')['hits'] == []
+    assert [hit['title'] for hit in fifth_task.search_titles(cursor, 'Title 3')['hits']] == ['Title 3']
+
+    assert not fifth_task.load_movies_if_changed(cursor, *sources)
+    conn.close()
+
+
+def test_first_task_deletes_items_missing_from_source(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    header = ';'.join(field for field, _, _ in first_task.ITEM_CSV_SCHEMA)
+    items = ['1;a;s;c;1;1;2000;True;10;0', '2;b;s;c;1;1;2000;False;20;0', '3;c;s;c;1;1;2000;True;30;0']
+    source = tmp_path / 'item.csv'
+    with ConnectionManager() as db:
+        first_task.create_database(db)
+        for rows in (items, items[:1] + ['3;c;s;c;1;1;2000;True;35;0']):
+            source.write_text('\n'.join([header] + rows) + '\n', encoding='utf-8')
+            os.utime(source, ns=(0, 0))
+            assert first_task.populate_database_from_csv(db, str(source))
+        with db.cursor(first_task.DB_PATH) as cursor:
+            cursor.execute("SELECT id, prob_price FROM baza_dannix ORDER BY id")
+            assert [tuple(row) for row in cursor.fetchall()] == [(1, 10), (3, 35)]
@@ -0,0 +1,55 @@
+import sqlite3
+
+import pytest
+
+import common.index_advisor as index_advisor
+
+QUERIES = [index_advisor.report_query('by_rating', "SELECT name FROM items ORDER BY rating LIMIT 5",
+                                      [('idx_items_rating', 'items', ['rating', 'name'])])]
+
+
+@pytest.fixture
+def cursor():
+    cursor = sqlite3.connect(':memory:').cursor()
+    cursor.execute("CREATE TABLE items (name TEXT, rating REAL)")
+    cursor.executemany("INSERT INTO items VALUES (?, ?)", [(f"item {n}", n % 7) for n in range(100)])
+    return cursor
+
+
+def timed_queries(monkeypatch):
+    calls = []
+    original = index_advisor.time_query
+
+    def time_query(cursor, sql, *args, **kwargs):
+        calls.append(sql)
+        return original(cursor, sql, *args, **kwargs)
+
+    monkeypatch.setattr(index_advisor, 'time_query', time_query)
+    return calls
+
+
+def test_creates_missing_index_and_measures(cursor, tmp_path, monkeypatch):
+    calls = timed_queries(monkeypatch)
+    report = index_advisor.advise_indexes(cursor, QUERIES, report_file=str(tmp_path / 'report.json'))
+    assert report[0]['created_indexes'] == ['idx_items_rating']
+    assert len(calls) == 2
+    assert (tmp_path / 'report.json').exists()
+
+
+def test_no_change_run_skips_timing_and_analyze(cursor, tmp_path, monkeypatch):
+    index_advisor.advise_indexes(cursor, QUERIES, report_file=None)
+    calls = timed_queries(monkeypatch)
+    statements = []
+    cursor.connection.set_trace_callback(statements.append)
+    assert index_advisor.advise_indexes(cursor, QUERIES, report_file=str(tmp_path / 'report.json')) is None
+    assert calls == []
+    assert 'ANALYZE' not in statements
+    assert not (tmp_path / 'report.json').exists()
+
+
+def test_after_load_measures_with_existing_indexes(cursor, monkeypatch):
+    index_advisor.advise_indexes(cursor, QUERIES, report_file=None)
+    calls = timed_queries(monkeypatch)
+    report = index_advisor.advise_indexes(cursor, QUERIES, report_file=None, after_load=True)
+    assert report[0]['created_indexes'] == []
+    assert len(calls) == 2
@@ -0,0 +1,70 @@
+import io
+import json
+
+import pytest
+
+from common.json_stream import iter_json_items
+
+ITEMS = [{'Title': 'a]b,c', 'Quote': 'say "hi" \\ ]', 'n': 12345678901234567890}, [], {}, 'x,y]', -1.5e-3,
+         True, None, {'nested': [[1, 2], {'k': ']'}]}]
+
+
+def items(text, **options):
+    return list(iter_json_items(io.StringIO(text), **options))
+
+
+@pytest.mark.parametrize('chunk_size', [1, 2, 3, 7, 64, 1 << 16])
+def test_items_split_across_chunks(chunk_size):
+    text = json.dumps(ITEMS, indent=4, ensure_ascii=False)
+    assert items(text, chunk_size=chunk_size) == ITEMS
+
+
+@pytest.mark.parametrize('text', ['[]', '  [ \n ]  ', '', ' \n\t', '\ufeff[]'])
+def test_empty_input(text):
+    assert items(text, chunk_size=2) == []
+
+
+def test_whitespace_and_bom():
+    assert items('\ufeff \n [ 1 ,\n\t2 ]\n', chunk_size=3) == [1, 2]
+    assert items('\ufeff{"a": 1}\n\n{"a": 2}\n', chunk_size=3) == [{'a': 1}, {'a': 2}]
+
+
+@pytest.mark.parametrize('text, message', [
+    ('[1, 2', 'конец файла'),
+    ('[1, {"a": ', 'Некорректный JSON'),
+    ('[1, "abc', 'Некорректный JSON'),
+    ('[1,', 'Неожиданный конец'),
+    ('[1 2]', "Ожидалась ','"),
+    ('[1,]', 'Некорректный JSON'),
+    ('[{"a" 1}]', 'Некорректный JSON'),
+])
+def test_truncated_or_malformed_array(text, message):
+    with pytest.raises(ValueError, match=message):
+        items(text, chunk_size=2)
+
+
+def test_malformed_item_is_reported_with_offset_without_reading_the_rest():
+    class Counting(io.StringIO):
+        read_chars = 0
+
+        def read(self, size=-1):
+            data = super().read(size)
+            Counting.read_chars += len(data)
+            return data
+
+    text = '[{"a": 1}, {"a": tru}, ' + ', '.join(['{"a": 1}'] * 100_000) + ']'
+    with pytest.raises(ValueError, match=r'позиции 17\b'):
+        list(iter_json_items(Counting(text), chunk_size=64))
+    assert Counting.read_chars < 1024
+
+
+def test_oversized_item():
+    text = '[' + json.dumps('x' * 10_000) + ']'
+    assert items(text, chunk_size=16) == ['x' * 10_000]
+    with pytest.raises(ValueError, match='длиннее 1000'):
+        items(text, chunk_size=16, max_item_size=1000)
+
+
+def test_malformed_json_lines_reports_line():
+    with pytest.raises(ValueError, match='строке 2'):
+        items('{"a": 1}\n{"a": }\n')
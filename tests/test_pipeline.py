@@ -0,0 +1,44 @@
+import threading
+
+import pytest
+
+from common.pipeline import iter_concurrently
+
+
+def numbers(start, stop):
+    return iter(range(start, stop))
+
+
+def failing(count):
+    yield from range(count)
+    raise ValueError('broken source')
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_all_rows_from_all_sources(processes):
+    sources = [(numbers, 0, 1000), (numbers, 1000, 2500)]
+    if not processes:
+        sources = [function(*args) for function, *args in sources]
+    rows = list(iter_concurrently(sources, batch_size=64, queue_size=2, processes=processes))
+    assert sorted(rows) == list(range(2500))
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_source_error_is_raised_and_workers_stop(processes):
+    sources = [(failing, 10), (numbers, 0, 100_000)]
+    if not processes:
+        sources = [function(*args) for function, *args in sources]
+    with pytest.raises(ValueError, match='broken source'):
+        list(iter_concurrently(sources, batch_size=8, queue_size=1, processes=processes))
+    assert threading.active_count() == 1
+
+
+@pytest.mark.parametrize('processes', [False, True])
+def test_consumer_stopping_early_releases_blocked_sources(processes):
+    sources = [(numbers, 0, 100_000), (numbers, 0, 100_000)]
+    if not processes:
+        sources = [function(*args) for function, *args in sources]
+    rows = iter_concurrently(sources, batch_size=8, queue_size=1, processes=processes)
+    next(rows)
+    rows.close()
+    assert threading.active_count() == 1
@@ -0,0 +1,74 @@
+import json
+import sqlite3
+import sys
+
+import common.report_cache as report_cache
+from common.report_cache import ReportCache, install_data_version, report_fingerprint
+
+REPORT_QUERY = "SELECT value FROM items WHERE value > ?"
+REPORT_THRESHOLD = 1
+
+
+def items_report(cursor, filename):
+    cursor.execute(REPORT_QUERY, (REPORT_THRESHOLD,))
+    with open(filename, 'w', encoding='utf-8') as file:
+        json.dump([row[0] for row in cursor.fetchall()], file)
+
+
+def items_database(filename):
+    conn = sqlite3.connect(filename)
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE items (value INTEGER)")
+    cursor.executemany("INSERT INTO items VALUES (?)", [(1,), (2,), (3,)])
+    install_data_version(cursor, 'items')
+    cursor.execute("UPDATE data_versions SET version = 1")  # Одинаковые версии в разных базах
+    conn.commit()
+    return conn
+
+
+def test_fingerprint_follows_module_constants(monkeypatch):
+    fingerprint = report_fingerprint(items_report)
+    monkeypatch.setattr(sys.modules[__name__], 'REPORT_QUERY', "SELECT value FROM items WHERE value >= ?")
+    assert report_fingerprint(items_report) != fingerprint
+    monkeypatch.undo()
+    monkeypatch.setattr(sys.modules[__name__], 'REPORT_THRESHOLD', 2)
+    assert report_fingerprint(items_report) != fingerprint
+
+
+def test_key_depends_on_database_and_output(tmp_path):
+    cache = ReportCache(str(tmp_path / 'cache'))
+    output = str(tmp_path / 'report.json')
+    results = []
+    for database in ('first.db', 'second.db'):
+        conn = items_database(str(tmp_path / database))
+        cursor = conn.cursor()
+        results.append(cache.materialize(cursor, ['items'], output, lambda: items_report(cursor, output),
+                                         items_report))
+        results.append(cache.materialize(cursor, ['items'], output, lambda: items_report(cursor, output),
+                                         items_report))
+        conn.close()
+    assert results == [True, False, True, False]
+
+
+def test_unchanged_outputs_are_not_hashed(tmp_path, monkeypatch):
+    cache = ReportCache(str(tmp_path / 'cache'))
+    output = str(tmp_path / 'report.json')
+    conn = items_database(str(tmp_path / 'items.db'))
+    cursor = conn.cursor()
+    produce = lambda: items_report(cursor, output)
+    assert cache.materialize(cursor, ['items'], output, produce, items_report)
+
+    hashed = []
+    file_hash = report_cache.file_hash
+    monkeypatch.setattr(report_cache, 'file_hash', lambda filename: hashed.append(filename) or file_hash(filename))
+    assert not cache.materialize(cursor, ['items'], output, produce, items_report)
+    assert hashed == []
+
+    # Изменённый файл сверяется по хэшу и восстанавливается из кэша
+    with open(output, 'w', encoding='utf-8') as file:
+        file.write('[]')
+    assert not cache.materialize(cursor, ['items'], output, produce, items_report)
+    assert hashed == [output]
+    with open(output, encoding='utf-8') as file:
+        assert json.load(file) == [2, 3]
+    conn.close()
@@ -0,0 +1,81 @@
+import sqlite3
+
+import pytest
+
+from common.search import SearchError, fts5_available, install_search_index, search
+
+
+def titles_cursor(titles):
+    cursor = sqlite3.connect(':memory:').cursor()
+    cursor.execute("CREATE TABLE titles (id INTEGER PRIMARY KEY, title TEXT, year INTEGER)")
+    cursor.executemany("INSERT INTO titles (title, year) VALUES (?, ?)", titles)
+    if not fts5_available(cursor):
+        pytest.skip('SQLite собран без FTS5')
+    install_search_index(cursor, 'titles_search', 'titles', ['title'])
+    return cursor
+
+
+def found(cursor, text, **options):
+    return [hit['title'] for hit in search(cursor, 'titles_search', 'titles', ['id', 'title'], text, **options)['hits']]
+
+
+@pytest.fixture
+def cursor():
+    return titles_cursor([('The Lost City', 2001), ('Lost', 2004), ('City of Lost Children', 1995),
+                          ('Lost in Translation', 2003), ('Citizen Kane', 1941), ('Café "Noir"', 2010)])
+
+
+def test_ranked_words_prefix_and_phrase(cursor):
+    assert found(cursor, 'lost')[0] == 'Lost'  # Самый короткий документ с термином - лучший по bm25
+    assert set(found(cursor, 'lost city')) == {'The Lost City', 'City of Lost Children'}
+    assert found(cursor, 'lost city', phrase=True) == ['The Lost City']
+    assert set(found(cursor, 'cit', prefix=True)) == {'The Lost City', 'City of Lost Children', 'Citizen Kane'}
+    assert found(cursor, 'cafe') == ['Café "Noir"']  # remove_diacritics
+    assert found(cursor, '"noir') == ['Café "Noir"']  # Кавычки в тексте пользователя экранируются
+    assert found(cursor, 'lost OR kane', raw=True)
+
+
+def test_pages(cursor):
+    pages = [search(cursor, 'titles_search', 'titles', ['title'], 'lost', page=page, page_size=2) for page in (1, 2, 3)]
+    assert [len(page['hits']) for page in pages] == [2, 2, 0]
+    assert [page['has_more'] for page in pages] == [True, False, False]
+    assert len({hit['title'] for page in pages for hit in page['hits']}) == 4
+
+
+@pytest.mark.parametrize('options', [{'page': 0}, {'page': -1}, {'page_size': 0}, {'page': 1.5}])
+def test_invalid_pages(cursor, options):
+    with pytest.raises(SearchError):
+        search(cursor, 'titles_search', 'titles', ['title'], 'lost', **options)
+
+
+def test_raw_syntax_error(cursor):
+    with pytest.raises(SearchError):
+        search(cursor, 'titles_search', 'titles', ['title'], '"unterminated AND', raw=True)
+
+
+def test_triggers_keep_index_in_sync(cursor):
+    cursor.execute("INSERT INTO titles (title, year) VALUES ('Zebra Quest', 2020)")
+    assert found(cursor, 'zebra') == ['Zebra Quest']
+    cursor.execute("UPDATE titles SET title = 'Lion Quest' WHERE title = 'Zebra Quest'")
+    assert found(cursor, 'zebra') == [] and found(cursor, 'lion') == ['Lion Quest']
+    cursor.execute("UPDATE titles SET year = 2021 WHERE title = 'Lion Quest'")  # Не индексируемый столбец
+    assert found(cursor, 'lion') == ['Lion Quest']
+    cursor.execute("DELETE FROM titles WHERE title = 'Lion Quest'")
+    assert found(cursor, 'quest') == []
+    cursor.execute("INSERT INTO titles_search (titles_search) VALUES ('integrity-check')")
+
+
+# Без полнотекстового индекса - поиск подстроки через LIKE, где % и _ из запроса не являются шаблонами
+def test_like_fallback_escapes_wildcards():
+    cursor = sqlite3.connect(':memory:').cursor()
+    cursor.execute("CREATE TABLE titles (id INTEGER PRIMARY KEY, title TEXT)")
+    cursor.executemany("INSERT INTO titles (title) VALUES (?)",
+                       [('100% Love',), ('1000 Love',), ('snake_case',), ('snakescase',), ('back\\slash',)])
+
+    def like_found(text):
+        return [hit['title'] for hit in search(cursor, 'missing_search', 'titles', ['title'], text)['hits']]
+
+    assert like_found('100%') == ['100% Love']
+    assert like_found('e_c') == ['snake_case']
+    assert like_found('k\\s') == ['back\\slash']
+    assert like_found('love') == ['100% Love', '1000 Love']
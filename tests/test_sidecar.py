@@ -0,0 +1,69 @@
+import datetime
+import os
+import pickle
+import shutil
+
+import pytest
+
+import common.sidecar as sidecar
+from common.incremental import file_fingerprint
+
+pytest.importorskip('numpy')
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+TASK_SOURCES = [('second_task', 'subitem.pkl'), ('third_task', '_part_2.pkl'), ('fourth_task', '_update_data.pkl')]
+
+ITEMS = [
+    {'id': 1, 'price': 1.5, 'name': 'лампа', 'flag': True, 'mixed': 1, 'pair': (1, 2), 'when': datetime.date(2024, 1, 2),
+     'raw': b'\x00\x01', 'big': 2 ** 70},
+    {'id': 2, 'price': None, 'name': None, 'flag': False, 'mixed': 'один', 'pair': None, 'when': None, 'raw': b'',
+     'big': 1},
+    {'id': None, 'name': '', 'mixed': [1, {'a': None}], 'extra': 'только здесь'},
+]
+
+
+def rows_of(items, fields):
+    return [tuple(item.get(name) for name in fields) for item in items]
+
+
+def copy_with_types(rows):
+    return [tuple((type(value), value) for value in row) for row in rows]
+
+
+def test_round_trip_keeps_values_and_types(tmp_path):
+    source = str(tmp_path / 'items.pkl')
+    with open(source, 'wb') as file:
+        pickle.dump(ITEMS, file)
+    fields = ['id', 'price', 'name', 'flag', 'mixed', 'pair', 'when', 'raw', 'big', 'extra', 'missing']
+
+    for _ in range(2):  # Построение кэша, затем чтение из него
+        rows = list(sidecar.iter_pickle_rows(source, fields, batch_size=2))
+        assert copy_with_types(rows) == copy_with_types(rows_of(ITEMS, fields))
+
+
+@pytest.mark.parametrize('task, filename', TASK_SOURCES)
+def test_round_trip_on_task_sources(tmp_path, task, filename):
+    source = str(tmp_path / filename)
+    shutil.copy(os.path.join(ROOT, task, filename), source)
+    with open(source, 'rb') as file:
+        items = pickle.load(file)
+    fields = sorted({name for item in items for name in item})
+    assert copy_with_types(sidecar.iter_pickle_rows(source, fields)) == copy_with_types(rows_of(items, fields))
+
+
+def test_source_is_hashed_only_when_it_changes(tmp_path, monkeypatch):
+    source = str(tmp_path / 'items.pkl')
+    with open(source, 'wb') as file:
+        pickle.dump(ITEMS, file)
+    hashed = []
+    chunk_hashes = sidecar.chunk_hashes
+    monkeypatch.setattr(sidecar, 'chunk_hashes', lambda filename: hashed.append(filename) or chunk_hashes(filename))
+
+    list(sidecar.iter_pickle_rows(source, ['id']))
+    list(sidecar.iter_pickle_rows(source, ['id']))
+    assert len(hashed) == 1
+
+    os.utime(source, ns=(0, 0))  # Время изменилось, содержимое - нет: кэш не перестраивается
+    list(sidecar.iter_pickle_rows(source, ['id'], fingerprint=file_fingerprint(source)))
+    list(sidecar.iter_pickle_rows(source, ['id']))
+    assert len(hashed) == 1
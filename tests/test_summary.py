@@ -0,0 +1,43 @@
+import sqlite3
+
+from common.summary import install_summary, read_summary, refresh_stale
+
+MEASURES = [('price', '{row}.price', None), ('cheap_price', '{row}.price', '{row}.price < 10')]
+
+
+def summary_and_query(cursor):
+    summary = [(row['category'], row['row_count'], row['price']['sum'], row['price']['min'], row['price']['max'],
+                row['cheap_price']['count'])
+               for row in read_summary(cursor, 'stats', 'products', 'category', MEASURES)]
+    cursor.execute('''SELECT category, COUNT(*), SUM(price), MIN(price), MAX(price), COUNT(CASE WHEN price < 10 THEN 1 END)
+                      FROM products GROUP BY category ORDER BY category''')
+    return summary, [tuple(row) for row in cursor.fetchall()]
+
+
+def test_summary_keeps_null_group_and_reads_without_writing(tmp_path):
+    path = str(tmp_path / 'summary.db')
+    conn = sqlite3.connect(path)
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE products (id INTEGER PRIMARY KEY, category TEXT, price REAL)")
+    cursor.executemany("INSERT INTO products (category, price) VALUES (?, ?)",
+                       [('fruit', 5.0), (None, 3.0), ('fruit', 12.0), (None, 20.0)])
+    install_summary(cursor, 'stats', 'products', 'category', MEASURES)
+    cursor.executemany("INSERT INTO products (category, price) VALUES (?, ?)", [(None, 1.0), ('tools', 7.0), (None, 50.0)])
+    cursor.execute("DELETE FROM products WHERE price = 50.0")  # Удалён максимум группы NULL - группа устарела
+    cursor.execute("UPDATE products SET category = NULL WHERE category = 'tools'")
+    conn.commit()
+
+    summary, expected = summary_and_query(cursor)
+    assert summary == expected
+    assert summary[0][:2] == (None, 4)
+
+    # Соединение только для чтения: устаревшая группа считается без записи
+    read_only = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+    assert summary_and_query(read_only.cursor())[0] == expected
+    read_only.close()
+
+    assert refresh_stale(cursor, 'stats', 'products', 'category', MEASURES) == 1
+    assert summary_and_query(cursor)[0] == expected
+    cursor.execute("SELECT COUNT(*) FROM stats WHERE category IS NULL")
+    assert cursor.fetchone()[0] == 1
+    conn.close()
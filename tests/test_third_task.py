@@ -0,0 +1,55 @@
+import os
+import shutil
+import sqlite3
+
+import pytest
+
+import third_task
+
+TASK_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'third_task')
+
+# Строки, на которых векторное приведение (pd.to_numeric) расходится с int()/float(),
+# в том числе в последнем знаке дробных чисел
+EDGE_VALUES = ['215746.0', '1_000', ' 42 ', '+7', '1e3', '-0', 'abc', '', '١٢٣', 'nan', 'inf', '12.5.1',
+               '1e400', '000123', '0.30000000000000004', '-468372.98173601523', '0.9156213046218451']
+
+
+def loaded_songs(directory, filename, loader):
+    os.chdir(directory)
+    third_task.create_songs_table()
+    loader(filename)
+    conn = sqlite3.connect('third_task.db')
+    rows = conn.execute("SELECT * FROM songs ORDER BY id").fetchall()
+    conn.close()
+    return rows
+
+
+def assert_same_songs(tmp_path, monkeypatch, source):
+    monkeypatch.chdir(tmp_path)
+    rows = []
+    for name, loader in (('rows', third_task.populate_songs_from_txt),
+                         ('columns', third_task.populate_songs_from_txt_columnar)):
+        directory = tmp_path / name
+        directory.mkdir()
+        shutil.copy(source, directory / 'songs.text')
+        rows.append(loaded_songs(directory, 'songs.text', loader))
+    assert rows[0] == rows[1]
+    return rows[0]
+
+
+def test_columnar_loader_matches_row_loader_on_task_data(tmp_path, monkeypatch):
+    pytest.importorskip('pandas')
+    rows = assert_same_songs(tmp_path, monkeypatch, os.path.join(TASK_DIR, '_part_1.text'))
+    assert rows
+
+
+def test_columnar_loader_matches_row_loader_on_edge_values(tmp_path, monkeypatch):
+    pytest.importorskip('pandas')
+    source = tmp_path / 'edge.text'
+    with open(source, 'w', encoding='utf-8') as file:
+        for index, value in enumerate(EDGE_VALUES):
+            file.write(f"artist::artist {index}\nsong::song {index}\nduration_ms::{value}\nyear::{value}\n"
+                       f"tempo::{value}\ngenre::(pop)\n=====\n")
+        file.write("artist::no numbers\nsong::missing fields\n=====\n")
+    rows = assert_same_songs(tmp_path, monkeypatch, source)
+    assert [row[3] for row in rows[:3]] == [0, 1000, 42]
@@ -0,0 +1,41 @@
+import json
+import sqlite3
+
+import pytest
+
+import second_task
+from common.db import ConnectionManager
+from common.topk import top_k_reports, top_k_spec
+
+SUBITEMS = [('a', 5.0), (None, 5.0), ('b', 5.0), (None, 3.0), ('c', None), ('d', 7.0), (None, 7.0)]
+
+
+@pytest.fixture
+def cursor():
+    conn = sqlite3.connect(':memory:')
+    cursor = conn.cursor()
+    cursor.execute("CREATE TABLE subitems (id INTEGER PRIMARY KEY, name TEXT, rating REAL)")
+    cursor.executemany("INSERT INTO subitems (name, rating) VALUES (?, ?)", SUBITEMS)
+    yield cursor
+    conn.close()
+
+
+@pytest.mark.parametrize('largest', [True, False])
+@pytest.mark.parametrize('k', [1, 3, 10])
+def test_scan_orders_null_secondary_columns_like_sqlite(cursor, largest, k):
+    specs = [top_k_spec('top', ['rating', 'name'], k, largest=largest)]
+    scanned = top_k_reports(cursor, 'subitems', ['name', 'rating'], specs, use_index=False)
+    direction = ' DESC' if largest else ''
+    cursor.execute(f"SELECT name, rating FROM subitems WHERE rating IS NOT NULL "
+                   f"ORDER BY rating{direction}, name{direction} LIMIT ?", (k,))
+    assert scanned['top'] == cursor.fetchall()
+
+
+def test_extremes_report_on_empty_table(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    with ConnectionManager() as db:
+        second_task.create_subitems_table(db)
+        second_task.find_highest_and_lowest_rated_products(db)
+    with open('highest_and_lowest_rated_products.json', encoding='utf-8') as file:
+        report = json.load(file)
+    assert [product['Продукт'] for product in report.values()] == [None, None]
@@ -1,10 +1,50 @@
+import os
+import sys
 import sqlite3
 import json
-import pickle
 import re
 
+try:
+    import numpy as np
+    import pandas as pd
+except ImportError:
+    np = pd = None
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common.bulk import batched
+from common.export import COLUMNAR_OUTPUT_FORMATS, export_report, iter_dicts
+from common.incremental import SOURCE_KEY_VERSION, SourceRows, ensure_source_key, record_source, source_changed
+from common.index_advisor import advise_indexes, report_query
+from common.instrumentation import instrumented, write_run_report
+from common.normalize_cache import normalization_cache, print_cache_stats
+from common.query_builder import aggregate_query, frequency_query, select_query
+from common.records import convert_value, read_records
+from common.report_cache import ReportCache, bump_data_version, install_data_version
+from common.sidecar import iter_pickle_rows
+
+
+# Вставка песни; при повторной загрузке изменённого файла строка обновляется по ключу (файл, номер записи).
+# Пара (artist, song) ключом не служит: она повторяется внутри файлов и между .pkl и .text
+SONG_UPSERT_SQL = '''INSERT INTO songs (source, source_row, artist, song, duration_ms, year, tempo, genre, acousticness,
+                                        energy, popularity)
+                     VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                     ON CONFLICT(source, source_row) DO UPDATE SET artist = excluded.artist, song = excluded.song,
+                     duration_ms = excluded.duration_ms, year = excluded.year, tempo = excluded.tempo,
+                     genre = excluded.genre, acousticness = excluded.acousticness, energy = excluded.energy,
+                     popularity = excluded.popularity'''
+
+
+# Проверка источника перед загрузкой: (изменился ли, отпечаток)
+def check_source(cursor, filename):
+    changed, fingerprint = source_changed(cursor, filename, SOURCE_KEY_VERSION)
+    if not changed:
+        print(f"Источник не изменился, загрузка пропущена: {filename}")
+    return changed, fingerprint
+
 
 # 1. Создание таблицы songs
+@instrumented()
 def create_songs_table():
     conn = sqlite3.connect('third_task.db')  # Используйте базу данных .db
     cursor = conn.cursor()
@@ -19,122 +59,227 @@ def create_songs_table():
         genre TEXT,
         acousticness REAL,
         energy REAL,
-        popularity INTEGER
+        popularity INTEGER,
+        source TEXT,  -- файл-источник
+        source_row INTEGER  -- номер записи в источнике
     )''')
+    ensure_source_key(cursor, 'songs', 'idx_songs_source', ['idx_songs_artist_song'])
+    install_data_version(cursor, 'songs')
     conn.commit()
     conn.close()
 
 
 # 2. Заполнение таблицы songs из файла .pkl
+SONG_PKL_FIELDS = ('artist', 'song', 'duration_ms', 'year', 'tempo', 'genre', 'acousticness', 'energy', 'popularity')
+
+@instrumented()
 def populate_songs_from_pkl(filename):
     conn = sqlite3.connect('third_task.db')  # Используйте базу данных .db
     cursor = conn.cursor()
+    changed, fingerprint = check_source(cursor, filename)
+    if not changed:
+        conn.close()
+        return False
 
-    with open(filename, 'rb') as file:
-        data = pickle.load(file)
+    # Преобразуем данные из pkl в формат для вставки (значения читаются из столбцового кэша источника)
+    rows = SourceRows(filename)
+    values = rows.keyed((artist, song, int(duration_ms), int(year), float(tempo), genre, float(acousticness),
+                         float(energy), int(popularity))
+                        for artist, song, duration_ms, year, tempo, genre, acousticness, energy, popularity
+                        in iter_pickle_rows(filename, SONG_PKL_FIELDS, fingerprint=fingerprint))
+
+    cursor.executemany(SONG_UPSERT_SQL, values)
+    rows.delete_stale(cursor, 'songs')  # Записи, которых в файле больше нет
+    bump_data_version(cursor, 'songs')  # Кэшированные отчёты по таблице устарели
+    record_source(cursor, filename, fingerprint, SOURCE_KEY_VERSION)
+    conn.commit()
 
-        # Преобразуем данные из pkl в формат для вставки
-        values = [(item['artist'], item['song'], int(item['duration_ms']), int(item['year']), float(item['tempo']),
-                   item['genre'], float(item['acousticness']), float(item['energy']), int(item['popularity']))
-                  for item in data]
+    conn.close()
+    return True
 
-        cursor.executemany(
-            "INSERT INTO songs (artist, song, duration_ms, year, tempo, genre, acousticness, energy, popularity) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            values)
-        conn.commit()
 
-    conn.close()
+# 3. Заполнение таблицы songs из текстового файла .txt (формат "ключ::значение", записи разделены "=====")
+SONG_TEXT_SCHEMA = (
+    ('artist', str, ''),
+    ('song', str, ''),
+    ('duration_ms', int, 0),
+    ('year', int, 0),
+    ('tempo', float, 0.0),
+    ('genre', str, ''),
+    ('acousticness', float, 0.0),
+    ('energy', float, 0.0),
+    ('popularity', int, 0),
+)
 
 
-# 3. Заполнение таблицы songs из текстового файла .txt
+@instrumented()
 def populate_songs_from_txt(filename):
     conn = sqlite3.connect('third_task.db')  # Используйте базу данных .db
     cursor = conn.cursor()
+    changed, fingerprint = check_source(cursor, filename)
+    if not changed:
+        conn.close()
+        return False
+
+    # Записи читаются потоково, жанр очищается от лишних символов (скобки, апострофы и пробелы)
+    rows = SourceRows(filename)
+    values = rows.keyed(record[:5] + (clean_text(record[5]),) + record[6:]
+                        for record in read_records(filename, SONG_TEXT_SCHEMA))
+
+    # Вставляем все данные в таблицу
+    cursor.executemany(SONG_UPSERT_SQL, values)
+    rows.delete_stale(cursor, 'songs')
+    bump_data_version(cursor, 'songs')
+    record_source(cursor, filename, fingerprint, SOURCE_KEY_VERSION)
+    conn.commit()
+
+    conn.close()
+    return True
+
+
+# Столбцовая загрузка из текстового файла: записи собираются пакетами по столбцам, числа приводятся векторно
+# с тем же результатом, что и при построчной загрузке (convert_value), жанр - через clean_text для каждого
+# различного значения. Без pandas используется построчная загрузка populate_songs_from_txt.
+# По замерам (benchmarks: load_text и load_text_rows) она не быстрее построчной - основное время уходит
+# на разбор текста "ключ::значение", который одинаков для обеих.
+SONG_COLUMN_BATCH_SIZE = 200_000
+# Целое, которое int() и приведение NumPy разбирают одинаково (18 цифр - без переполнения int64)
+INTEGER_LITERAL = r'\s*[+-]?[0-9]{1,18}\s*'
+
+
+# Векторное приведение числового столбца. pd.to_numeric(errors='coerce') отмечает разбираемые ячейки,
+# но округляет последний знак иначе, чем float(), поэтому сами значения берутся приведением строк NumPy
+# (оно совпадает с float()/int()). Ячейки, где правила могут разойтись (не распознаны pandas, 'nan',
+# "1_000", "215746.0" для int и т.п.), приводятся convert_value по одной
+def convert_numeric_column(column, field_type, default):
+    if field_type is int:
+        exact = column.str.fullmatch(INTEGER_LITERAL).fillna(False).to_numpy(dtype=bool)
+        dtype = np.int64
+    else:
+        exact = pd.to_numeric(column, errors='coerce').notna().to_numpy()
+        dtype = np.float64
+    strings = column.to_numpy(dtype=object)
+    values = np.empty(len(strings), dtype=object)
+    try:
+        values[exact] = strings[exact].astype(str).astype(dtype).tolist()
+    except ValueError:
+        exact = np.zeros(len(strings), dtype=bool)
+    missing = ~exact & (strings == '')  # Отсутствующее поле - значение по умолчанию, как и в convert_value
+    values[missing] = default
+    for index in np.flatnonzero(~exact & ~missing):
+        values[index] = convert_value(strings[index], field_type, default)
+    return values.tolist()
+
+
+@instrumented()
+def populate_songs_from_txt_columnar(filename, batch_size=SONG_COLUMN_BATCH_SIZE):
+    if pd is None:
+        return populate_songs_from_txt(filename)
+
+    conn = sqlite3.connect('third_task.db')
+    cursor = conn.cursor()
+    changed, fingerprint = check_source(cursor, filename)
+    if not changed:
+        conn.close()
+        return False
 
-    with open(filename, 'r', encoding='utf-8') as txtfile:
-        # Прочитаем все строки из файла и разделим их на элементы
-        lines = txtfile.readlines()
-
-        # Преобразуем данные из txt в формат для вставки
-        values = []
-        for line in lines:
-            # Предположим, что данные разделены пробелами или табуляциями
-            parts = line.strip().split()  # Разделяем по пробелам (если данные разделены табуляциями, используйте .split('\t'))
-
-            if len(parts) == 9:  # Проверяем, что в строке 9 элементов
-                try:
-                    artist, song, duration_ms, year, tempo, genre, acousticness, energy, popularity = parts
-
-                    # Преобразуем все элементы в нужные типы данных, используя try-except для обработки ошибок
-                    duration_ms = int(duration_ms) if duration_ms.isdigit() else 0
-                    year = int(year) if year.isdigit() else 0
-                    tempo = float(tempo) if is_float(tempo) else 0.0
-                    acousticness = float(acousticness) if is_float(acousticness) else 0.0
-                    energy = float(energy) if is_float(energy) else 0.0
-                    popularity = int(popularity) if popularity.isdigit() else 0
-
-                    # Очистка жанра от лишних символов (удаляем скобки, апострофы и пробелы)
-                    genre = clean_text(genre)
-
-                    values.append((artist, song, duration_ms, year, tempo, genre, acousticness, energy, popularity))
-                except ValueError as e:
-                    print(f"Skipping invalid line: {line} due to error: {e}")
-
-        # Вставляем все данные в таблицу
-        cursor.executemany(
-            "INSERT INTO songs (artist, song, duration_ms, year, tempo, genre, acousticness, energy, popularity) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
-            values)
+    keys = [key for key, _, _ in SONG_TEXT_SCHEMA]
+    raw_schema = tuple((key, str, '') for key in keys)  # Значения читаются строками и приводятся по столбцам
+    rows = SourceRows(filename)
+    for batch in batched(read_records(filename, raw_schema), batch_size):
+        frame = pd.DataFrame(batch, columns=keys)
+        columns = []
+        for key, field_type, default in SONG_TEXT_SCHEMA:
+            column = frame[key]
+            if field_type in (int, float):
+                columns.append(convert_numeric_column(column, field_type, default))
+                continue
+            if field_type is not str:
+                converted = {value: convert_value(value, field_type, default) for value in column.unique()}
+                column = column.map(converted)
+            elif key == 'genre':
+                cleaned = {genre: clean_text(genre) for genre in column.unique()}
+                column = column.map(cleaned)
+            columns.append(column.tolist())
+
+        cursor.executemany(SONG_UPSERT_SQL, rows.keyed(zip(*columns)))
         conn.commit()
 
+    rows.delete_stale(cursor, 'songs')
+    bump_data_version(cursor, 'songs')
+    record_source(cursor, filename, fingerprint, SOURCE_KEY_VERSION)
+    conn.commit()
     conn.close()
+    return True
+
+
+# Регулярные выражения для clean_text компилируются один раз
+BRACKETS_AND_QUOTES = re.compile(r'[()"\']')
+REPEATED_SPACES = re.compile(r'\s+')
+EDGE_BRACKETS_AND_SPACES = re.compile(r'^(\s|\()*(.*?)\s*(\)|\')*$')
 
 
 # Функция для очистки текста (удаление скобок, кавычек, апострофов и лишних пробелов)
+# Различных жанров немного, поэтому результаты кэшируются
+@normalization_cache()
 def clean_text(text):
     # Удаляем все символы, кроме букв, цифр, пробелов и дефисов
-    text = re.sub(r'[()"\']', '', text)  # Удаляем скобки и кавычки
-    text = re.sub(r'\s+', ' ', text)  # Убираем лишние пробелы между словами
-    text = re.sub(r'^(\s|\()*(.*?)\s*(\)|\')*$', r'\2', text)  # Убираем скобки и пробелы в начале/конце
+    text = BRACKETS_AND_QUOTES.sub('', text)  # Удаляем скобки и кавычки
+    text = REPEATED_SPACES.sub(' ', text)  # Убираем лишние пробелы между словами
+    text = EDGE_BRACKETS_AND_SPACES.sub(r'\2', text)  # Убираем скобки и пробелы в начале/конце
     text = text.strip()  # Убираем пробелы в начале и в конце
     return text
 
 
-# Дополнительная проверка на число с плавающей точкой
-def is_float(value):
-    try:
-        float(value)
-        return True
-    except ValueError:
-        return False
+# Отчётные запросы и индексы для них (создаются после загрузки данных)
+REPORT_QUERIES = [
+    report_query('first_sorted', "SELECT * FROM songs ORDER BY duration_ms LIMIT 44",
+                 [('idx_songs_duration_ms', 'songs', ['duration_ms'])]),
+    report_query('categorical_frequency', "SELECT genre, COUNT(genre) AS frequency FROM songs GROUP BY genre",
+                 [('idx_songs_genre', 'songs', ['genre'])]),
+    report_query('filtered_sorted', "SELECT * FROM songs WHERE year > ? ORDER BY year LIMIT 49",
+                 [('idx_songs_year', 'songs', ['year'])], params=(2000,)),
+]
+
+
+# after_load - данные только что загружены (иначе замеры выполняются, только если создаётся индекс)
+def create_report_indexes(after_load=False):
+    conn = sqlite3.connect('third_task.db')
+    cursor = conn.cursor()
+    advise_indexes(cursor, REPORT_QUERIES, after_load=after_load)
+    conn.commit()
+    conn.close()
+
+
+# Поля таблицы songs, допустимые в отчётах с произвольным полем/условием, и столбцы этих отчётов
+# (служебные source и source_row в отчёты не попадают)
+SONG_FIELDS = ('id', 'artist', 'song', 'duration_ms', 'year', 'tempo', 'genre', 'acousticness', 'energy', 'popularity')
 
 
 # 4. Запрос 1: Вывод первых VAR+10 строк, отсортированных по произвольному числовому полю
+@instrumented()
 def export_first_sorted_to_json(var, sort_field):
     conn = sqlite3.connect('third_task.db')
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
 
-    query = f"SELECT * FROM songs ORDER BY {sort_field} LIMIT {var + 10}"
-    cursor.execute(query)
-    rows = cursor.fetchall()
-
-    headers = [description[0] for description in cursor.description]
-    data = [dict(zip(headers, row)) for row in rows]
+    cursor.execute(*select_query('songs', SONG_FIELDS, columns=SONG_FIELDS, order_by=sort_field, limit=var + 10))
 
+    # Строки записываются в файл по мере чтения из курсора
     filename = "first_sorted.json"
-    with open(filename, 'w', encoding='utf-8') as outfile:
-        json.dump(data, outfile, indent=4)
+    written = export_report(iter_dicts(cursor), filename, formats=COLUMNAR_OUTPUT_FORMATS, ensure_ascii=True)
 
     conn.close()
+    return written
 
 
 # 5. Запрос 2: Вывод суммы, минимума, максимума и среднего для произвольного числового поля
+@instrumented()
 def export_aggregate_results(numeric_field):
     conn = sqlite3.connect('third_task.db')
     cursor = conn.cursor()
 
-    query = f"SELECT SUM({numeric_field}), MIN({numeric_field}), MAX({numeric_field}), AVG({numeric_field}) FROM songs"
-    cursor.execute(query)
+    cursor.execute(*aggregate_query('songs', SONG_FIELDS, numeric_field))
     result = cursor.fetchone()
 
     data = {
@@ -151,13 +296,13 @@ def export_aggregate_results(numeric_field):
     conn.close()
 
 # 6. Запрос 3: Вывод частоты встречаемости для категориального поля
+@instrumented()
 def export_categorical_frequency(categorical_field):
     conn = sqlite3.connect('third_task.db')
     cursor = conn.cursor()
 
     # Получаем частоту для каждой категории
-    query = f"SELECT {categorical_field}, COUNT({categorical_field}) AS frequency FROM songs GROUP BY {categorical_field}"
-    cursor.execute(query)
+    cursor.execute(*frequency_query('songs', SONG_FIELDS, categorical_field))
     rows = cursor.fetchall()
 
     # Очищаем категории перед записью в JSON
@@ -167,37 +312,47 @@ def export_categorical_frequency(categorical_field):
         data.append({"category": cleaned_category, "frequency": row[1]})
 
     # Записываем результат в JSON
-    with open("categorical_frequency.json", "w", encoding='utf-8') as json_file:
-        json.dump(data, json_file, indent=4)
+    export_report(data, "categorical_frequency.json", ensure_ascii=True)
 
     conn.close()
 
 
 # 7. Запрос 4: Вывод первых VAR+15 строк, отфильтрованных по произвольному предикату, отсортированных по числовому полю
-def export_filtered_sorted_to_json(var, filter_predicate, sort_field):
+# filter_predicates - список условий (поле, оператор, значение), объединённых через AND
+@instrumented()
+def export_filtered_sorted_to_json(var, filter_predicates, sort_field):
     conn = sqlite3.connect('third_task.db')
     conn.row_factory = sqlite3.Row
     cursor = conn.cursor()
 
-    query = f"SELECT * FROM songs WHERE {filter_predicate} ORDER BY {sort_field} LIMIT {var + 15}"
-    cursor.execute(query)
-    rows = cursor.fetchall()
-
-    headers = [description[0] for description in cursor.description]
-    data = [dict(zip(headers, row)) for row in rows]
+    cursor.execute(*select_query('songs', SONG_FIELDS, columns=SONG_FIELDS, predicates=filter_predicates,
+                                 order_by=sort_field, limit=var + 15))
 
-    # Записываем результат в JSON
+    # Записываем результат в JSON по мере чтения из курсора
     filename = "filtered_sorted.json"
-    with open(filename, 'w', encoding='utf-8') as outfile:
-        json.dump(data, outfile, indent=4)
+    written = export_report(iter_dicts(cursor), filename, formats=COLUMNAR_OUTPUT_FORMATS, ensure_ascii=True)
 
     conn.close()
+    return written
+
+# Отчёт пересчитывается, только если изменились данные таблицы, параметры или код функции отчёта
+def cached_report(cache, output_file, report, *args):
+    conn = sqlite3.connect('third_task.db')
+    cursor = conn.cursor()
+    cache.materialize(cursor, ['songs'], output_file, lambda: report(*args), report, args)
+    conn.close()
+
 
 # Выполнение всех шагов
-create_songs_table()
-populate_songs_from_pkl('_part_2.pkl')  # Замените на путь к вашему файлу .pkl
-populate_songs_from_txt('_part_1.text')  # Замените на путь к вашему файлу .txt
-export_first_sorted_to_json(34, 'duration_ms')
-export_aggregate_results('tempo')
-export_categorical_frequency('genre')
-export_filtered_sorted_to_json(34, 'year > 2000', 'year')
+if __name__ == "__main__":
+    report_cache = ReportCache()
+    create_songs_table()
+    loaded = [populate_songs_from_pkl('_part_2.pkl'),  # Замените на путь к вашему файлу .pkl
+              populate_songs_from_txt_columnar('_part_1.text')]  # Замените на путь к вашему файлу .txt
+    create_report_indexes(after_load=any(loaded))
+    cached_report(report_cache, 'first_sorted.json', export_first_sorted_to_json, 34, 'duration_ms')
+    cached_report(report_cache, 'aggregate_results.json', export_aggregate_results, 'tempo')
+    cached_report(report_cache, 'categorical_frequency.json', export_categorical_frequency, 'genre')
+    cached_report(report_cache, 'filtered_sorted.json', export_filtered_sorted_to_json, 34, [('year', '>', 2000)], 'year')
+    print_cache_stats()
+    write_run_report()